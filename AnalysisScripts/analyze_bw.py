@@ -1,27 +1,22 @@
 import os
-import json
 import statistics
-import matplotlib.pyplot as plt
-from matplotlib.dates import DateFormatter
 from datetime import datetime, timedelta
 from datetime import datetime
 from collections import defaultdict
+import archive_records
+import resample
+import plot_cache
 
 ARCHIVE_DIR = ""
-BW_PREFIX = "BW_"
-
-def parse_bps_field(bps_str):
-    try:
-        return float(bps_str.split(" ")[0]) / 1e6  # Convert to Mbps
-    except:
-        return None
-
-def parse_interarrival(inter_str):
-    try:
-        parts = inter_str.replace(" ms", "").split("/")
-        return tuple(map(float, parts))  # min, avg, max, mdev
-    except:
-        return None, None, None, None
+DATASET_DIR = ""  # Parquet dataset from parquet_dataset.py, used instead of ARCHIVE_DIR if set
+IAS = []  # Only these destination IAs, all if empty
+SINCE = None  # Only files from this UTC datetime on, e.g. datetime.utcnow() - timedelta(days=3)
+UNTIL = None  # Only files before this UTC datetime
+BW_COLUMNS = ["file", "file_ts", "ia", "tier_mbps", "legacy", "invalid_format"] + [
+    f"{d}_{m}" for d in ["sc", "cs"]
+    for m in ["present", "achieved_mbps", "loss_pct", "ia_min_ms", "ia_avg_ms", "ia_max_ms", "ia_mdev_ms"]
+]
+TIME_RESOLUTION = timedelta(hours=1)  # Bucket size of the plotted time series
 
 def compute_full_stats(values):
     if not values:
@@ -49,55 +44,40 @@ def load_bw_data(archive_dir):
         "files": 0,
     }))
 
-    for fname in os.listdir(archive_dir):
-        if not fname.startswith(BW_PREFIX) or not fname.endswith(".json"):
+    counted_files = set()
+    for row in archive_records.load_records("bw", archive_dir, DATASET_DIR, columns=BW_COLUMNS, ias=IAS, since=SINCE, until=UNTIL):
+        ia = row["ia"]
+        mbps = row["tier_mbps"]
+        if not ia or not mbps:
+            continue
+
+        if row["file"] not in counted_files:
+            counted_files.add(row["file"])
+            bw_data[ia][mbps]["files"] += 1
+
+        # Single-result documents of bw_collector_scion only count as files here
+        if row["legacy"] or row["invalid_format"]:
             continue
 
-        path = os.path.join(archive_dir, fname)
-        try:
-            with open(path) as f:
-                doc = json.load(f)
-                ia = doc.get("target_server", {}).get("ia") or doc.get("as")
-                mbps = doc.get("target", {}).get("tier_mbps") or doc.get("target_mbps")
-                if not ia or not mbps:
-                    continue
-
-                bw_data[ia][mbps]["files"] += 1
-
-                paths = doc.get("paths")
-
-                for path_result in paths:
-                    result = path_result.get("result", {})
-                    if result.get("invalid_format"):
-                        continue
-
-                    for direction_key, prefix in [("S->C results", "sc"), ("C->S results", "cs")]:
-                        dir_result = result.get(direction_key)
-                        if not dir_result:
-                            continue
-
-                        bw = parse_bps_field(dir_result.get("achieved_bps", ""))
-                        if bw is not None:
-                            bw_data[ia][mbps][f"{prefix}_bandwidth"].append(bw)
-
-                        loss_str = dir_result.get("loss_rate", "").strip('%')
-                        try:
-                            loss = float(loss_str)
-                            bw_data[ia][mbps][f"{prefix}_loss"].append(loss)
-                        except:
-                            pass
-
-                        inter_str = dir_result.get("interarrival time min/avg/max/mdev")
-                        if inter_str:
-                            min_i, avg_i, max_i, mdev = parse_interarrival(inter_str)
-                            if avg_i is not None:
-                                bw_data[ia][mbps][f"{prefix}_interarrival"].append(avg_i)
-                                bw_data[ia][mbps][f"{prefix}_interarrival_minmax"].append((min_i, max_i))
-                            if mdev is not None:
-                                bw_data[ia][mbps][f"{prefix}_interarrival_mdev"].append(mdev)
-
-        except Exception as e:
-            print(f"[WARN] Failed to parse {fname}: {e}")
+        for prefix in ["sc", "cs"]:
+            if not row[f"{prefix}_present"]:
+                continue
+
+            bw = row[f"{prefix}_achieved_mbps"]
+            if bw is not None:
+                bw_data[ia][mbps][f"{prefix}_bandwidth"].append(bw)
+
+            loss = row[f"{prefix}_loss_pct"]
+            if loss is not None:
+                bw_data[ia][mbps][f"{prefix}_loss"].append(loss)
+
+            avg_i = row[f"{prefix}_ia_avg_ms"]
+            if avg_i is not None:
+                bw_data[ia][mbps][f"{prefix}_interarrival"].append(avg_i)
+                bw_data[ia][mbps][f"{prefix}_interarrival_minmax"].append((row[f"{prefix}_ia_min_ms"], row[f"{prefix}_ia_max_ms"]))
+            mdev = row[f"{prefix}_ia_mdev_ms"]
+            if mdev is not None:
+                bw_data[ia][mbps][f"{prefix}_interarrival_mdev"].append(mdev)
 
     return bw_data
 
@@ -109,156 +89,85 @@ def write_output_to_file(output_lines, filename):
 
 
 def generate_bw_plots(archive_dir):
-    TIME_RESOLUTION = timedelta(hours=1)
-    BW_PREFIX = "BW_"
     os.makedirs("bw_plots", exist_ok=True)
 
-    def parse_ts(fname):
-        try:
-            ts_part = fname.split("_")[1]
-            return datetime.strptime(ts_part, "%Y-%m-%dT%H:%M")
-        except:
-            return None
-
-    data_per_as = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(list))))
-    # structure: data[ia][mbps][timestamp][direction][(metric, value)]
+    times, keys, values = [], [], []
+    # keys: (ia, mbps, direction, metric)
 
-    for fname in os.listdir(archive_dir):
-        if not fname.startswith(BW_PREFIX) or not fname.endswith(".json"):
+    for row in archive_records.load_records("bw", archive_dir, DATASET_DIR, columns=BW_COLUMNS, ias=IAS, since=SINCE, until=UNTIL):
+        ts = row["file_ts"]
+        ia = row["ia"]
+        mbps = row["tier_mbps"]
+        if not ts or not ia or not mbps:
             continue
-        ts = parse_ts(fname)
-        if not ts:
+        if row["invalid_format"]:
             continue
-        ts = ts.replace(minute=0, second=0, microsecond=0)  # round to hour
-        fpath = os.path.join(archive_dir, fname)
-
-        try:
-            with open(fpath) as f:
-                doc = json.load(f)
-                ia = doc.get("target_server", {}).get("ia") or doc.get("as")
-                mbps = doc.get("target", {}).get("tier_mbps") or doc.get("target_mbps")
-                if not ia or not mbps:
-                    continue
-                paths = doc.get("paths", [doc])
-                for p in paths:
-                    if p.get("result", {}).get("invalid_format"):
-                        continue
-                    for dir_key, dir_label in [("S->C results", "sc"), ("C->S results", "cs")]:
-                        res = p.get("result", {}).get(dir_key)
-                        if not res:
-                            continue
-                        bw = parse_bps_field(res.get("achieved_bps", ""))
-                        loss = res.get("loss_rate", "").strip('%')
-                        try:
-                            loss = float(loss)
-                        except:
-                            loss = None
-                        _, ia_avg, _, ia_mdev = parse_interarrival(res.get("interarrival time min/avg/max/mdev", ""))
-
-                        metrics = {
-                            "bandwidth (mbps)": bw,
-                            "loss (%)": loss,
-                            "ia_avg (ms)": ia_avg,
-                            "ia_mdev (ms)": ia_mdev
-                        }
-
-                        for key, val in metrics.items():
-                            if val is not None:
-                                data_per_as[ia][mbps][ts][dir_label].append((key, val))
-        except Exception as e:
-            print(f"[WARN] Failed to read {fname}: {e}")
-
-    def average_per_hour(metric_data):
-        out = defaultdict(list)
-        for ts in sorted(metric_data):
-            grouped = defaultdict(list)
-            for metric, val in metric_data[ts]:
-                grouped[metric].append(val)
-            for metric, vals in grouped.items():
-                out[metric].append((ts, sum(vals) / len(vals)))
-        return out
+        for dir_label in ["sc", "cs"]:
+            if not row[f"{dir_label}_present"]:
+                continue
+
+            metrics = {
+                "bandwidth (mbps)": row[f"{dir_label}_achieved_mbps"],
+                "loss (%)": row[f"{dir_label}_loss_pct"],
+                "ia_avg (ms)": row[f"{dir_label}_ia_avg_ms"],
+                "ia_mdev (ms)": row[f"{dir_label}_ia_mdev_ms"]
+            }
+
+            for key, val in metrics.items():
+                if val is not None:
+                    times.append(ts)
+                    keys.append((ia, mbps, dir_label, key))
+                    values.append(val)
+
+    series = resample.resample(times, values, TIME_RESOLUTION, keys)
+    ias = list(dict.fromkeys(key[0] for key in series))
+    tiers = list(dict.fromkeys(key[1] for key in series))
+
+    figures = []
 
     # 1. Per-AS, show all tiers in one plot per metric
-    for ia in data_per_as:
+    for ia in ias:
         ia_dir = os.path.join("bw_plots", ia.replace(":", "_"))
-        os.makedirs(ia_dir, exist_ok=True)
 
         for direction in ["sc", "cs"]:
             for metric in ["bandwidth (mbps)", "loss (%)", "ia_avg (m)s", "ia_mdev (ms)"]:
-                plt.figure(figsize=(12, 5))
-                found = False
-                for mbps in sorted(data_per_as[ia]):
-                    hourly_data = defaultdict(list)
-                    for ts in sorted(data_per_as[ia][mbps]):
-                        entries = data_per_as[ia][mbps][ts][direction]
-                        for m, v in entries:
-                            if m == metric:
-                                hourly_data[ts].append(v)
-                    if not hourly_data:
-                        continue
-                    avg_data = [(ts, sum(vs)/len(vs)) for ts, vs in sorted(hourly_data.items()) if vs]
-                    if not avg_data:
-                        continue
-                    times, values = zip(*avg_data)
-                    plt.plot(times, values, marker='o', label=f"{mbps} Mbps")
-                    found = True
-
-                if found:
-                    plt.title(f"{ia} [{direction.upper()}] - {metric.upper()} across tiers")
-                    plt.xlabel("Time")
-                    plt.ylabel(metric)
-                    plt.legend(title="Tier")
-                    plt.grid(True)
-                    plt.gca().xaxis.set_major_formatter(DateFormatter("%m-%d\n%H:%M"))
-                    plt.xticks(rotation=45)
-                    plt.tight_layout()
+                lines = []
+                for mbps in sorted(tiers):
+                    avg_data = series.get((ia, mbps, direction, metric))
+                    if avg_data:
+                        lines.append((avg_data["time"], avg_data["mean"], {"marker": 'o', "label": f"{mbps} Mbps"}))
+
+                if lines:
                     fname = f"{direction}_{metric.replace(' ', '_')}_all_tiers.png"
-                    plt.savefig(os.path.join(ia_dir, fname))
-                    print(f"[Saved] {ia} multi-tier → {fname}")
-                plt.close()
+                    figures.append(plot_cache.Figure(
+                        os.path.join(ia_dir, fname), plot_cache.render_lines,
+                        message=f"[Saved] {ia} multi-tier → {fname}",
+                        lines=lines, title=f"{ia} [{direction.upper()}] - {metric.upper()} across tiers",
+                        xlabel="Time", ylabel=metric, figsize=(12, 5), legend_title="Tier",
+                        date_format="%m-%d\n%H:%M"
+                    ))
 
     # 2. For each tier, show all ASes in one graph
-    tier_data = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(list))))
-    # tier_data[tier][direction][metric][ia] = [(ts, val)]
-
-    for ia in data_per_as:
-        for mbps in data_per_as[ia]:
-            for ts in data_per_as[ia][mbps]:
-                for direction in data_per_as[ia][mbps][ts]:
-                    for metric, value in data_per_as[ia][mbps][ts][direction]:
-                        tier_data[mbps][direction][metric][ia].append((ts, value))
-
-    for mbps in tier_data:
+    for mbps in tiers:
         for direction in ["sc", "cs"]:
             for metric in ["bandwidth (mbps)", "loss (%)", "ia_avg (m)s", "ia_mdev (ms)"]:
-                plt.figure(figsize=(12, 5))
-                found = False
-                for ia in tier_data[mbps][direction][metric]:
-                    data = tier_data[mbps][direction][metric][ia]
-                    hourly = defaultdict(list)
-                    for ts, val in data:
-                        ts = ts.replace(minute=0, second=0, microsecond=0)
-                        hourly[ts].append(val)
-                    avg_data = [(ts, sum(vals)/len(vals)) for ts, vals in sorted(hourly.items()) if vals]
-                    if not avg_data:
-                        continue
-                    times, values = zip(*avg_data)
-                    plt.plot(times, values, marker='o', label=ia)
-                    found = True
-
-                if found:
-                    plt.title(f"{metric.upper()} Comparison @ {mbps} Mbps ({direction.upper()})")
-                    plt.xlabel("Time")
-                    plt.ylabel(metric)
-                    plt.legend(title="IA")
-                    plt.grid(True)
-                    plt.gca().xaxis.set_major_formatter(DateFormatter("%m-%d\n%H:%M"))
-                    plt.xticks(rotation=45)
-                    plt.tight_layout()
+                lines = []
+                for ia in ias:
+                    avg_data = series.get((ia, mbps, direction, metric))
+                    if avg_data:
+                        lines.append((avg_data["time"], avg_data["mean"], {"marker": 'o', "label": ia}))
+
+                if lines:
                     fname = f"tier_{mbps}_{direction}_{metric.replace(' ', '_')}_per_IA.png"
-                    plt.savefig(os.path.join("bw_plots", fname))
-                    print(f"[Saved] Cross-AS tier plot → {fname}")
-                plt.close()
+                    figures.append(plot_cache.Figure(
+                        os.path.join("bw_plots", fname), plot_cache.render_lines,
+                        message=f"[Saved] Cross-AS tier plot → {fname}",
+                        lines=lines, title=f"{metric.upper()} Comparison @ {mbps} Mbps ({direction.upper()})",
+                        xlabel="Time", ylabel=metric, figsize=(12, 5), legend_title="IA",
+                        date_format="%m-%d\n%H:%M"
+                    ))
+
+    plot_cache.render_all(figures)
 
 
 def print_bw_summary(bw_data):
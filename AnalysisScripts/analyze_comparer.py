@@ -1,11 +1,20 @@
 import os
-import json
-from datetime import datetime
+import sys
+from calendar import timegm
+from datetime import datetime, timedelta
 from collections import defaultdict
-import matplotlib.pyplot as plt
+import archive_records
+import resample
+import plot_cache
 
 ARCHIVE_DIR = ""
-COMPARER_PREFIX = "delta_"
+DATASET_DIR = ""  # Parquet dataset from parquet_dataset.py, used instead of ARCHIVE_DIR if set
+IAS = []  # Only these destination IAs, all if empty
+SINCE = None  # Only files from this UTC datetime on, e.g. datetime.utcnow() - timedelta(days=3)
+UNTIL = None  # Only files before this UTC datetime
+FINGERPRINT_DB = ""  # Data/fingerprints.db of the comparer, queried instead of the delta files if set
+PYTHON_TESTS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "PythonTests"))
+TIME_RESOLUTION = timedelta(hours=1)  # Bucket size of the plotted time series
 
 def extract_path_features(sequence):
     segments = sequence.split()
@@ -18,20 +27,27 @@ def extract_path_features(sequence):
 
 def load_comparer_data(archive_dir):
     comparer_data = defaultdict(list)
-    for fname in os.listdir(archive_dir):
-        if not fname.startswith(COMPARER_PREFIX) or not fname.endswith(".json"):
+    entries = {}
+    records = archive_records.load_records(
+        "comparer", archive_dir, DATASET_DIR,
+        columns=["file", "ia", "ts", "change_status", "change", "sequence"],
+        ias=IAS, since=SINCE, until=UNTIL
+    )
+    for row in records:
+        destination = row["ia"]
+        if not destination:
             continue
-        path = os.path.join(archive_dir, fname)
-        try:
-            with open(path) as f:
-                data = json.load(f)
-                destination = data.get("destination")
-                if destination:
-                    comparer_data[destination].append(data)
-        except Exception as e:
-            print(f"[WARN] Failed to read {fname}: {e}")
+        # Each delta file has one row without a change, followed by one row per change
+        if row["change"] is None:
+            entries[row["file"]] = {"ts": row["ts"], "change_status": row["change_status"], "changes": []}
+            comparer_data[destination].append(entries[row["file"]])
+        else:
+            entries[row["file"]]["changes"].append({"change": row["change"], "sequence": row["sequence"] or ""})
     return comparer_data
 
+def sort_entries(entries):
+    return sorted(entries, key=lambda x: x["ts"] or datetime.min)
+
 def analyze_comparer(data_by_ia):
     results = {}
     churn_by_as = defaultdict(int)
@@ -39,23 +55,16 @@ def analyze_comparer(data_by_ia):
     lifetime_data_by_ia = defaultdict(list)
 
     for ia, entries in data_by_ia.items():
-        entries_sorted = sorted(entries, key=lambda x: x.get("timestamp", ""))
+        entries_sorted = sort_entries(entries)
         total = len(entries_sorted)
         added_total, removed_total, change_events = 0, 0, 0
         path_lengths = []
         last_seen = {}
 
         for entry in entries_sorted:
-            timestamp = entry.get("timestamp")
-            ts = None
-            for fmt in ("%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%dT%H:%M"):
-                try:
-                    ts = datetime.strptime(timestamp, fmt)
-                    break
-                except:
-                    continue
+            ts = entry["ts"]
             if ts is None:
-                continue  # skip if no format matched
+                continue  # skip if the timestamp could not be parsed
 
             if entry.get("change_status") == "change_detected":
                 change_events += 1
@@ -104,91 +113,147 @@ def analyze_comparer(data_by_ia):
 
     return results, churn_insights
 
+def open_fingerprint_store(db_path):
+    sys.path.insert(0, PYTHON_TESTS_DIR)
+    import fingerprint_store
+    return fingerprint_store.FingerprintStore(db_path, readonly=True)
+
+def to_epoch(dt):
+    return timegm(dt.timetuple()) if dt else None
+
+def analyze_comparer_db(db_path):
+    """Same results as analyze_comparer plus the plot series, queried from the comparer's fingerprint store"""
+    store = open_fingerprint_store(db_path)
+    since, until = to_epoch(SINCE), to_epoch(UNTIL)
+    resolution = int(TIME_RESOLUTION.total_seconds())
+    results = {}
+    churn_by_as = defaultdict(int)
+    churn_by_length = defaultdict(int)
+    hourly = {key: defaultdict(int) for key in ("change_detected", "added", "removed")}
+    all_lifetimes = []
+
+    try:
+        for ia in store.ias():
+            if IAS and ia not in IAS:
+                continue
+            comparisons = store.comparisons(ia, since, until, resolution)
+            churn = store.churn(ia, since, until, resolution)
+            lifetimes = [seconds for _, _, _, seconds in store.lifetimes(ia, since=since, until=until)]
+            if not comparisons and not churn and not lifetimes:
+                continue
+
+            changes, length_total = 0, 0
+            for (sequence, _), count in store.changed_sequences(ia, since, until).items():
+                features = extract_path_features(sequence)
+                changes += count
+                length_total += features["length"] * count
+                churn_by_length[features["length"]] += count
+                for ashop in features["ases"]:
+                    churn_by_as[ashop] += count
+
+            for (bucket, status), count in comparisons.items():
+                if status == "change_detected":
+                    hourly["change_detected"][datetime.utcfromtimestamp(bucket)] += count
+            for (bucket, change), count in churn.items():
+                hourly[change][datetime.utcfromtimestamp(bucket)] += count
+            all_lifetimes.extend(lifetimes)
+
+            results[ia] = {
+                "total_comparisons": sum(comparisons.values()),
+                "change_events": sum(count for (_, status), count in comparisons.items() if status == "change_detected"),
+                "added_paths": sum(count for (_, change), count in churn.items() if change == "added"),
+                "removed_paths": sum(count for (_, change), count in churn.items() if change == "removed"),
+                "avg_path_length_of_changes": round(length_total / changes, 2) if changes else 0,
+                "avg_path_lifetime_sec": round(sum(lifetimes) / len(lifetimes), 2) if lifetimes else None
+            }
+    finally:
+        store.close()
+
+    churn_insights = {
+        "churn_by_path_length": dict(sorted(churn_by_length.items())),
+        "top_unstable_ases": sorted(churn_by_as.items(), key=lambda x: -x[1])[:10]
+    }
+    return results, churn_insights, (hourly["change_detected"], hourly["added"], hourly["removed"], all_lifetimes)
+
 def write_output_to_file(output_lines, filename):
     with open(filename, "w") as f:
         for line in output_lines:
             f.write(line + "\n")
 
-def generate_comparer_plots(data_by_ia):
-    output_dir = "comparer_plots"
-    os.makedirs(output_dir, exist_ok=True)
-    hourly_changes = defaultdict(int)
-    hourly_adds = defaultdict(int)
-    hourly_removes = defaultdict(int)
+def comparer_plot_series(data_by_ia):
+    """(hourly changes, hourly adds, hourly removes, lifetimes) replayed from the delta entries"""
+    event_times = []
+    event_keys = []  # "change_detected", "added" or "removed"
     all_lifetimes = []
 
     for ia, entries in data_by_ia.items():
-        entries_sorted = sorted(entries, key=lambda x: x.get("timestamp", ""))
+        entries_sorted = sort_entries(entries)
         last_seen = {}
 
         for entry in entries_sorted:
-            ts = None
-            timestamp = entry.get("timestamp")
-            for fmt in ("%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%dT%H:%M"):
-                try:
-                    ts = datetime.strptime(timestamp, fmt)
-                    break
-                except:
-                    continue
+            ts = entry["ts"]
             if not ts:
                 continue
-            ts_hour = ts.replace(minute=0, second=0)
 
             if entry.get("change_status") == "change_detected":
-                hourly_changes[ts_hour] += 1
+                event_times.append(ts)
+                event_keys.append("change_detected")
 
             for change in entry.get("changes", []):
                 typ = change.get("change")
                 seq = change.get("sequence", "").strip()
 
+                if typ in ("added", "removed"):
+                    event_times.append(ts)
+                    event_keys.append(typ)
+
                 if typ == "added":
-                    hourly_adds[ts_hour] += 1
                     last_seen[seq] = ts
                 elif typ == "removed":
-                    hourly_removes[ts_hour] += 1
                     if seq in last_seen:
                         delta = (ts - last_seen[seq]).total_seconds()
                         all_lifetimes.append(delta)
 
+    counts = resample.resample(event_times, [1] * len(event_times), TIME_RESOLUTION, event_keys)
+    hourly_changes, hourly_adds, hourly_removes = [
+        defaultdict(int, zip(counts[key]["time"], counts[key]["count"])) if key in counts else defaultdict(int)
+        for key in ("change_detected", "added", "removed")
+    ]
+    return hourly_changes, hourly_adds, hourly_removes, all_lifetimes
+
+def generate_comparer_plots(hourly_changes, hourly_adds, hourly_removes, all_lifetimes):
+    output_dir = "comparer_plots"
+    os.makedirs(output_dir, exist_ok=True)
+    figures = []
+
     # Plot 1: Total change events per hour
     hours = sorted(hourly_changes)
-    plt.figure(figsize=(12, 4))
-    plt.plot(hours, [hourly_changes[h] for h in hours], marker='o', label='Total Changes')
-    plt.xlabel("Time (Hourly)")
-    plt.ylabel("Changes")
-    plt.title("Total Path Changes Over Time")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.grid(True)
-    plt.savefig(os.path.join(output_dir, "plot_path_changes_over_time.png"))
-    plt.close()
+    figures.append(plot_cache.Figure(
+        os.path.join(output_dir, "plot_path_changes_over_time.png"), plot_cache.render_lines,
+        lines=[(hours, [hourly_changes[h] for h in hours], {"marker": 'o', "label": 'Total Changes'})],
+        title="Total Path Changes Over Time", xlabel="Time (Hourly)", ylabel="Changes"
+    ))
 
     # Plot 2: Additions vs Removals
     hours = sorted(set(hourly_adds) | set(hourly_removes))
-    plt.figure(figsize=(12, 4))
-    plt.plot(hours, [hourly_adds[h] for h in hours], label='Added Paths', marker='o')
-    plt.plot(hours, [hourly_removes[h] for h in hours], label='Removed Paths', marker='x')
-    plt.xlabel("Time (Hourly)")
-    plt.ylabel("Count")
-    plt.title("Added vs Removed Paths Over Time")
-    plt.legend()
-    plt.xticks(rotation=45)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir,"plot_add_remove_over_time.png"))
-    plt.close()
+    figures.append(plot_cache.Figure(
+        os.path.join(output_dir, "plot_add_remove_over_time.png"), plot_cache.render_lines,
+        lines=[
+            (hours, [hourly_adds[h] for h in hours], {"label": 'Added Paths', "marker": 'o'}),
+            (hours, [hourly_removes[h] for h in hours], {"label": 'Removed Paths', "marker": 'x'})
+        ],
+        title="Added vs Removed Paths Over Time", xlabel="Time (Hourly)", ylabel="Count", legend=True
+    ))
 
     # Plot 3: Lifetime Histogram
     if all_lifetimes:
-        plt.figure(figsize=(8, 4))
-        plt.hist(all_lifetimes, bins=20, color='purple')
-        plt.xlabel("Lifetime (seconds)")
-        plt.ylabel("Frequency")
-        plt.title("Path Lifetimes Distribution")
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, "plot_path_lifetime_histogram.png"))
-        plt.close()
+        figures.append(plot_cache.Figure(
+            os.path.join(output_dir, "plot_path_lifetime_histogram.png"), plot_cache.render_histogram,
+            values=all_lifetimes, bins=20, color='purple', title="Path Lifetimes Distribution",
+            xlabel="Lifetime (seconds)", ylabel="Frequency"
+        ))
+
+    plot_cache.render_all(figures)
 
 def main():
     output_file = f"comparer_analysis.txt"
@@ -199,8 +264,12 @@ def main():
         output_lines.append(line)
 
     log("=== SCION Path Comparer Analysis ===")
-    comparer_data = load_comparer_data(ARCHIVE_DIR)
-    comparer_results, churn_insights = analyze_comparer(comparer_data)
+    if FINGERPRINT_DB:
+        comparer_results, churn_insights, plot_series = analyze_comparer_db(FINGERPRINT_DB)
+    else:
+        comparer_data = load_comparer_data(ARCHIVE_DIR)
+        comparer_results, churn_insights = analyze_comparer(comparer_data)
+        plot_series = comparer_plot_series(comparer_data)
 
     log(f"\nComparer data summary:\n")
     for ia, stats in comparer_results.items():
@@ -218,7 +287,7 @@ def main():
     for length, count in churn_insights["churn_by_path_length"].items():
         log(f"  Length {length}: {count} changes")
 
-    generate_comparer_plots(comparer_data)
+    generate_comparer_plots(*plot_series)
     log("[Saved figures as .png files]")
 
     write_output_to_file(output_lines, output_file)
@@ -1,19 +1,21 @@
 # analyze_prober.py
 
 import os
-import json
 import statistics
-from datetime import datetime
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from datetime import datetime, timedelta
 from collections import defaultdict
+import archive_records
+import resample
+import plot_cache
 
 ARCHIVE_DIR = ""
-PROBER_PREFIX = "prober_"
+DATASET_DIR = ""  # Parquet dataset from parquet_dataset.py, used instead of ARCHIVE_DIR if set
+IAS = []  # Only these destination IAs, all if empty
+SINCE = None  # Only files from this UTC datetime on, e.g. datetime.utcnow() - timedelta(days=3)
+UNTIL = None  # Only files before this UTC datetime
+TIME_RESOLUTION = timedelta(hours=1)  # Bucket size of the plotted time series
 
 def load_prober_data(archive_dir):
-    from dateutil import parser  # Handles both Zulu and non-Zulu timestamps
-
     prober_data = defaultdict(lambda: {
         "rtts": [],
         "packet_losses": [],
@@ -24,72 +26,54 @@ def load_prober_data(archive_dir):
     prober_data_by_time = defaultdict(lambda: defaultdict(list))
     # Structure: prober_data_by_time[ia][metric] = list of (timestamp, value)
 
-    for fname in os.listdir(archive_dir):
-        if not fname.startswith(PROBER_PREFIX) or not fname.endswith(".json"):
+    # Records are one per probe, grouped per file for the per-round averages
+    rounds = {}
+    records = archive_records.load_records(
+        "prober", archive_dir, DATASET_DIR,
+        columns=["file", "ia", "ts", "avg_rtt", "mdev_rtt", "packet_loss", "seq_issue"],
+        ias=IAS, since=SINCE, until=UNTIL
+    )
+    for probe in records:
+        ia = probe["ia"]
+        ts = probe["ts"]
+        if not ia or not ts:
             continue
-        path = os.path.join(archive_dir, fname)
-        try:
-            with open(path) as f:
-                doc = json.load(f)
-                ia = doc.get("ia")
-                probes = doc.get("probes", [])
-                timestamp_str = doc.get("timestamp")
-                if not ia or not timestamp_str:
-                    continue
-
-                try:
-                    ts = parser.parse(timestamp_str)
-                    ts = ts.replace(minute=0, second=0, microsecond=0)  # Bucket into 1-hour intervals
-                except Exception as e:
-                    print(f"[WARN] Could not parse timestamp in {fname}: {e}")
-                    continue
-
-                total_rtts = []
-                total_loss = []
-                total_mdevs = []
-                seq_issues = 0
-                probe_count = 0
-
-                for probe in probes:
-                    result = probe.get("ping_result", {})
-                    stats = result.get("statistics", {})
-                    replies = result.get("replies", [])
-
-                    avg_rtt = stats.get("avg_rtt")
-                    mdev = stats.get("mdev_rtt")
-                    packet_loss = stats.get("packet_loss")
-
-                    if avg_rtt is not None:
-                        prober_data[ia]["rtts"].append(avg_rtt)
-                        total_rtts.append(avg_rtt)
-                    if packet_loss is not None:
-                        prober_data[ia]["packet_losses"].append(packet_loss)
-                        total_loss.append(packet_loss)
-                    if mdev is not None:
-                        total_mdevs.append(mdev)
-
-                    # Sequence analysis
-                    seqs = [r.get("scmp_seq") for r in replies if "scmp_seq" in r]
-                    expected = sorted(seqs)
-                    if seqs and seqs != expected:
-                        prober_data[ia]["sequence_issues"] += 1
-                        seq_issues += 1
-
-                    prober_data[ia]["total_probes"] += 1
-                    probe_count += 1
-
-                # Only store if we had probes this round
-                if probe_count > 0:
-                    if total_rtts:
-                        prober_data_by_time[ia]["rtt"].append((ts, statistics.mean(total_rtts)))
-                    if total_loss:
-                        prober_data_by_time[ia]["loss"].append((ts, statistics.mean(total_loss)))
-                    if total_mdevs:
-                        prober_data_by_time[ia]["mdev"].append((ts, statistics.mean(total_mdevs)))
-                    prober_data_by_time[ia]["seq_issue_ratio"].append((ts, seq_issues / probe_count))
-
-        except Exception as e:
-            print(f"[WARN] Failed to parse {fname}: {e}")
+
+        round_data = rounds.get(probe["file"])
+        if round_data is None:
+            round_data = rounds[probe["file"]] = {
+                "ia": ia,
+                "ts": ts,
+                "rtts": [], "loss": [], "mdevs": [], "seq_issues": 0, "probes": 0
+            }
+
+        if probe["avg_rtt"] is not None:
+            prober_data[ia]["rtts"].append(probe["avg_rtt"])
+            round_data["rtts"].append(probe["avg_rtt"])
+        if probe["packet_loss"] is not None:
+            prober_data[ia]["packet_losses"].append(probe["packet_loss"])
+            round_data["loss"].append(probe["packet_loss"])
+        if probe["mdev_rtt"] is not None:
+            round_data["mdevs"].append(probe["mdev_rtt"])
+
+        # Sequence analysis
+        if probe["seq_issue"]:
+            prober_data[ia]["sequence_issues"] += 1
+            round_data["seq_issues"] += 1
+
+        prober_data[ia]["total_probes"] += 1
+        round_data["probes"] += 1
+
+    for round_data in rounds.values():
+        ia, ts = round_data["ia"], round_data["ts"]
+        if round_data["rtts"]:
+            prober_data_by_time[ia]["rtt"].append((ts, statistics.mean(round_data["rtts"])))
+        if round_data["loss"]:
+            prober_data_by_time[ia]["loss"].append((ts, statistics.mean(round_data["loss"])))
+        if round_data["mdevs"]:
+            prober_data_by_time[ia]["mdev"].append((ts, statistics.mean(round_data["mdevs"])))
+        prober_data_by_time[ia]["seq_issue_ratio"].append((ts, round_data["seq_issues"] / round_data["probes"]))
+
     return prober_data, prober_data_by_time
 
 def compute_stats(values):
@@ -141,19 +125,13 @@ def generate_prober_plots(prober_data_by_time):
     output_dir = "prober_plots"
     os.makedirs(output_dir, exist_ok=True)
 
-    def hourly_average(series_by_time):
-        buckets = defaultdict(list)
-        for t, v in series_by_time:
-            bucket_time = t.replace(minute=0, second=0, microsecond=0)
-            buckets[bucket_time].append(v)
-        return sorted((bt, sum(vs)/len(vs)) for bt, vs in buckets.items() if vs)
-
     all_metrics = {
         "rtt": {},
         "loss": {},
         "mdev": {},
         "seq_issue_ratio": {}
     }
+    figures = []
 
     # Plot per-AS and store for combined plotting
     for ia, time_data in prober_data_by_time.items():
@@ -162,10 +140,10 @@ def generate_prober_plots(prober_data_by_time):
         mdev_series = time_data.get("mdev", [])
         seq_issue_series = time_data.get("seq_issue_ratio", [])
 
-        rtt_avg = hourly_average(rtt_series)
-        loss_avg = hourly_average(loss_series)
-        mdev_avg = hourly_average(mdev_series)
-        seq_issue_avg = hourly_average(seq_issue_series)
+        rtt_avg = resample.bucket_means(rtt_series, TIME_RESOLUTION)
+        loss_avg = resample.bucket_means(loss_series, TIME_RESOLUTION)
+        mdev_avg = resample.bucket_means(mdev_series, TIME_RESOLUTION)
+        seq_issue_avg = resample.bucket_means(seq_issue_series, TIME_RESOLUTION)
 
         all_metrics["rtt"][ia] = rtt_avg
         all_metrics["loss"][ia] = loss_avg
@@ -177,18 +155,12 @@ def generate_prober_plots(prober_data_by_time):
                 print(f"[INFO] Skipping {title}, no data.")
                 return
             times, values = zip(*series)
-            plt.figure(figsize=(12, 4))
-            plt.plot(times, values, marker='o', linestyle='-')
-            plt.title(title)
-            plt.xlabel("Time")
-            plt.ylabel(ylabel)
-            plt.grid(True)
-            plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%m-%d\n%H:%M'))
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            plt.savefig(os.path.join(output_dir, filename))
-            plt.close()
-            print(f"[Saved plot to {output_dir}/{filename}]")
+            figures.append(plot_cache.Figure(
+                os.path.join(output_dir, filename), plot_cache.render_lines,
+                message=f"[Saved plot to {output_dir}/{filename}]",
+                lines=[(list(times), list(values), {"marker": 'o', "linestyle": '-'})],
+                title=title, xlabel="Time", ylabel=ylabel, date_format='%m-%d\n%H:%M'
+            ))
 
         plot_metric(rtt_avg, "Avg RTT (ms)", f"{ia} - Avg RTT Over Time", f"{ia}_rtt_plot.png")
         plot_metric(loss_avg, "Avg Loss (%)", f"{ia} - Packet Loss Over Time", f"{ia}_loss_plot.png")
@@ -197,35 +169,29 @@ def generate_prober_plots(prober_data_by_time):
 
     # Plot shared graphs: one for each metric, with both ASes on the same graph
     def plot_combined(metric_key, ylabel, title, filename):
-        plt.figure(figsize=(12, 4))
-        valid = False
+        lines = []
         for ia, series in all_metrics[metric_key].items():
             if not series:
                 continue
             times, values = zip(*series)
-            plt.plot(times, values, marker='o', linestyle='-', label=ia)
-            valid = True
-        if not valid:
+            lines.append((list(times), list(values), {"marker": 'o', "linestyle": '-', "label": ia}))
+        if not lines:
             print(f"[INFO] Skipping combined plot {title}, no data.")
-            plt.close()
             return
-        plt.title(title)
-        plt.xlabel("Time")
-        plt.ylabel(ylabel)
-        plt.legend(title="IA")
-        plt.grid(True)
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%m-%d\n%H:%M'))
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, filename))
-        plt.close()
-        print(f"[Saved combined plot to {output_dir}/{filename}]")
+        figures.append(plot_cache.Figure(
+            os.path.join(output_dir, filename), plot_cache.render_lines,
+            message=f"[Saved combined plot to {output_dir}/{filename}]",
+            lines=lines, title=title, xlabel="Time", ylabel=ylabel, legend_title="IA",
+            date_format='%m-%d\n%H:%M'
+        ))
 
     plot_combined("rtt", "Avg RTT (ms)", "RTT Comparison Between ASes", "combined_rtt_plot.png")
     plot_combined("loss", "Avg Loss (%)", "Loss Comparison Between ASes", "combined_loss_plot.png")
     plot_combined("mdev", "Avg Jitter (mdev, ms)", "Jitter Comparison Between ASes", "combined_jitter_plot.png")
     plot_combined("seq_issue_ratio", "Seq Issue Ratio", "Seq Issues Comparison Between ASes", "combined_seq_plot.png")
 
+    plot_cache.render_all(figures)
+
 
 if __name__ == "__main__":
     main()
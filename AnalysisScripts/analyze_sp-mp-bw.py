@@ -1,98 +1,48 @@
 import os
-import json
 import statistics
 from datetime import datetime, timedelta
 from collections import defaultdict
 import matplotlib.pyplot as plt
+import archive_records
+import time_join
 
 ARCHIVE_DIR = ""
-SP_PREFIX = "BW_"
-MP_PREFIX = "BW-P"
+DATASET_DIR = ""  # Parquet dataset from parquet_dataset.py, used instead of ARCHIVE_DIR if set
+IAS = []  # Only these destination IAs, all if empty
+SINCE = None  # Only files from this UTC datetime on, e.g. datetime.utcnow() - timedelta(days=3)
+UNTIL = None  # Only files before this UTC datetime
+SP_TOOL = "bw"
+MP_TOOL = "bw-mp"
 TIME_WINDOW = timedelta(minutes=15)
 
-def parse_timestamp_from_filename(fname):
-    try:
-        parts = fname.split("_")
-        ts_str = parts[1]
-
-        # Handle BW-P format (MP), e.g., BW-P_2025-07-15T22-14-53_...
-        if "-" in ts_str and ":" not in ts_str:
-            date, time = ts_str.split("T")
-            time_parts = time.split("-")
-            if len(time_parts) >= 2:
-                time_fixed = f"{time_parts[0]}:{time_parts[1]}"
-                ts_str = f"{date}T{time_fixed}"
-
-        return datetime.strptime(ts_str, "%Y-%m-%dT%H:%M")
-
-    except Exception as e:
-        print(f"[WARN] Timestamp parse error in {fname}: {e}")
-        return None
-
-def parse_bps_field(bps_str):
-    try:
-        return float(bps_str.split(" ")[0]) / 1e6  # Convert to Mbps
-    except:
-        return None
-
-def parse_interarrival(inter_str):
-    try:
-        parts = inter_str.replace(" ms", "").split("/")
-        return tuple(map(float, parts))  # min, avg, max, mdev
-    except:
-        return None, None, None, None
-
-def extract_bw_stats(archive_dir, prefix):
+def extract_bw_stats(archive_dir, tool):
     results = defaultdict(lambda: defaultdict(dict))  # ia -> timestamp -> fp -> metrics
 
-    for fname in os.listdir(archive_dir):
-        if not fname.startswith(prefix) or not fname.endswith(".json"):
-            continue
-        ts = parse_timestamp_from_filename(fname)
-        if not ts:
+    records = archive_records.load_records(
+        tool, archive_dir, DATASET_DIR,
+        columns=["file_ts", "ia", "fingerprint", "invalid_format"] + [
+            f"{d}_{m}" for d in ["sc", "cs"] for m in ["present", "achieved_mbps", "loss_pct", "ia_avg_ms", "ia_mdev_ms"]
+        ],
+        ias=IAS, since=SINCE, until=UNTIL
+    )
+    for row in records:
+        ts = row["file_ts"]
+        fp = row["fingerprint"]
+        if not ts or not fp or row["invalid_format"]:
             continue
 
-        fpath = os.path.join(archive_dir, fname)
-        try:
-            with open(fpath) as f:
-                doc = json.load(f)
-                ia = doc.get("target_server", {}).get("ia") or doc.get("as")
-                paths = doc.get("paths", [doc])
-                for path in paths:
-                    fp = path.get("fingerprint")
-                    if not fp:
-                        continue
-                    result = path.get("result", {})
-                    if result.get("invalid_format"):
-                        continue
+        stats = {}
+        for dir_short in ["sc", "cs"]:
+            if not row[f"{dir_short}_present"]:
+                continue
+            stats[dir_short] = {
+                "bw": row[f"{dir_short}_achieved_mbps"],
+                "loss": row[f"{dir_short}_loss_pct"],
+                "ia_avg": row[f"{dir_short}_ia_avg_ms"],
+                "ia_mdev": row[f"{dir_short}_ia_mdev_ms"]
+            }
 
-                    stats = {}
-                    for direction_key in ["S->C results", "C->S results"]:
-                        d = result.get(direction_key)
-                        if not d:
-                            continue
-
-                        bw = parse_bps_field(d.get("achieved_bps", ""))
-                        loss = d.get("loss_rate", "").strip('%')
-                        try:
-                            loss = float(loss)
-                        except:
-                            loss = None
-                        inter = d.get("interarrival time min/avg/max/mdev", "")
-                        _, ia_avg, _, ia_mdev = parse_interarrival(inter)
-
-                        dir_short = "sc" if direction_key.startswith("S->C") else "cs"
-                        stats[dir_short] = {
-                            "bw": bw,
-                            "loss": loss,
-                            "ia_avg": ia_avg,
-                            "ia_mdev": ia_mdev
-                        }
-
-                    results[ia][ts][fp] = stats
-
-        except Exception as e:
-            print(f"[WARN] Failed to read {fname}: {e}")
+        results[row["ia"]][ts][fp] = stats
 
     return results
 
@@ -101,20 +51,8 @@ def compare_metrics(sp_data, mp_data):
     matched_count = 0
 
     for ia in sp_data:
-        for sp_time in sp_data[ia]:
-            # Find the nearest mp_time within ±15 min
-            mp_times = mp_data.get(ia, {})
-            closest_time = None
-            min_diff = TIME_WINDOW
-            for mp_time in mp_times:
-                delta = abs(mp_time - sp_time)
-                if delta <= min_diff:
-                    min_diff = delta
-                    closest_time = mp_time
-
-            if not closest_time:
-                continue
-
+        # Nearest mp_time within ±15 min for every sp_time
+        for sp_time, closest_time in time_join.nearest_join(sp_data[ia], mp_data.get(ia, {}), TIME_WINDOW):
             sp_paths = sp_data[ia][sp_time]
             mp_paths = mp_data[ia][closest_time]
 
@@ -206,10 +144,10 @@ def main():
     log("=== SP vs MP Bandwidth Comparison ===\n")
 
     log("Loading SP bandwidth data...")
-    sp_data = extract_bw_stats(ARCHIVE_DIR, SP_PREFIX)
+    sp_data = extract_bw_stats(ARCHIVE_DIR, SP_TOOL)
 
     log("Loading MP bandwidth data...")
-    mp_data = extract_bw_stats(ARCHIVE_DIR, MP_PREFIX)
+    mp_data = extract_bw_stats(ARCHIVE_DIR, MP_TOOL)
 
     log("Comparing matched paths...\n")
     diffs, matched_count = compare_metrics(sp_data, mp_data)
@@ -1,86 +1,66 @@
 # compare_sp_mp_prober.py
 
 import os
-import json
 import statistics
 from datetime import datetime, timedelta
 from collections import defaultdict
 import matplotlib.pyplot as plt
+import archive_records
+import time_join
 
 ARCHIVE_DIR = ""
-SP_PREFIX = "prober_"
-MP_PREFIX = "mp-prober_"
+DATASET_DIR = ""  # Parquet dataset from parquet_dataset.py, used instead of ARCHIVE_DIR if set
+IAS = []  # Only these destination IAs, all if empty
+SINCE = None  # Only files from this UTC datetime on, e.g. datetime.utcnow() - timedelta(days=3)
+UNTIL = None  # Only files before this UTC datetime
+SP_TOOL = "prober"
+MP_TOOL = "mp-prober"
 TIME_WINDOW = timedelta(minutes=15)
 
 
-def parse_filename_timestamp(fname):
-    try:
-        return datetime.strptime(fname.split("_")[1], "%Y-%m-%dT%H:%M")
-    except Exception as e:
-        print(f"[WARN] Could not parse timestamp from filename {fname}: {e}")
-        return None
-
-
-def load_prober_files(prefix):
+def load_prober_files(tool):
     data = defaultdict(lambda: defaultdict(dict))  # ia -> timestamp -> fingerprint -> stats
-    for fname in os.listdir(ARCHIVE_DIR):
-        if not fname.startswith(prefix) or not fname.endswith(".json"):
-            continue
-        timestamp = parse_filename_timestamp(fname)
-        if not timestamp:
+    records = archive_records.load_records(
+        tool, ARCHIVE_DIR, DATASET_DIR,
+        columns=["file_ts", "ia", "fingerprint", "has_ping", "avg_rtt", "mdev_rtt", "packet_loss"],
+        ias=IAS, since=SINCE, until=UNTIL
+    )
+    for probe in records:
+        timestamp = probe["file_ts"]
+        fp = probe["fingerprint"]
+        if not timestamp or not probe["ia"] or not probe["has_ping"] or not fp:
             continue
 
-        path = os.path.join(ARCHIVE_DIR, fname)
-        try:
-            with open(path) as f:
-                doc = json.load(f)
-                ia = doc.get("ia")
-                if not ia or not doc.get("probes"):
-                    continue
-
-                for probe in doc["probes"]:
-                    ping = probe.get("ping_result", {})
-                    stats = ping.get("statistics", {})
-                    fp = probe.get("fingerprint")
-                    if not ping or not stats or not fp:
-                        continue
-
-                    data[ia][timestamp][fp] = {
-                        "avg_rtt": stats.get("avg_rtt"),
-                        "mdev": stats.get("mdev_rtt"),
-                        "loss": stats.get("packet_loss"),
-                    }
-        except Exception as e:
-            print(f"[WARN] Failed to load {fname}: {e}")
+        data[probe["ia"]][timestamp][fp] = {
+            "avg_rtt": probe["avg_rtt"],
+            "mdev": probe["mdev_rtt"],
+            "loss": probe["packet_loss"],
+        }
     return data
 
 
 def match_and_compare(sp_data, mp_data):
     results = []
     for ia in sp_data:
-        for sp_time in sp_data[ia]:
-            for mp_time in mp_data.get(ia, {}):
-                if abs(sp_time - mp_time) > TIME_WINDOW:
+        for sp_time, mp_time in time_join.window_join(sp_data[ia], mp_data.get(ia, {}), TIME_WINDOW):
+            for fp, sp_stats in sp_data[ia][sp_time].items():
+                mp_stats = mp_data[ia][mp_time].get(fp)
+                if not mp_stats:
                     continue
 
-                for fp, sp_stats in sp_data[ia][sp_time].items():
-                    mp_stats = mp_data[ia][mp_time].get(fp)
-                    if not mp_stats:
-                        continue
-
-                    try:
-                        diff_rtt = sp_stats["avg_rtt"] - mp_stats["avg_rtt"]
-                        diff_jitter = sp_stats["mdev"] - mp_stats["mdev"]
-                        diff_loss = sp_stats["loss"] - mp_stats["loss"]
-                        results.append({
-                            "ia": ia,
-                            "fp": fp,
-                            "rtt_diff": diff_rtt,
-                            "jitter_diff": diff_jitter,
-                            "loss_diff": diff_loss
-                        })
-                    except:
-                        continue
+                try:
+                    diff_rtt = sp_stats["avg_rtt"] - mp_stats["avg_rtt"]
+                    diff_jitter = sp_stats["mdev"] - mp_stats["mdev"]
+                    diff_loss = sp_stats["loss"] - mp_stats["loss"]
+                    results.append({
+                        "ia": ia,
+                        "fp": fp,
+                        "rtt_diff": diff_rtt,
+                        "jitter_diff": diff_jitter,
+                        "loss_diff": diff_loss
+                    })
+                except:
+                    continue
     return results
 
 
@@ -143,10 +123,10 @@ def main():
     log("=== SCION SP vs MP Prober Path Comparison ===\n")
 
     log("Loading SP data...")
-    sp_data = load_prober_files(SP_PREFIX)
+    sp_data = load_prober_files(SP_TOOL)
 
     log("Loading MP data...")
-    mp_data = load_prober_files(MP_PREFIX)
+    mp_data = load_prober_files(MP_TOOL)
 
     log("Matching and comparing paths...\n")
     comparison_results = match_and_compare(sp_data, mp_data)
@@ -1,69 +1,55 @@
-import os
-import json
 import statistics
 from datetime import datetime
 from collections import defaultdict
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+import archive_records
 
 ARCHIVE_DIR = "/home/lars/Desktop/Scion_Project_Canada/NewTestData/biggertest"
-TR_PREFIX = "TR_"
-
-def parse_filename_timestamp(fname):
-    try:
-        ts_str = fname.split("_")[1]
-        return datetime.strptime(ts_str, "%Y-%m-%dT%H:%M")
-    except Exception as e:
-        print(f"[WARN] Timestamp parse error in {fname}: {e}")
-        return None
+DATASET_DIR = ""  # Parquet dataset from parquet_dataset.py, used instead of ARCHIVE_DIR if set
+IAS = []  # Only these destination IAs, all if empty
+SINCE = None  # Only files from this UTC datetime on, e.g. datetime.utcnow() - timedelta(days=3)
+UNTIL = None  # Only files before this UTC datetime
 
 def load_traceroute_data(archive_dir):
-    traces = []
-    for fname in os.listdir(archive_dir):
-        if not fname.startswith(TR_PREFIX) or not fname.endswith(".json"):
+    traces = {}
+    records = archive_records.load_records(
+        "traceroute", archive_dir, DATASET_DIR,
+        columns=["file", "file_ts", "isd_as", "rtt_count", "rtt_avg"],
+        ias=IAS, since=SINCE, until=UNTIL
+    )
+    # One record per hop, consecutive records of the same file form one trace
+    for hop in records:
+        if not hop["file_ts"]:
             continue
-        timestamp = parse_filename_timestamp(fname)
-        if not timestamp:
+        trace = traces.get(hop["file"])
+        if trace is None:
+            trace = traces[hop["file"]] = {
+                "timestamp": hop["file_ts"],
+                "hop_count": 0,
+                "missing_rtts": 0,
+                "rtts": [],
+                "as_rtt_map": defaultdict(list),
+                "as_hop_count": defaultdict(int)
+            }
+
+        trace["hop_count"] += 1
+        if not hop["rtt_count"]:
+            trace["missing_rtts"] += 1
             continue
-
-        path = os.path.join(archive_dir, fname)
-        try:
-            with open(path) as f:
-                doc = json.load(f)
-                hops = doc.get("hops", [])
-                if not hops:
-                    continue
-
-                rtts = []
-                as_rtt_map = defaultdict(list)
-                as_hop_count = defaultdict(int)
-                missing_rtts = 0
-
-                for hop in hops:
-                    isd_as = hop.get("isd_as")
-                    times = hop.get("round_trip_times", [])
-                    if not times:
-                        missing_rtts += 1
-                        continue
-                    avg_rtt = statistics.mean(times)
-                    rtts.append(avg_rtt)
-                    if isd_as:
-                        as_rtt_map[isd_as].append(avg_rtt)
-                        as_hop_count[isd_as] += 1
-
-                traces.append({
-                    "timestamp": timestamp,
-                    "hop_count": len(hops),
-                    "missing_rtts": missing_rtts,
-                    "avg_rtt": statistics.mean(rtts) if rtts else None,
-                    "as_rtt_map": dict(as_rtt_map),
-                    "as_hop_count": dict(as_hop_count)
-                })
-
-        except Exception as e:
-            print(f"[WARN] Failed to load {fname}: {e}")
-
-    return traces
+        trace["rtts"].append(hop["rtt_avg"])
+        if hop["isd_as"]:
+            trace["as_rtt_map"][hop["isd_as"]].append(hop["rtt_avg"])
+            trace["as_hop_count"][hop["isd_as"]] += 1
+
+    return [{
+        "timestamp": t["timestamp"],
+        "hop_count": t["hop_count"],
+        "missing_rtts": t["missing_rtts"],
+        "avg_rtt": statistics.mean(t["rtts"]) if t["rtts"] else None,
+        "as_rtt_map": dict(t["as_rtt_map"]),
+        "as_hop_count": dict(t["as_hop_count"])
+    } for t in traces.values()]
 
 def plot_time_series(traces):
     timestamps = [t["timestamp"] for t in traces]
@@ -0,0 +1,95 @@
+import os
+import json
+import mmap
+
+# Reader for the day bundles written by PythonTests/archive_compactor.py:
+#   <date>_<tool>.jsonl.zst   JSON lines {"name", "doc"} in independent zstd frames
+#   <date>_<tool>.idx.json    frame offsets and the frame/line of every record
+# Records can be streamed frame by frame, or a single one read through an mmap
+# of the bundle, decompressing only its frame. Needs the zstandard package.
+
+BUNDLE_SUFFIX = ".jsonl.zst"
+INDEX_SUFFIX = ".idx.json"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Reading archive bundles needs zstandard: pip install zstandard")
+    return zstandard
+
+def tool_for_bundle(fname):
+    """Tool of a <date>_<tool>.jsonl.zst file name, None for other files"""
+    if not fname.endswith(BUNDLE_SUFFIX):
+        return None
+    return fname[:-len(BUNDLE_SUFFIX)].split("_", 1)[-1]
+
+def find_bundles(archive_dir, tool=None):
+    """Bundle paths in archive_dir (of one tool if given), sorted by name"""
+    return [
+        os.path.join(archive_dir, fname) for fname in sorted(os.listdir(archive_dir))
+        if tool_for_bundle(fname) and (tool is None or tool_for_bundle(fname) == tool)
+    ]
+
+
+class Bundle:
+    def __init__(self, bundle_path):
+        self.bundle_path = bundle_path
+        with open(bundle_path[:-len(BUNDLE_SUFFIX)] + INDEX_SUFFIX, "r") as f:
+            self.index = json.load(f)
+        self.tool = self.index.get("tool") or tool_for_bundle(os.path.basename(bundle_path))
+        self._file = None
+        self._map = None
+        self._decompressor = _zstd().ZstdDecompressor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def __len__(self):
+        return len(self.index["records"])
+
+    def names(self):
+        return list(self.index["records"])
+
+    def _lines(self, block):
+        if self._map is None:
+            self._file = open(self.bundle_path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        offset, length, _ = self.index["blocks"][block]
+        return self._decompressor.decompress(self._map[offset:offset + length]).splitlines()
+
+    def get(self, name):
+        """The document of one original file, KeyError if it is not in the bundle"""
+        block, line = self.index["records"][name]
+        return json.loads(self._lines(block)[line])["doc"]
+
+    def records(self, names=None):
+        """Yields (file name, document) in bundle order, one frame in memory at a time.
+        With names only the frames holding one of them are decompressed."""
+        if names is None:
+            blocks = range(len(self.index["blocks"]))
+        else:
+            names = set(names)
+            blocks = sorted({self.index["records"][name][0] for name in names if name in self.index["records"]})
+        for block in blocks:
+            for line in self._lines(block):
+                record = json.loads(line)
+                if names is None or record["name"] in names:
+                    yield record["name"], record["doc"]
+
+
+def iter_bundle_records(archive_dir, tool=None):
+    """(file name, document) of every record in the bundles of archive_dir"""
+    for bundle_path in find_bundles(archive_dir, tool):
+        with Bundle(bundle_path) as bundle:
+            yield from bundle.records()
@@ -0,0 +1,439 @@
+import os
+import json
+import sqlite3
+import statistics
+from calendar import timegm
+from datetime import datetime, timezone
+import record_cache
+
+# Flattens the JSON files written by the PythonTests collectors into typed records.
+# One record is one row of the columnar dataset (see parquet_dataset.py); the
+# analyze_*.py loaders consume the same records whether they come from the raw
+# archive or from the dataset.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Extracted records are cached per file here, set to "" to always re-parse
+RECORD_CACHE_DIR = os.path.join(SCRIPT_DIR, ".record_cache")
+# Bump when the extractors change so cached records are re-extracted
+RECORDS_VERSION = 2
+# Metadata index of PythonTests/archive_index.py used to skip files outside an IA/time
+# query, "" uses <archive_dir>/archive_index.db if it exists
+ARCHIVE_INDEX = ""
+
+TOOL_PREFIXES = {
+    "prober": "prober_",
+    "mp-prober": "mp-prober_",
+    "traceroute": "TR_",
+    "bw": "BW_",
+    "bw-mp": "BW-P_",
+    "comparer": "delta_",
+}
+
+# Column name -> type, shared by every tool
+FILE_COLUMNS = [
+    ("file", "string"),
+    ("file_ts", "timestamp"),
+    ("ia", "string"),
+]
+
+BW_DIRECTION_COLUMNS = [
+    ("present", "bool"),
+    ("attempted_mbps", "float"),
+    ("achieved_mbps", "float"),
+    ("loss_pct", "float"),
+    ("ia_min_ms", "float"),
+    ("ia_avg_ms", "float"),
+    ("ia_max_ms", "float"),
+    ("ia_mdev_ms", "float"),
+]
+
+# One row per probe
+PROBER_COLUMNS = FILE_COLUMNS + [
+    ("ts", "timestamp"),
+    ("fingerprint", "string"),
+    ("sequence", "string"),
+    ("has_ping", "bool"),
+    ("avg_rtt", "float"),
+    ("min_rtt", "float"),
+    ("max_rtt", "float"),
+    ("mdev_rtt", "float"),
+    ("packet_loss", "float"),
+    ("sent", "int"),
+    ("received", "int"),
+    ("seq_issue", "bool"),
+]
+
+SCHEMAS = {
+    "prober": PROBER_COLUMNS,
+    "mp-prober": PROBER_COLUMNS,
+    # One row per hop
+    "traceroute": FILE_COLUMNS + [
+        ("fingerprint", "string"),
+        ("hop_index", "int"),
+        ("isd_as", "string"),
+        ("interface_id", "int"),
+        ("rtt_count", "int"),
+        ("rtt_avg", "float"),
+    ],
+    # One row per tested path, a file without paths still gets one row so it is counted
+    "bw": FILE_COLUMNS + [
+        ("tier_mbps", "int"),
+        ("legacy", "bool"),
+        ("path_index", "int"),
+        ("fingerprint", "string"),
+        ("error_type", "string"),
+        ("invalid_format", "bool"),
+    ] + [(f"sc_{name}", typ) for name, typ in BW_DIRECTION_COLUMNS]
+      + [(f"cs_{name}", typ) for name, typ in BW_DIRECTION_COLUMNS],
+    # One row per delta file (change is null) plus one row per reported change
+    "comparer": FILE_COLUMNS + [
+        ("ts", "timestamp"),
+        ("source", "string"),
+        ("change_status", "string"),
+        ("change", "string"),
+        ("fingerprint", "string"),
+        ("sequence", "string"),
+    ],
+}
+SCHEMAS["bw-mp"] = SCHEMAS["bw"]
+
+
+def tool_for_file(fname):
+    if not fname.endswith(".json"):
+        return None
+    for tool, prefix in TOOL_PREFIXES.items():
+        if fname.startswith(prefix):
+            return tool
+    return None
+
+def parse_timestamp(timestamp_str):
+    """Naive UTC datetime from the timestamp formats the collectors used so far"""
+    if not timestamp_str:
+        return None
+    for fmt in ("%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M:%SZ"):
+        try:
+            return datetime.strptime(timestamp_str, fmt)
+        except ValueError:
+            continue
+    from dateutil import parser  # Anything else, e.g. with offsets
+    try:
+        ts = parser.parse(timestamp_str)
+    except (ValueError, OverflowError):
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def parse_filename_timestamp(fname):
+    # <prefix>_<timestamp>_..., BW-P files use '-' instead of ':' in the time part
+    try:
+        ts_str = fname.split("_")[1]
+        if "-" in ts_str and ":" not in ts_str:
+            date, time = ts_str.split("T")
+            time_parts = time.split("-")
+            ts_str = f"{date}T{time_parts[0]}:{time_parts[1]}"
+        return datetime.strptime(ts_str, "%Y-%m-%dT%H:%M")
+    except (IndexError, ValueError):
+        return None
+
+def ia_from_filename(fname):
+    # ..._AS_<isd>-<as with '_' for ':'>_...
+    parts = fname.split("_AS_")
+    if len(parts) < 2:
+        return None
+    norm = parts[1].split(".")[0]
+    isd, _, rest = norm.partition("-")
+    as_parts = rest.split("_")[:3]
+    return f"{isd}-{':'.join(as_parts)}" if len(as_parts) == 3 else None
+
+def _float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _int(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _file_fields(fname, ia):
+    return {"file": fname, "file_ts": parse_filename_timestamp(fname), "ia": ia}
+
+def extract_prober(fname, doc):
+    rows = []
+    base = _file_fields(fname, doc.get("ia"))
+    base["ts"] = parse_timestamp(doc.get("timestamp"))
+    for probe in doc.get("probes") or []:
+        ping = probe.get("ping_result") or {}
+        stats = ping.get("statistics") or {}
+        seqs = [r.get("scmp_seq") for r in ping.get("replies", []) if "scmp_seq" in r]
+        rows.append({
+            **base,
+            "fingerprint": probe.get("fingerprint"),
+            "sequence": probe.get("sequence"),
+            "has_ping": bool(ping and stats),
+            "avg_rtt": _float(stats.get("avg_rtt")),
+            "min_rtt": _float(stats.get("min_rtt")),
+            "max_rtt": _float(stats.get("max_rtt")),
+            "mdev_rtt": _float(stats.get("mdev_rtt")),
+            "packet_loss": _float(stats.get("packet_loss")),
+            "sent": _int(stats.get("sent")),
+            "received": _int(stats.get("received")),
+            "seq_issue": bool(seqs) and seqs != sorted(seqs),
+        })
+    return rows
+
+def extract_traceroute(fname, doc):
+    path = doc.get("path") or {}
+    path_hops = path.get("hops") or []
+    ia = path_hops[-1].get("isd_as") if path_hops else None
+    base = _file_fields(fname, ia or ia_from_filename(fname))
+    base["fingerprint"] = path.get("fingerprint")
+
+    rows = []
+    for index, hop in enumerate(doc.get("hops") or []):
+        times = hop.get("round_trip_times") or []
+        rows.append({
+            **base,
+            "hop_index": index,
+            "isd_as": hop.get("isd_as"),
+            "interface_id": _int(hop.get("interface_id")),
+            "rtt_count": len(times),
+            "rtt_avg": statistics.mean(times) if times else None,
+        })
+    return rows
+
+def parse_bps(value):
+    """Mbps from a number in bps (bwtest_parser) or the legacy "<bps> bps / <x> Mbps" string"""
+    if isinstance(value, (int, float)):
+        return value / 1e6
+    try:
+        return float(value.split(" ")[0]) / 1e6
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def parse_loss(direction):
+    """Loss in percent from loss_fraction (bwtest_parser) or the legacy "<x> %" loss_rate string"""
+    if "loss_fraction" in direction:
+        loss = _float(direction["loss_fraction"])
+        return loss * 100 if loss is not None else None
+    try:
+        return float(direction.get("loss_rate", "").strip('%'))
+    except (AttributeError, ValueError):
+        return None
+
+def parse_interarrival(direction):
+    """(min, avg, max, mdev) in ms from interarrival_ms (bwtest_parser) or the legacy "a/b/c/d ms" string"""
+    typed = direction.get("interarrival_ms")
+    if isinstance(typed, dict):
+        return tuple(_float(typed.get(key)) for key in ("min", "avg", "max", "mdev"))
+    try:
+        inter_str = direction.get("interarrival time min/avg/max/mdev")
+        values = tuple(map(float, inter_str.replace(" ms", "").split("/")))
+        return values if len(values) == 4 else (None, None, None, None)
+    except (AttributeError, ValueError):
+        return None, None, None, None
+
+def _bw_direction(prefix, direction):
+    if not direction:
+        return {f"{prefix}_{name}": (False if name == "present" else None) for name, _ in BW_DIRECTION_COLUMNS}
+    ia_min, ia_avg, ia_max, ia_mdev = parse_interarrival(direction)
+    return {
+        f"{prefix}_present": True,
+        f"{prefix}_attempted_mbps": parse_bps(direction.get("attempted_bps")),
+        f"{prefix}_achieved_mbps": parse_bps(direction.get("achieved_bps")),
+        f"{prefix}_loss_pct": parse_loss(direction),
+        f"{prefix}_ia_min_ms": ia_min,
+        f"{prefix}_ia_avg_ms": ia_avg,
+        f"{prefix}_ia_max_ms": ia_max,
+        f"{prefix}_ia_mdev_ms": ia_mdev,
+    }
+
+def _bw_row(base, path_result, legacy):
+    result = path_result.get("result") or {}
+    return {
+        **base,
+        "legacy": legacy,
+        "path_index": _int(path_result.get("path_index")),
+        "fingerprint": path_result.get("fingerprint"),
+        "error_type": path_result.get("error_type"),
+        "invalid_format": bool(result.get("invalid_format")),
+        **_bw_direction("sc", result.get("S->C results")),
+        **_bw_direction("cs", result.get("C->S results")),
+    }
+
+def extract_bw(fname, doc):
+    ia = (doc.get("target_server") or {}).get("ia") or doc.get("as")
+    base = _file_fields(fname, ia)
+    base["tier_mbps"] = _int((doc.get("target") or {}).get("tier_mbps") or doc.get("target_mbps"))
+
+    if "paths" not in doc:
+        # bw_collector_scion layout: the document itself is the single result
+        return [_bw_row(base, doc, legacy=True)]
+    rows = [_bw_row(base, p, legacy=False) for p in doc.get("paths") or []]
+    return rows or [_bw_row(base, {}, legacy=False)]
+
+def extract_comparer(fname, doc):
+    base = _file_fields(fname, doc.get("destination"))
+    base.update({
+        "ts": parse_timestamp(doc.get("timestamp")),
+        "source": doc.get("source"),
+        "change_status": doc.get("change_status"),
+    })
+    rows = [{**base, "change": None, "fingerprint": None, "sequence": None}]
+    for change in doc.get("changes") or []:
+        rows.append({
+            **base,
+            "change": change.get("change"),
+            "fingerprint": change.get("fingerprint"),
+            "sequence": change.get("sequence"),
+        })
+    return rows
+
+EXTRACTORS = {
+    "prober": extract_prober,
+    "mp-prober": extract_prober,
+    "traceroute": extract_traceroute,
+    "bw": extract_bw,
+    "bw-mp": extract_bw,
+    "comparer": extract_comparer,
+}
+
+def extract_file(path, tool=None):
+    """Records of one archive file; raises on unreadable JSON"""
+    fname = os.path.basename(path)
+    tool = tool or tool_for_file(fname)
+    with open(path) as f:
+        doc = json.load(f)
+    return EXTRACTORS[tool](fname, doc)
+
+def extract_bundle(path, tool, wanted=None):
+    """[(file name, records)] of the files packed in a day bundle (archive_bundles.py),
+    only those for which wanted(file name) is true if given"""
+    import archive_bundles
+    with archive_bundles.Bundle(path) as bundle:
+        names = [fname for fname in bundle.names() if wanted(fname)] if wanted else None
+        return [(fname, EXTRACTORS[tool](fname, doc)) for fname, doc in bundle.records(names)]
+
+def matches_query(row, ias=None, since=None, until=None):
+    """Whether a record belongs to one of ias and its file timestamp lies in [since, until)"""
+    if ias and row.get("ia") not in ias:
+        return False
+    ts = row.get("file_ts")
+    if (since or until) and ts is None:
+        return False
+    return not (since and ts < since) and not (until and ts >= until)
+
+def query_index(archive_dir, tool, ias=None, since=None, until=None):
+    """(matching, known) file names of `tool` in the archive index, None without an index"""
+    db_path = ARCHIVE_INDEX or os.path.join(archive_dir, "archive_index.db")
+    if not os.path.exists(db_path):
+        return None
+    query = "SELECT name FROM files WHERE tool = ?"
+    params = [tool]
+    if ias:
+        query += f" AND ia IN ({','.join('?' for _ in ias)})"
+        params += list(ias)
+    if since:
+        query += " AND ts >= ?"
+        params.append(timegm(since.timetuple()))
+    if until:
+        query += " AND ts < ?"
+        params.append(timegm(until.timetuple()))
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        matching = {name for name, in conn.execute(query, params)}
+        known = {name for name, in conn.execute("SELECT name FROM files WHERE tool = ?", (tool,))}
+    except sqlite3.Error as e:
+        print(f"[WARN] Archive index {db_path} not usable: {e}")
+        return None
+    finally:
+        conn.close()
+    return matching, known
+
+def iter_archive_records(archive_dir, tool, ias=None, since=None, until=None):
+    """Records of every `tool` file in a flat archive directory, ordered by file name.
+    Files packed into day bundles by archive_compactor.py are read as well.
+    Unchanged files are served from the record cache if RECORD_CACHE_DIR is set,
+    the others are parsed in parallel by parallel_loader.
+    With ias/since/until (naive UTC datetimes) only records of those IAs and file
+    timestamps are returned; files the archive index knows to be outside the query
+    are not read at all."""
+    import parallel_loader
+    import archive_bundles
+    filtered = bool(ias or since or until)
+    selection = query_index(archive_dir, tool, ias, since, until) if filtered else None
+    wanted = None
+    if selection:
+        matching, known = selection
+        wanted = lambda fname: fname in matching or fname not in known
+    cache = record_cache.open_cache(RECORD_CACHE_DIR, archive_dir, tool, RECORDS_VERSION) if RECORD_CACHE_DIR else None
+    paths = [
+        os.path.join(archive_dir, f) for f in sorted(os.listdir(archive_dir))
+        if tool_for_file(f) == tool and (wanted is None or wanted(f))
+    ]
+    bundles = archive_bundles.find_bundles(archive_dir, tool)
+
+    records = {}
+    stats = {}
+    to_parse = []
+    for path in paths:
+        try:
+            stats[path] = os.stat(path)
+        except OSError as e:
+            print(f"[WARN] Failed to parse {os.path.basename(path)}: {e}")
+            continue
+        rows = cache.get(path, stats[path]) if cache else None
+        if rows is None:
+            to_parse.append(path)
+        else:
+            records[path] = rows
+
+    for path, rows, error in parallel_loader.extract_files(to_parse, tool):
+        if error:
+            print(f"[WARN] Failed to parse {os.path.basename(path)}: {error}")
+            continue
+        records[path] = rows
+        if cache:
+            cache.put(path, stats[path], rows)
+
+    by_name = {os.path.basename(path): rows for path, rows in records.items()}
+    for path in bundles:
+        try:
+            stat = os.stat(path)
+            packed = cache.get(path, stat) if cache else None
+            if packed is None and wanted:
+                # Partial reads are not cached
+                packed = extract_bundle(path, tool, wanted)
+            elif packed is None:
+                packed = extract_bundle(path, tool)
+                if cache:
+                    cache.put(path, stat, packed)
+        except Exception as e:
+            print(f"[WARN] Failed to read bundle {os.path.basename(path)}: {e}")
+            continue
+        records[path] = packed
+        for fname, rows in packed:
+            by_name.setdefault(fname, rows)
+
+    if cache:
+        if wanted is None:
+            cache.retain(records)
+        cache.save()
+
+    for fname in sorted(by_name):
+        if wanted and not wanted(fname):
+            continue
+        for row in by_name[fname]:
+            if not filtered or matches_query(row, ias, since, until):
+                yield row
+
+def load_records(tool, archive_dir, dataset_dir="", columns=None, ias=None, since=None, until=None):
+    """Records from the Parquet dataset if one is configured, else from the JSON archive.
+    ias, since and until (naive UTC datetimes) restrict them to an IA/time query."""
+    if dataset_dir:
+        import parquet_dataset
+        return parquet_dataset.iter_records(dataset_dir, tool, columns, ias, since=since, until=until)
+    return iter_archive_records(archive_dir, tool, ias, since, until)
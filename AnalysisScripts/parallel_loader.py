@@ -0,0 +1,38 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import archive_records
+
+# Parses archive files in a process pool.
+# Files are split into chunks, every worker returns only the extracted records
+# of its chunk (no JSON documents cross the process boundary). Results are put
+# back in the order of the input paths, so the merged output does not depend
+# on which worker finished first.
+
+LOADER_WORKERS = os.cpu_count() or 1
+LOADER_CHUNK_SIZE = 100
+MIN_PARALLEL_FILES = 200  # Below this, starting the pool costs more than it saves
+
+
+def _extract_chunk(tool, paths):
+    results = []
+    for path in paths:
+        try:
+            results.append((path, archive_records.extract_file(path, tool), None))
+        except Exception as e:
+            results.append((path, None, str(e)))
+    return results
+
+def extract_files(paths, tool, workers=None, chunk_size=None):
+    """Returns [(path, records or None, error or None)] in the order of `paths`"""
+    workers = workers or LOADER_WORKERS
+    chunk_size = chunk_size or LOADER_CHUNK_SIZE
+    if workers <= 1 or len(paths) < MIN_PARALLEL_FILES:
+        return _extract_chunk(tool, paths)
+
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    results = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        # map() yields in submission order
+        for chunk_results in executor.map(_extract_chunk, [tool] * len(chunks), chunks):
+            results.extend(chunk_results)
+    return results
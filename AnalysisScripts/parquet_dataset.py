@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+import archive_records
+import archive_bundles
+
+# Columnar copy of the measurement archive.
+# The records of archive_records.py are written as Parquet files laid out as
+#   <dataset_dir>/<tool>/<normalized IA>/<YYYY-MM-DD>/part-<ingest time>.parquet
+# Readers only open the files of the requested tool (and IAs/days) and only
+# decode the requested columns. Ingestion is incremental: files listed in
+# <dataset_dir>/ingested.json are skipped, new ones go to a new part file.
+#
+# Usage: python3 parquet_dataset.py <archive_dir> <dataset_dir>
+
+ARCHIVE_DIR = ""
+DATASET_DIR = ""
+STATE_FILE = "ingested.json"
+FLUSH_EVERY = 5000  # Files per written batch, bounds memory use during ingestion
+
+
+def normalize_as(as_str):
+    return as_str.replace(":", "_")
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.dataset
+    except ImportError:
+        raise RuntimeError("The Parquet dataset needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+def arrow_schema(tool):
+    pa = _pyarrow()
+    types = {
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us"),
+        "float": pa.float64(),
+        "int": pa.int64(),
+        "bool": pa.bool_(),
+    }
+    return pa.schema([(name, types[typ]) for name, typ in archive_records.SCHEMAS[tool]])
+
+def partition_of(tool, row):
+    ts = row.get("file_ts") or row.get("ts")
+    ia = normalize_as(row["ia"]) if row.get("ia") else "unknown"
+    return tool, ia, ts.strftime("%Y-%m-%d") if ts else "unknown"
+
+def _load_state(dataset_dir):
+    try:
+        with open(os.path.join(dataset_dir, STATE_FILE)) as f:
+            return set(json.load(f))
+    except (OSError, json.JSONDecodeError):
+        return set()
+
+def _save_state(dataset_dir, ingested):
+    path = os.path.join(dataset_dir, STATE_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(sorted(ingested), f)
+    os.replace(tmp_path, path)
+
+def _write_partitions(dataset_dir, partitions, part_name):
+    pa = _pyarrow()
+    for (tool, ia, day), rows in partitions.items():
+        part_dir = os.path.join(dataset_dir, tool, ia, day)
+        os.makedirs(part_dir, exist_ok=True)
+        table = pa.Table.from_pylist(rows, schema=arrow_schema(tool))
+        path = os.path.join(part_dir, part_name)
+        pa.parquet.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+def ingest_archive(archive_dir, dataset_dir):
+    """Adds all not yet ingested measurement files below archive_dir, returns the number of files added"""
+    _pyarrow()
+    os.makedirs(dataset_dir, exist_ok=True)
+    ingested = _load_state(dataset_dir)
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    partitions = defaultdict(list)
+    pending = []
+    added = 0
+    batch = 0
+
+    def flush():
+        nonlocal batch
+        if pending:
+            _write_partitions(dataset_dir, partitions, f"part-{run_id}-{batch}.parquet")
+            ingested.update(pending)
+            _save_state(dataset_dir, ingested)
+            partitions.clear()
+            pending.clear()
+            batch += 1
+
+    def add(tool, fname, rows):
+        nonlocal added
+        for row in rows:
+            partitions[partition_of(tool, row)].append(row)
+        pending.append(fname)
+        added += 1
+        if len(pending) >= FLUSH_EVERY:
+            flush()
+
+    for root, _, files in os.walk(archive_dir):
+        for fname in sorted(files):
+            tool = archive_records.tool_for_file(fname)
+            if not tool or fname in ingested:
+                continue
+            try:
+                rows = archive_records.extract_file(os.path.join(root, fname), tool)
+            except Exception as e:
+                print(f"[WARN] Failed to parse {fname}: {e}")
+                continue
+            add(tool, fname, rows)
+
+        # Day bundles of archive_compactor.py
+        for bundle_path in archive_bundles.find_bundles(root):
+            tool = archive_bundles.tool_for_bundle(os.path.basename(bundle_path))
+            if tool not in archive_records.EXTRACTORS:
+                continue
+            try:
+                with archive_bundles.Bundle(bundle_path) as bundle:
+                    for fname, doc in bundle.records():
+                        if fname not in ingested and fname not in pending:
+                            add(tool, fname, archive_records.EXTRACTORS[tool](fname, doc))
+            except Exception as e:
+                print(f"[WARN] Failed to read bundle {os.path.basename(bundle_path)}: {e}")
+    flush()
+    return added
+
+def dataset_files(dataset_dir, tool, ias=None, days=None):
+    """Part files of `tool`, optionally only those of the given IAs and days (YYYY-MM-DD)"""
+    tool_dir = os.path.join(dataset_dir, tool)
+    if not os.path.isdir(tool_dir):
+        return []
+    wanted_ias = {normalize_as(ia) for ia in ias} if ias else None
+    wanted_days = set(days) if days else None
+    files = []
+    for ia in sorted(os.listdir(tool_dir)):
+        if wanted_ias is not None and ia not in wanted_ias:
+            continue
+        ia_dir = os.path.join(tool_dir, ia)
+        for day in sorted(os.listdir(ia_dir)):
+            if wanted_days is not None and day not in wanted_days:
+                continue
+            day_dir = os.path.join(ia_dir, day)
+            files += [os.path.join(day_dir, f) for f in sorted(os.listdir(day_dir)) if f.endswith(".parquet")]
+    return files
+
+def read_table(dataset_dir, tool, columns=None, ias=None, days=None):
+    """pyarrow Table with the requested columns of `tool`"""
+    pa = _pyarrow()
+    schema = arrow_schema(tool)
+    files = dataset_files(dataset_dir, tool, ias, days)
+    if not files:
+        table = schema.empty_table()
+        return table.select(columns) if columns else table
+    return pa.dataset.dataset(files, schema=schema, format="parquet").to_table(columns=columns)
+
+def days_between(since, until=None):
+    """YYYY-MM-DD day partitions from since up to until (default today UTC)"""
+    last = (until or datetime.utcnow()).date()
+    day = since.date()
+    days = []
+    while day <= last:
+        days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+def iter_records(dataset_dir, tool, columns=None, ias=None, days=None, since=None, until=None):
+    """Yields the rows of `tool` as dicts, like archive_records.iter_archive_records.
+    since/until (naive UTC datetimes) select day partitions and filter on file_ts."""
+    if since:
+        days = days_between(since, until)
+    if (since or until) and columns and "file_ts" not in columns:
+        columns = list(columns) + ["file_ts"]
+    for batch in read_table(dataset_dir, tool, columns, ias, days).to_batches():
+        for row in batch.to_pylist():
+            if archive_records.matches_query(row, since=since, until=until):
+                yield row
+
+
+def main():
+    archive_dir = sys.argv[1] if len(sys.argv) > 1 else ARCHIVE_DIR
+    dataset_dir = sys.argv[2] if len(sys.argv) > 2 else DATASET_DIR
+    if not archive_dir or not dataset_dir:
+        print("Usage: python3 parquet_dataset.py <archive_dir> <dataset_dir>")
+        sys.exit(1)
+    added = ingest_archive(archive_dir, dataset_dir)
+    print(f"[OK] Ingested {added} new files into {dataset_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+import json
+import pickle
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+# Renders the analyzer figures, skipping unchanged ones.
+# Every figure is described by a Figure (output path, render function and the
+# data it plots). The hash of render function and data is stored per PNG in
+# PLOT_HASH_FILE; a figure is only drawn again if its hash changed or the PNG is
+# missing. Figures that need drawing are rendered in a process pool with the
+# Agg backend.
+
+PLOT_HASH_FILE = ".plot_hashes.json"
+PLOT_WORKERS = os.cpu_count() or 1
+MIN_PARALLEL_FIGURES = 8
+RENDER_VERSION = 1  # Bump when the render functions change, forces a full redraw
+
+
+class Figure:
+    def __init__(self, path, render, message=None, **data):
+        self.path = path
+        self.render = render  # Module level function render(path, **data)
+        self.data = data
+        self.message = message or f"[Saved plot to {path}]"
+
+    def digest(self):
+        payload = pickle.dumps((RENDER_VERSION, self.render.__module__, self.render.__name__, self.data), protocol=4)
+        return hashlib.sha256(payload).hexdigest()
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _render(figure):
+    os.makedirs(os.path.dirname(figure.path) or ".", exist_ok=True)
+    figure.render(figure.path, **figure.data)
+    return figure.path
+
+def _load_hashes():
+    try:
+        with open(PLOT_HASH_FILE) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def _save_hashes(hashes):
+    tmp_path = f"{PLOT_HASH_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(hashes, f, indent=0, sort_keys=True)
+    os.replace(tmp_path, PLOT_HASH_FILE)
+
+def render_all(figures, workers=None):
+    """Draws the figures whose data changed since the last run, returns the number drawn"""
+    workers = workers or PLOT_WORKERS
+    hashes = _load_hashes()
+    pending = []
+    for figure in figures:
+        digest = figure.digest()
+        if hashes.get(figure.path) == digest and os.path.isfile(figure.path):
+            print(f"[Unchanged] {figure.path}")
+            continue
+        pending.append((figure, digest))
+
+    todo = [figure for figure, _ in pending]
+    if workers <= 1 or len(todo) < MIN_PARALLEL_FIGURES:
+        list(map(_render, todo))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            list(executor.map(_render, todo, chunksize=max(1, len(todo) // (workers * 4))))
+
+    for figure, digest in pending:
+        hashes[figure.path] = digest
+        print(figure.message)
+    _save_hashes(hashes)
+    return len(todo)
+
+
+# Render functions shared by the analyzers. They run in worker processes and
+# therefore only use pyplot and their arguments.
+
+def render_lines(path, lines, title, xlabel, ylabel, figsize=(12, 4), legend_title=None,
+                 legend=False, date_format=None, grid=True):
+    """lines: [(x values, y values, plot kwargs)]"""
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    plt.figure(figsize=figsize)
+    for x, y, kwargs in lines:
+        plt.plot(x, y, **kwargs)
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    if legend or legend_title:
+        plt.legend(title=legend_title)
+    plt.grid(grid)
+    if date_format:
+        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter(date_format))
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def render_histogram(path, values, title, xlabel, ylabel, bins=20, color=None, figsize=(8, 4)):
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=figsize)
+    plt.hist(values, bins=bins, color=color)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.title(title)
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
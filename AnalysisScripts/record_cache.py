@@ -0,0 +1,64 @@
+import os
+import pickle
+import hashlib
+
+# Persistent cache of extracted records, one pickle per (archive dir, tool).
+# Entries are keyed by file path and only reused while size and mtime are
+# unchanged, so re-running an analysis after a new day was added only parses
+# the new files.
+
+
+class RecordCache:
+    def __init__(self, cache_file, version):
+        self.cache_file = cache_file
+        self.version = version
+        self.entries = {}  # path -> (size, mtime_ns, records)
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_file, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return
+        if isinstance(data, dict) and data.get("version") == self.version:
+            self.entries = data.get("entries", {})
+
+    def get(self, path, stat):
+        entry = self.entries.get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def put(self, path, stat, records):
+        self.entries[path] = (stat.st_size, stat.st_mtime_ns, records)
+        self.dirty = True
+
+    def retain(self, paths):
+        """Drops entries of files that are no longer in the archive"""
+        stale = set(self.entries) - set(paths)
+        for path in stale:
+            del self.entries[path]
+        self.dirty = self.dirty or bool(stale)
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": self.version, "entries": self.entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_file)
+        self.dirty = False
+
+
+_caches = {}
+
+def open_cache(cache_dir, archive_dir, tool, version):
+    """Shared RecordCache of `tool` files in `archive_dir`, loaded once per process"""
+    archive_key = hashlib.sha1(os.path.abspath(archive_dir).encode()).hexdigest()[:12]
+    cache_file = os.path.join(cache_dir, f"{tool}_{archive_key}.pickle")
+    if cache_file not in _caches:
+        _caches[cache_file] = RecordCache(cache_file, version)
+    return _caches[cache_file]
@@ -0,0 +1,65 @@
+from datetime import timedelta
+import numpy as np
+
+# Buckets time series into fixed intervals with NumPy.
+# All samples are sorted once by (key, bucket); mean, count, min and max of
+# every bucket are then computed with ufunc.reduceat over the bucket bounds.
+
+MINUTE = timedelta(minutes=1)
+FIVE_MINUTES = timedelta(minutes=5)
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+def resample(times, values, resolution=HOUR, keys=None, percentiles=()):
+    """Aggregates (time, key, value) samples into buckets of `resolution`.
+
+    Returns {key: {"time": [bucket start datetimes], "mean", "count", "min",
+    "max", "p<q>" for every q in percentiles}}, each a list ascending by time.
+    Keys keep the order of their first sample; without keys everything is under None.
+    """
+    if len(times) == 0:
+        return {}
+    t = np.asarray(times, dtype="datetime64[us]").astype(np.int64)
+    v = np.asarray(values, dtype=float)
+    step = int(resolution.total_seconds() * 1_000_000)
+    buckets = t - np.mod(t, step)
+
+    key_index = {}
+    if keys is None:
+        codes = np.zeros(len(t), dtype=np.int64)
+        key_index[None] = 0
+    else:
+        codes = np.fromiter((key_index.setdefault(k, len(key_index)) for k in keys), dtype=np.int64, count=len(t))
+
+    order = np.lexsort((buckets, codes))
+    codes, buckets, v = codes[order], buckets[order], v[order]
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (buckets[1:] != buckets[:-1])])
+    ends = np.r_[starts[1:], len(v)]
+
+    counts = ends - starts
+    stats = {
+        "time": buckets[starts].astype("datetime64[us]").tolist(),
+        "mean": (np.add.reduceat(v, starts) / counts).tolist(),
+        "count": counts.tolist(),
+        "min": np.minimum.reduceat(v, starts).tolist(),
+        "max": np.maximum.reduceat(v, starts).tolist(),
+    }
+    for q in percentiles:
+        stats[f"p{q:g}"] = [float(np.percentile(v[s:e], q)) for s, e in zip(starts, ends)]
+
+    # Split the flat bucket arrays per key
+    group_codes = codes[starts]
+    bounds = np.flatnonzero(np.r_[True, group_codes[1:] != group_codes[:-1], True])
+    by_code = {}
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        by_code[int(group_codes[lo])] = {name: column[lo:hi] for name, column in stats.items()}
+    return {key: by_code[code] for key, code in key_index.items() if code in by_code}
+
+def bucket_means(samples, resolution=HOUR):
+    """[(bucket start, mean)] of (time, value) samples, ascending by time"""
+    if not samples:
+        return []
+    times, values = zip(*samples)
+    series = resample(times, values, resolution)[None]
+    return list(zip(series["time"], series["mean"]))
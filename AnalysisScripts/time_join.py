@@ -0,0 +1,46 @@
+from bisect import bisect_left, bisect_right
+
+# Joins two series of timestamps on sorted arrays.
+# Each lookup is a binary search, so joining n left with m right timestamps
+# costs O((n + m) log m) instead of comparing every pair.
+
+
+class TimeIndex:
+    def __init__(self, times):
+        self.times = sorted(times)
+
+    def within(self, t, window):
+        """All indexed timestamps with |ts - t| <= window, ascending"""
+        lo = bisect_left(self.times, t - window)
+        hi = bisect_right(self.times, t + window)
+        return self.times[lo:hi]
+
+    def nearest(self, t, window=None):
+        """Closest indexed timestamp to t (the later one on a tie), None if there is none within window"""
+        i = bisect_left(self.times, t)
+        candidates = self.times[max(i - 1, 0):i + 1]
+        if not candidates:
+            return None
+        best = None
+        for ts in candidates:
+            if best is None or abs(ts - t) <= abs(best - t):
+                best = ts
+        if window is not None and abs(best - t) > window:
+            return None
+        return best
+
+
+def nearest_join(left_times, right_times, window=None):
+    """[(left, closest right)] for every left timestamp with a match within window, in left order"""
+    index = TimeIndex(right_times)
+    pairs = []
+    for t in left_times:
+        match = index.nearest(t, window)
+        if match is not None:
+            pairs.append((t, match))
+    return pairs
+
+def window_join(left_times, right_times, window):
+    """[(left, right)] for every pair within window, in left order and ascending right"""
+    index = TimeIndex(right_times)
+    return [(t, match) for t in left_times for match in index.within(t, window)]
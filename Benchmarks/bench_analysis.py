@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import tempfile
+import importlib.util
+from datetime import datetime
+import gen_archive
+
+# Scaling benchmark of the analysis scripts on synthetic archives (gen_archive.py).
+# For every scale an archive of scale x the base volume (--days, default the 4
+# weeks of the campaign) is generated and every analyzer runs on it in its own
+# process, from a fresh working directory and with an empty record cache. Wall
+# time, CPU time and max single-process RSS (the largest of the analyzer and its
+# loader and plot workers, not their sum) are recorded; the growth exponent
+# between two scales is
+#   log(time ratio) / log(size ratio)
+# so 1.0 is linear, clearly above 1 points to a scaling problem. With --warm
+# every analyzer runs a second time with the record and plot caches filled.
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYSIS_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "AnalysisScripts"))
+
+ANALYZERS = [
+    "analyze_bw",
+    "analyze_prober",
+    "analyze_comparer",
+    "analyze_sp-mp-bw",
+    "analyze_sp-mp-prober",
+    "analyze_traceroute"
+]
+
+
+def run_one(script, archive_dir, cache_dir):
+    """Runs one analyzer in this process, called in the child of run_analyzer()"""
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    sys.path.insert(0, ANALYSIS_DIR)
+    import archive_records
+    archive_records.RECORD_CACHE_DIR = cache_dir
+    spec = importlib.util.spec_from_file_location(script.replace("-", "_"), os.path.join(ANALYSIS_DIR, f"{script}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.ARCHIVE_DIR = archive_dir
+    if hasattr(module, "DATASET_DIR"):
+        module.DATASET_DIR = ""
+    module.main()
+
+def run_analyzer(script, archive_dir, work_dir, cache_dir):
+    """Runs one analyzer in a child process, returns (exit code, wall seconds, rusage)"""
+    os.makedirs(work_dir, exist_ok=True)
+    started = time.monotonic()
+    with open(os.path.join(work_dir, "stdout.txt"), "a") as out:
+        pid = os.fork()
+        if pid == 0:
+            os.chdir(work_dir)
+            os.dup2(out.fileno(), 1)
+            os.dup2(out.fileno(), 2)
+            try:
+                run_one(script, archive_dir, cache_dir)
+                code = 0
+            except BaseException as e:
+                print(f"[ERROR] {script} failed: {e!r}", flush=True)
+                code = 1
+            sys.stdout.flush()
+            os._exit(code)
+        _, status, usage = os.wait4(pid, 0)
+    return os.waitstatus_to_exitcode(status), time.monotonic() - started, usage
+
+def measure(script, archive_dir, work_dir, cache_dir):
+    exit_code, wall, usage = run_analyzer(script, archive_dir, work_dir, cache_dir)
+    return {
+        "exit_code": exit_code,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(usage.ru_utime + usage.ru_stime, 3),
+        "max_rss_mb": round(usage.ru_maxrss / 1024, 1)
+    }
+
+def growth_exponents(results, metric="wall_s"):
+    """{analyzer: [exponent between consecutive scales]}"""
+    exponents = {}
+    for previous, current in zip(results, results[1:]):
+        size_ratio = current["bytes"] / previous["bytes"] if previous["bytes"] else None
+        for script, run in current["analyzers"].items():
+            before = previous["analyzers"].get(script, {}).get("cold", {}).get(metric)
+            after = run["cold"].get(metric)
+            if size_ratio and size_ratio > 1 and before and after:
+                exponents.setdefault(script, []).append(round(math.log(after / before) / math.log(size_ratio), 2))
+    return exponents
+
+def print_results(results):
+    print(f"{'analyzer':<24}{'scale':>7}{'files':>10}{'MB':>9}{'wall s':>10}{'cpu s':>10}{'rss MB':>9}{'warm s':>9}")
+    for result in results:
+        for script, run in result["analyzers"].items():
+            warm = run.get("warm", {}).get("wall_s")
+            warm = f"{warm:.2f}" if warm is not None else "-"
+            print(
+                f"{script:<24}{result['scale']:>7g}{result['files']:>10}{result['bytes'] / 1e6:>9.1f}"
+                f"{run['cold']['wall_s']:>10.2f}{run['cold']['cpu_s']:>10.2f}{run['cold']['max_rss_mb']:>9.1f}"
+                f"{warm:>9}"
+            )
+    for script, exponents in growth_exponents(results).items():
+        print(f"Growth exponent {script}: {', '.join(str(e) for e in exponents)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the analysis scripts on synthetic archives of growing size")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100], help="multiples of the base volume")
+    parser.add_argument("--days", type=float, default=28, help="days of data at scale 1")
+    parser.add_argument("--ias", type=int, default=4)
+    parser.add_argument("--paths", type=int, default=20)
+    parser.add_argument("--analyzers", nargs="+", default=ANALYZERS)
+    parser.add_argument("--warm", action="store_true", help="also time a second run with filled caches")
+    parser.add_argument("--work-dir", help="where archives are generated (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="keep the archives and analyzer outputs")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    work_root = args.work_dir or tempfile.mkdtemp(prefix="bench_analysis_")
+    os.makedirs(work_root, exist_ok=True)
+    print(f"[BENCH] Working directory: {work_root}")
+
+    results = []
+    for scale in args.scales:
+        scale_dir = os.path.join(work_root, f"scale_{scale:g}")
+        archive_dir = os.path.join(scale_dir, "archive")
+        started = time.monotonic()
+        files, size = gen_archive.generate(archive_dir, ias=args.ias, paths=args.paths, days=args.days * scale)
+        print(f"[BENCH] Scale {scale:g}: {sum(files.values())} files ({size / 1e6:.1f} MB) generated in {time.monotonic() - started:.1f}s")
+
+        result = {"scale": scale, "days": args.days * scale, "files": sum(files.values()), "files_per_tool": files, "bytes": size, "analyzers": {}}
+        for script in args.analyzers:
+            out_dir = os.path.join(scale_dir, script)
+            cache_dir = os.path.join(scale_dir, "record_cache")
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            run = {"cold": measure(script, archive_dir, out_dir, cache_dir)}
+            if args.warm:
+                run["warm"] = measure(script, archive_dir, out_dir, cache_dir)
+            result["analyzers"][script] = run
+            status = "" if run["cold"]["exit_code"] == 0 else " (failed, see stdout.txt)"
+            print(f"[BENCH] Scale {scale:g} {script}: {run['cold']['wall_s']:.2f}s, {run['cold']['max_rss_mb']} MB peak RSS{status}")
+        results.append(result)
+
+        if not args.keep:
+            shutil.rmtree(scale_dir, ignore_errors=True)
+    if not args.keep and not args.work_dir:
+        shutil.rmtree(work_root, ignore_errors=True)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+                "growth_exponents": growth_exponents(results)
+            }, f, indent=2)
+        print(f"[BENCH] Results written to {args.output}")
+
+    failed = [script for result in results for script, run in result["analyzers"].items() if run["cold"]["exit_code"] != 0]
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+# Throughput benchmark of the measurement collectors against fake_scion.py.
+# A copy of PythonTests and an empty Data tree are set up in a temporary
+# directory, `scion` and `scion-bwtestclient` are linked to fake_scion.py and
+# put first on PATH, and every collector is run as its own process in pipeline
+# order for a number of cycles. Per collector it reports wall time, CPU time
+# (user + sys of the collector and its scion children), max single-process RSS
+# (the largest of the collector and its scion children), scion calls and calls
+# per second. With --baseline the results are compared to an earlier
+# --output file and the script exits with 1 if a metric regressed by more than
+# its tolerance in REGRESSION_TOLERANCE (or a collector exited non-zero).
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+FAKE_SCION = os.path.join(BENCH_DIR, "fake_scion.py")
+
+COLLECTORS = [
+    "pathdiscovery_scion.py",
+    "prober_scion.py",
+    "mp-prober.py",
+    "tr_collector_scion.py",
+    "bw_collector_scion.py",
+    "bw_alldiscover_path.py",
+    "bw_multipath.py"
+]
+
+# Allowed relative change against the baseline before a metric counts as regressed
+REGRESSION_TOLERANCE = {
+    "cycle_s": 0.20,
+    "wall_s": 0.25,
+    "cpu_s": 0.25,
+    "max_rss_mb": 0.20,
+    "calls_per_s": 0.20  # lower is worse
+}
+HIGHER_IS_BETTER = {"calls_per_s"}
+
+
+def prepare_workdir(work_dir):
+    """Copies the collectors and recreates the (empty) Data tree next to them"""
+    shutil.copytree(
+        os.path.join(REPO_DIR, "PythonTests"),
+        os.path.join(work_dir, "PythonTests"),
+        ignore=shutil.ignore_patterns("__pycache__", "*.pyc")
+    )
+    data_dir = os.path.join(REPO_DIR, "Data")
+    for root, dirs, _ in os.walk(data_dir):
+        relative = os.path.relpath(root, data_dir)
+        if relative.split(os.sep)[0] == "Archive":
+            continue
+        os.makedirs(os.path.join(work_dir, "Data", relative), exist_ok=True)
+
+    bin_dir = os.path.join(work_dir, "bin")
+    os.makedirs(bin_dir)
+    for name in ("scion", "scion-bwtestclient"):
+        os.symlink(FAKE_SCION, os.path.join(bin_dir, name))
+    return bin_dir
+
+def read_calls(call_log, offset):
+    """Calls logged by fake_scion.py after offset, and the new offset"""
+    try:
+        with open(call_log, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+    calls = [json.loads(line) for line in data.splitlines() if line.strip()]
+    return calls, offset + len(data)
+
+def run_collector(work_dir, script, env):
+    """Runs one collector to completion, returns (exit code, wall seconds, rusage)"""
+    started = time.monotonic()
+    with open(os.path.join(work_dir, f"{script}.out"), "a") as out:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(work_dir, "PythonTests", script)],
+            cwd=os.path.join(work_dir, "PythonTests"),
+            stdout=out,
+            stderr=subprocess.STDOUT,
+            env=env
+        )
+        # wait4 returns the resource usage of the collector including the children it waited for
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, time.monotonic() - started, usage
+
+def run_cycles(work_dir, env, cycles, collectors):
+    call_log = env["FAKE_SCION_CALL_LOG"]
+    offset = 0
+    runs = {script: [] for script in collectors}
+    cycle_times = []
+    for cycle in range(cycles):
+        cycle_start = time.monotonic()
+        for script in collectors:
+            exit_code, wall, usage = run_collector(work_dir, script, env)
+            calls, offset = read_calls(call_log, offset)
+            runs[script].append({
+                "exit_code": exit_code,
+                "wall_s": wall,
+                "cpu_s": usage.ru_utime + usage.ru_stime,
+                "max_rss_mb": usage.ru_maxrss / 1024,
+                "calls": len(calls),
+                "failed_calls": sum(1 for call in calls if call["exit_code"] != 0)
+            })
+            print(f"[BENCH] cycle {cycle + 1}/{cycles} {script}: {wall:.2f}s, {len(calls)} scion calls, exit {exit_code}")
+        cycle_times.append(time.monotonic() - cycle_start)
+    return runs, cycle_times
+
+def summarize(runs, cycle_times):
+    collectors = {}
+    for script, entries in runs.items():
+        wall = statistics.median(entry["wall_s"] for entry in entries)
+        calls = statistics.median(entry["calls"] for entry in entries)
+        collectors[script] = {
+            "wall_s": round(wall, 3),
+            "cpu_s": round(statistics.median(entry["cpu_s"] for entry in entries), 3),
+            "max_rss_mb": round(max(entry["max_rss_mb"] for entry in entries), 1),
+            "calls": calls,
+            "failed_calls": sum(entry["failed_calls"] for entry in entries),
+            "calls_per_s": round(calls / wall, 2) if wall else None,
+            "exit_codes": sorted({entry["exit_code"] for entry in entries})
+        }
+    total_calls = sum(entry["calls"] for entries in runs.values() for entry in entries)
+    return {
+        "cycle_s": round(statistics.median(cycle_times), 3),
+        "cycle_times_s": [round(t, 3) for t in cycle_times],
+        "calls_per_s": round(total_calls / sum(cycle_times), 2) if cycle_times else None,
+        "collectors": collectors
+    }
+
+def compare(summary, baseline):
+    """[(what, baseline value, current value)] of the metrics that regressed"""
+    regressions = []
+
+    def check(label, metric, current, previous):
+        if current is None or not previous:
+            return
+        tolerance = REGRESSION_TOLERANCE[metric]
+        if metric in HIGHER_IS_BETTER:
+            regressed = current < previous * (1 - tolerance)
+        else:
+            regressed = current > previous * (1 + tolerance)
+        if regressed:
+            regressions.append((f"{label} {metric}", previous, current))
+
+    if set(summary["collectors"]) == set(baseline.get("collectors", {})):
+        for metric in ("cycle_s", "calls_per_s"):
+            check("total", metric, summary.get(metric), baseline.get(metric))
+    for script, result in summary["collectors"].items():
+        previous = baseline.get("collectors", {}).get(script)
+        if not previous:
+            continue
+        for metric in ("wall_s", "cpu_s", "max_rss_mb", "calls_per_s"):
+            check(script, metric, result.get(metric), previous.get(metric))
+    return regressions
+
+def print_summary(summary):
+    print(f"{'collector':<24}{'wall s':>9}{'cpu s':>9}{'rss MB':>9}{'calls':>8}{'failed':>8}{'calls/s':>9}")
+    for script, result in summary["collectors"].items():
+        print(
+            f"{script:<24}{result['wall_s']:>9.2f}{result['cpu_s']:>9.2f}{result['max_rss_mb']:>9.1f}"
+            f"{result['calls']:>8g}{result['failed_calls']:>8}{result['calls_per_s'] or 0:>9.2f}"
+        )
+    print(f"Cycle time (median): {summary['cycle_s']:.2f}s, {summary['calls_per_s']} scion calls/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the collectors against the fake scion CLI")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--collectors", nargs="+", default=COLLECTORS, help="scripts to run, in order")
+    parser.add_argument("--latency-ms", type=float, help="FAKE_SCION_LATENCY_MS")
+    parser.add_argument("--failure-rate", type=float, help="FAKE_SCION_FAILURE_RATE")
+    parser.add_argument("--paths", type=int, help="FAKE_SCION_PATHS")
+    parser.add_argument("--time-scale", type=float, help="FAKE_SCION_TIME_SCALE")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="results of an earlier run to check for regressions")
+    parser.add_argument("--keep", action="store_true", help="keep the working directory")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_collectors_")
+    bin_dir = prepare_workdir(work_dir)
+    env = os.environ.copy()
+    env["PATH"] = bin_dir + os.pathsep + env.get("PATH", "")
+    env["FAKE_SCION_CALL_LOG"] = os.path.join(work_dir, "scion_calls.jsonl")
+    for option, variable in (("latency_ms", "FAKE_SCION_LATENCY_MS"), ("failure_rate", "FAKE_SCION_FAILURE_RATE"),
+                             ("paths", "FAKE_SCION_PATHS"), ("time_scale", "FAKE_SCION_TIME_SCALE")):
+        if getattr(args, option) is not None:
+            env[variable] = str(getattr(args, option))
+
+    print(f"[BENCH] Working directory: {work_dir}")
+    try:
+        runs, cycle_times = run_cycles(work_dir, env, args.cycles, args.collectors)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary = summarize(runs, cycle_times)
+    summary["timestamp"] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+    summary["cycles"] = args.cycles
+    summary["fake_scion"] = {key: value for key, value in env.items() if key.startswith("FAKE_SCION_") and key != "FAKE_SCION_CALL_LOG"}
+    print_summary(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"[BENCH] Results written to {args.output}")
+
+    failed = [script for script, result in summary["collectors"].items() if result["exit_codes"] != [0]]
+    for script in failed:
+        print(f"[FAIL] {script} exited with {summary['collectors'][script]['exit_codes']}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(summary, json.load(f))
+        for what, previous, current in regressions:
+            print(f"[REGRESSION] {what}: {previous} -> {current}")
+        if not regressions:
+            print("[BENCH] No regressions against the baseline")
+
+    sys.exit(1 if failed or regressions else 0)
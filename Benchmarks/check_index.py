@@ -0,0 +1,80 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+import gen_archive
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, "..", "PythonTests")))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, "..", "AnalysisScripts")))
+import archive_index
+import archive_records
+
+# Parity check of the archive index (PythonTests/archive_index.py). A synthetic
+# archive (gen_archive.py) is indexed and every tool is loaded with a set of
+# IA/time queries once through the index and once by reading all files; the
+# records must be the same. The time bounds include the seconds-precision
+# timestamps of BW-P file names and the minute boundaries around them, where
+# the index and the filename parsing of archive_records have to agree.
+TOOLS = ["prober", "mp-prober", "traceroute", "bw", "bw-mp", "comparer"]
+
+
+def bw_p_timestamps(archive_dir, limit=5):
+    """Launch times with seconds from the first BW-P file names"""
+    stamps = []
+    for fname in sorted(os.listdir(archive_dir)):
+        if fname.startswith("BW-P_"):
+            stamp = datetime.strptime(fname.split("_")[1], "%Y-%m-%dT%H-%M-%S")
+            if stamp.second and stamp not in stamps:
+                stamps.append(stamp)
+        if len(stamps) >= limit:
+            break
+    return stamps
+
+def queries(archive_dir):
+    """(label, ias, since, until) to check"""
+    ias = sorted(gen_archive.destination_ias(4))
+    result = [("all IAs", ias[:1], None, None)]
+    for stamp in bw_p_timestamps(archive_dir):
+        minute = stamp.replace(second=0)
+        for bound in (stamp, minute, minute + timedelta(minutes=1), stamp - timedelta(seconds=1)):
+            result.append((f"until {bound}", None, None, bound))
+            result.append((f"since {bound}", None, bound, None))
+        result.append((f"{ias[0]} around {stamp}", ias[:1], stamp - timedelta(hours=1), stamp + timedelta(seconds=30)))
+    return result
+
+def load(archive_dir, tool, ias, since, until, use_index):
+    archive_records.ARCHIVE_INDEX = "" if use_index else os.path.join(archive_dir, "no_index.db")
+    return sorted(
+        (row["file"], repr(sorted(row.items())))
+        for row in archive_records.iter_archive_records(archive_dir, tool, ias, since, until)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that indexed and unindexed archive queries return the same records")
+    parser.add_argument("--days", type=float, default=0.5)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="check_index_")
+    archive_records.RECORD_CACHE_DIR = ""
+    try:
+        gen_archive.generate(work_dir, days=args.days)
+        archive_index.ArchiveIndex(work_dir).update()
+        failed = 0
+        checked = 0
+        for label, ias, since, until in queries(work_dir):
+            for tool in TOOLS:
+                indexed = load(work_dir, tool, ias, since, until, use_index=True)
+                scanned = load(work_dir, tool, ias, since, until, use_index=False)
+                checked += 1
+                if indexed != scanned:
+                    failed += 1
+                    print(f"[FAIL] {tool} {label}: {len(indexed)} records with the index, {len(scanned)} without")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"[CHECK] {checked - failed} of {checked} queries agree")
+    sys.exit(1 if failed else 0)
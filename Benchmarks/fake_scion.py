@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+
+# Local stand-in for the `scion` and `scion-bwtestclient` binaries.
+# Link (or copy) this file as `scion` and `scion-bwtestclient` into a directory
+# placed first on PATH; the name it is called by decides which tool it mimics:
+#   scion showpaths <ia> --format json [-m N]   JSON with FAKE_SCION_PATHS paths
+#   scion ping <ia>,<ip> --format json -c N ...  JSON replies and statistics
+#   scion traceroute <ia>,<ip> --format json --sequence S
+#   scion-bwtestclient -s ... -cs D,SIZE,COUNT,? -sc ...  text blocks as printed by the real client
+# The paths of a destination are the same on every call (seeded by the destination),
+# so the collectors see a stable topology. Behaviour is tuned with environment variables:
+#   FAKE_SCION_LATENCY_MS    fixed startup delay of every call (default 20)
+#   FAKE_SCION_JITTER_MS     uniform extra delay (default 5)
+#   FAKE_SCION_TIME_SCALE    share of the real run time that is slept: 1 s per echo request
+#                            and traceroute hop, the bwtest duration (default 0.01)
+#   FAKE_SCION_FAILURE_RATE  probability that a call fails with exit code 1 (default 0)
+#   FAKE_SCION_PATHS         paths per destination (default 12)
+#   FAKE_SCION_MAX_HOPS      max transit ASes per path (default 3)
+#   FAKE_SCION_TIMEOUT_RATE  share of paths reported with status "timeout" (default 0.15)
+#   FAKE_SCION_RTT_MS        base RTT (default 50), FAKE_SCION_LOSS loss fraction (default 0)
+#   FAKE_SCION_CAPACITY_MBPS bottleneck of the bwtests (default 30)
+#   FAKE_SCION_CALL_LOG      if set, one line per call is appended to this file
+
+LOCAL_IA = "19-ffaa:1:11de"
+
+
+def env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def log_call(tool, args, exit_code, started):
+    call_log = os.environ.get("FAKE_SCION_CALL_LOG")
+    if not call_log:
+        return
+    line = json.dumps({"tool": tool, "command": args[0] if args else "", "exit_code": exit_code, "wall_ms": round((time.monotonic() - started) * 1000, 3)})
+    with open(call_log, "a") as f:
+        f.write(line + "\n")
+
+def fail(message):
+    print(message, file=sys.stderr)
+    return 1
+
+def destination_paths(destination):
+    r = random.Random(destination)
+    timeout_rate = env_float("FAKE_SCION_TIMEOUT_RATE", 0.15)
+    max_hops = max(int(env_float("FAKE_SCION_MAX_HOPS", 3)), 1)
+    transit = [f"{destination.split('-')[0]}-ffaa:0:{1300 + i}" for i in range(1, 10)]
+    paths = []
+    for _ in range(int(env_float("FAKE_SCION_PATHS", 12))):
+        chain = [LOCAL_IA] + r.sample(transit, r.randint(1, max_hops)) + [destination]
+        sequence, hops = [], []
+        for position, ia in enumerate(chain):
+            ifids = [r.randint(1, 9)] if position in (0, len(chain) - 1) else [r.randint(1, 9), r.randint(1, 9)]
+            sequence.append(f"{ia}#{','.join(str(i) for i in ifids)}")
+            hops += [{"ifid": ifid, "isd_as": ia} for ifid in ifids]
+        sequence = " ".join(sequence)
+        paths.append({
+            "fingerprint": hashlib.sha256(sequence.encode()).hexdigest(),
+            "hops": hops,
+            "sequence": sequence,
+            "local_ip": "127.0.0.1",
+            "next_hop": "127.0.0.1:31002",
+            "expiry": "2099-01-01T00:00:00Z",
+            "mtu": 1472,
+            "latency": [round(r.uniform(1, 20), 3) for _ in hops[1:]],
+            "status": "timeout" if r.random() < timeout_rate else "alive",
+            "status_info": ""
+        })
+    return paths
+
+def showpaths(args):
+    destination = args[1]
+    paths = destination_paths(destination)
+    if "-m" in args:
+        paths = paths[:int(args[args.index("-m") + 1])]
+    print(json.dumps({"local_isd_as": LOCAL_IA, "destination": destination, "paths": paths}, indent=2))
+    return 0
+
+def ping(args, scale):
+    count = int(args[args.index("-c") + 1]) if "-c" in args else 3
+    time.sleep(count * scale)
+    base = env_float("FAKE_SCION_RTT_MS", 50)
+    loss = env_float("FAKE_SCION_LOSS", 0)
+    replies = []
+    for seq in range(count):
+        if random.random() < loss:
+            continue
+        replies.append({"scmp_seq": seq, "round_trip_time": round(random.gauss(base, base * 0.05), 3), "size": 64, "source_isd_as": args[1].split(",")[0], "state": "success"})
+    rtts = [reply["round_trip_time"] for reply in replies]
+    mean = sum(rtts) / len(rtts) if rtts else 0
+    print(json.dumps({
+        "replies": replies,
+        "statistics": {
+            "sent": count,
+            "received": len(replies),
+            "packet_loss": round(100 * (count - len(replies)) / count, 2) if count else 0,
+            "min_rtt": min(rtts, default=0),
+            "avg_rtt": round(mean, 3),
+            "max_rtt": max(rtts, default=0),
+            "mdev_rtt": round((sum((x - mean) ** 2 for x in rtts) / len(rtts)) ** 0.5, 3) if rtts else 0
+        }
+    }, indent=2))
+    return 0
+
+def traceroute(args, scale):
+    sequence = args[args.index("--sequence") + 1]
+    hops = []
+    rtt = 0.0
+    for token in sequence.split():
+        ia, ifids = token.split("#")
+        for ifid in ifids.split(","):
+            rtt += random.uniform(1, 15)
+            hops.append({"interface_id": int(ifid), "isd_as": ia, "round_trip_times": [round(rtt + random.uniform(0, 2), 3) for _ in range(3)]})
+    time.sleep(len(hops) * scale)
+    print(json.dumps({"path": {"sequence": sequence}, "hops": hops}, indent=2))
+    return 0
+
+def bwtest_block(name, attempted_bps, capacity_bps):
+    achieved = min(attempted_bps, capacity_bps) * random.uniform(0.95, 1.0)
+    loss = max(0.0, 1 - achieved / attempted_bps) * 100 if attempted_bps else 0
+    return (
+        f"{name}\n"
+        f"Attempted bandwidth: {int(attempted_bps)} bps / {attempted_bps / 1e6:.2f} Mbps\n"
+        f"Achieved bandwidth: {int(achieved)} bps / {achieved / 1e6:.2f} Mbps\n"
+        f"Loss rate: {loss:.0f} %\n"
+        f"Interarrival time min/avg/max/mdev = 0.011/0.801/9.345/0.612 ms\n"
+    )
+
+def bwtestclient(args, scale):
+    duration, packet_size, packet_count, _ = args[args.index("-cs") + 1].split(",")
+    attempted_bps = int(packet_count) * int(packet_size) * 8 / int(duration)
+    time.sleep(int(duration) * scale)
+    capacity_bps = env_float("FAKE_SCION_CAPACITY_MBPS", 30) * 1e6
+    print(bwtest_block("S->C results", attempted_bps, capacity_bps))
+    print(bwtest_block("C->S results", attempted_bps, capacity_bps))
+    return 0
+
+def main():
+    started = time.monotonic()
+    tool = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+    time.sleep((env_float("FAKE_SCION_LATENCY_MS", 20) + random.uniform(0, env_float("FAKE_SCION_JITTER_MS", 5))) / 1000)
+    scale = env_float("FAKE_SCION_TIME_SCALE", 0.01)
+
+    if random.random() < env_float("FAKE_SCION_FAILURE_RATE", 0):
+        if tool == "scion-bwtestclient":
+            print(f"Fatal: no path to {args[args.index('-s') + 1].split(',')[0]}")
+        exit_code = fail("Error: fake failure injected")
+    elif tool == "scion-bwtestclient":
+        exit_code = bwtestclient(args, scale)
+    elif args and args[0] == "showpaths":
+        exit_code = showpaths(args)
+    elif args and args[0] == "ping":
+        exit_code = ping(args, scale)
+    elif args and args[0] == "traceroute":
+        exit_code = traceroute(args, scale)
+    else:
+        exit_code = fail(f"fake_scion: unsupported command {' '.join(args)}")
+    log_call(tool, args, exit_code, started)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+import os
+import json
+import random
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+
+# Writes a synthetic archive in the layout the analysis scripts read: one directory
+# with the prober_, mp-prober_, TR_, BW_, BW-P_ and delta_ files of the collectors,
+# in the schemas they write. The default profile is the deployment of the
+# measurement campaign (4 destinations, a cycle every 5 minutes, hourly bandwidth
+# tests, 4 weeks); --scale multiplies the number of days.
+# Besides regular data the archive contains
+#   churn     paths disappear and reappear, recorded in the delta files
+#   outages   destinations without any path for several cycles: all_paths_lost /
+#             no_paths_present deltas, failed pings, no_path_error bandwidth results
+#   legacy    timestamps with seconds and "Z", bandwidth results with the string values
+#             written before bwtest_parser.py, the single-file bw_collector_scion.py
+#             layout and "no paths found" documents
+# Output is deterministic for a given seed.
+
+LOCAL_IA = "19-ffaa:1:11de"
+DESTINATIONS = ["17-ffaa:1:11e4", "18-ffaa:1:11e5", "22-ffaa:1:11ee", "19-ffaa:1:11df"]
+START = datetime(2025, 7, 16)
+
+
+def normalize_as(as_str):
+    return as_str.replace(":", "_")
+
+def destination_ias(count):
+    extra = [f"{20 + i % 4}-ffaa:1:{0x1200 + i:x}" for i in range(max(0, count - len(DESTINATIONS)))]
+    return (DESTINATIONS + extra)[:count]
+
+def make_path_pool(rng, dst_ia, count):
+    pool = []
+    for _ in range(count):
+        transit = [f"{rng.choice(['17', '18', '19', '20'])}-ffaa:0:{rng.randint(1100, 1400)}" for _ in range(rng.randint(1, 5))]
+        chain = [LOCAL_IA] + transit + [dst_ia]
+        parts, hops = [], []
+        for position, ia in enumerate(chain):
+            ifids = [rng.randint(1, 20)] if position in (0, len(chain) - 1) else [rng.randint(1, 20), rng.randint(1, 20)]
+            parts.append(f"{ia}#{','.join(str(i) for i in ifids)}")
+            hops += [{"ifid": ifid, "isd_as": ia} for ifid in ifids]
+        sequence = " ".join(parts)
+        pool.append({
+            "fingerprint": hashlib.sha256(sequence.encode()).hexdigest(),
+            "sequence": sequence,
+            "hops": hops,
+            "base_rtt": rng.uniform(20, 400),
+            "capacity_mbps": rng.choice([8, 20, 40, 80, 150])
+        })
+    return pool
+
+
+def ping_result(rng, path, count, lost=False):
+    replies, rtts = [], []
+    for seq in range(count):
+        if lost or rng.random() < 0.01:
+            continue
+        rtt = max(0.1, rng.gauss(path["base_rtt"], path["base_rtt"] * 0.05))
+        rtts.append(rtt)
+        replies.append({
+            "scion_packet_size": 128,
+            "source_isd_as": path["sequence"].split()[-1].split("#")[0],
+            "scmp_seq": seq,
+            "round_trip_time": rtt,
+            "state": "success"
+        })
+    if rng.random() < 0.002 and len(replies) > 2:
+        replies[0], replies[1] = replies[1], replies[0]  # out of order sequence
+    if rtts:
+        mean = sum(rtts) / len(rtts)
+        stats = {"min_rtt": min(rtts), "avg_rtt": mean, "max_rtt": max(rtts), "mdev_rtt": (sum((x - mean) ** 2 for x in rtts) / len(rtts)) ** 0.5}
+    else:
+        stats = {"min_rtt": 0, "avg_rtt": 0, "max_rtt": 0, "mdev_rtt": 0}
+    stats.update({"sent": count, "received": len(rtts), "packet_loss": round(100 * (count - len(rtts)) / count), "time": count * 1000})
+    return {"replies": replies, "statistics": stats}
+
+def bw_direction(rng, path, mbps, legacy):
+    attempted = mbps * 1e6
+    achieved = min(attempted, path["capacity_mbps"] * 1e6) * rng.uniform(0.9, 1.0)
+    loss = max(0.0, 1 - achieved / attempted)
+    interarrival = [rng.uniform(0.01, 0.1), rng.uniform(0.5, 2), rng.uniform(5, 20), rng.uniform(0.1, 2)]
+    if legacy:
+        return {
+            "attempted_bps": f"{int(attempted)} bps / {attempted / 1e6:.2f} Mbps",
+            "achieved_bps": f"{int(achieved)} bps / {achieved / 1e6:.2f} Mbps",
+            "loss_rate": f"{round(loss * 100)} %",
+            "interarrival time min/avg/max/mdev": "/".join(f"{x:.3f}" for x in interarrival) + " ms"
+        }
+    return {
+        "attempted_bps": attempted,
+        "achieved_bps": achieved,
+        "loss_fraction": loss,
+        "interarrival_ms": dict(zip(["min", "avg", "max", "mdev"], interarrival))
+    }
+
+def bw_target(ia, mbps):
+    return {
+        "target": {"tier_mbps": mbps, "duration_sec": 3, "packet_size_bytes": 1000, "packet_count": mbps * 375},
+        "target_server": {"ia": ia, "ip": "127.0.0.1"}
+    }
+
+def bw_path_result(rng, ia, index, path, mbps, legacy, outage):
+    entry = {"path_index": index, "fingerprint": path["fingerprint"], "sequence": path["sequence"]}
+    command = f"scion-bwtestclient -s {ia},[127.0.0.1]:30100 -cs 3,1000,{mbps * 375},? -sc 3,1000,{mbps * 375},?"
+    if outage:
+        return {**entry, "error_type": "no_path_error", "raw_output": f"Fatal: no path to {ia}", "stderr": "",
+                "return_code": 1, "command": command, **bw_target(ia, mbps)}
+    if rng.random() < 0.01:
+        return {**entry, "error_type": "timeout", "command": command, **bw_target(ia, mbps)}
+    if rng.random() < 0.01:
+        result = {"S->C results": {}, "C->S results": {}, "invalid_format": True, "raw_output": "bwtest: unexpected output"}
+    else:
+        result = {"S->C results": bw_direction(rng, path, mbps, legacy), "C->S results": bw_direction(rng, path, mbps, legacy), "invalid_format": False}
+    return {**entry, "result": result, "stderr": "", "return_code": 0, "command": command, **bw_target(ia, mbps)}
+
+def concurrency_block(rng, paths):
+    """The fields summarize_concurrency() of bw_multipath.py adds"""
+    aggregate = {direction: {"achieved_bps": 0.0, "overlap_weighted_bps": 0.0} for direction in ("S->C results", "C->S results")}
+    for path in paths:
+        path["start_offset_ms"] = round(rng.uniform(0, 0.5), 3)
+        path["end_offset_ms"] = round(3000 + rng.uniform(0, 50), 3)
+        path["overlap_fraction"] = round(rng.uniform(0.97, 1.0), 4)
+        for direction in aggregate:
+            achieved = ((path.get("result") or {}).get(direction) or {}).get("achieved_bps")
+            if isinstance(achieved, float):
+                aggregate[direction]["achieved_bps"] += achieved
+                aggregate[direction]["overlap_weighted_bps"] += achieved * path["overlap_fraction"]
+    for path in paths:
+        path["share"] = {}
+        for direction, totals in aggregate.items():
+            achieved = ((path.get("result") or {}).get(direction) or {}).get("achieved_bps")
+            path["share"][direction] = round(achieved / totals["achieved_bps"], 4) if isinstance(achieved, float) and totals["achieved_bps"] else None
+    return {
+        "k": len(paths),
+        "max_start_offset_ms": max((p["start_offset_ms"] for p in paths), default=0),
+        "overlap_sec": 3.0,
+        "aggregate": aggregate
+    }
+
+def traceroute_result(rng, path):
+    hops = []
+    for part in path["sequence"].split():
+        hop_ia, ifids = part.split("#")
+        for ifid in ifids.split(","):
+            rtts = [] if rng.random() < 0.05 else [rng.uniform(1, path["base_rtt"]) for _ in range(3)]
+            hops.append({"interface_id": int(ifid), "ip": "127.0.0.1", "isd_as": hop_ia, "round_trip_times": rtts})
+    return {
+        "path": {"fingerprint": path["fingerprint"], "sequence": path["sequence"], "hops": path["hops"]},
+        "hops": hops,
+        "hop_count": len(path["sequence"].split())
+    }
+
+
+class ArchiveWriter:
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.files = {}
+        self.bytes = 0
+        os.makedirs(out_dir, exist_ok=True)
+
+    def write(self, tool, name, doc):
+        text = json.dumps(doc, indent=2)
+        with open(os.path.join(self.out_dir, name), "w") as f:
+            f.write(text)
+        self.files[tool] = self.files.get(tool, 0) + 1
+        self.bytes += len(text)
+
+
+def generate(out_dir, ias=4, paths=20, days=28, interval_min=5, tiers=(10, 50, 100), bw_interval_min=60,
+             probe_paths=15, trace_paths=4, ping_count=15, legacy_share=0.25, outage_rate=0.002, seed=1):
+    """Writes the archive, returns {tool: file count} and the total bytes"""
+    rng = random.Random(seed)
+    writer = ArchiveWriter(out_dir)
+    dst_ias = destination_ias(ias)
+    pools = {ia: make_path_pool(rng, ia, paths) for ia in dst_ias}
+    active = {ia: {p["fingerprint"] for p in pools[ia][:max(1, paths * 3 // 4)]} for ia in dst_ias}
+    outage_left = {ia: 0 for ia in dst_ias}  # cycles the destination stays unreachable
+    down = {ia: False for ia in dst_ias}
+    steps = int(days * 24 * 60 // interval_min)
+    legacy_steps = int(steps * legacy_share)
+
+    for step in range(steps):
+        now = START + timedelta(minutes=step * interval_min)
+        ts = now.strftime("%Y-%m-%dT%H:%M")
+        legacy = step < legacy_steps
+        bw_due = (step * interval_min) % bw_interval_min == 0
+
+        for ia in dst_ias:
+            norm = normalize_as(ia)
+            pool = {p["fingerprint"]: p for p in pools[ia]}
+
+            # Comparer: churn and outages
+            if not down[ia] and rng.random() < outage_rate:
+                outage_left[ia] = rng.randint(2, 36)
+            changes = []
+            if outage_left[ia]:
+                outage_left[ia] -= 1
+                if not down[ia]:
+                    changes = [{"fingerprint": fp, "sequence": pool[fp]["sequence"], "change": "removed"} for fp in sorted(active[ia])]
+                    status = "all_paths_lost"
+                else:
+                    status = "no_paths_present"
+                down[ia] = True
+                live = []
+            else:
+                recovered, down[ia] = down[ia], False
+                for fp in pool:
+                    if not recovered and fp in active[ia] and rng.random() < 0.02:
+                        active[ia].discard(fp)
+                        changes.append({"fingerprint": fp, "sequence": pool[fp]["sequence"], "change": "removed"})
+                    elif fp not in active[ia] and rng.random() < 0.05:
+                        active[ia].add(fp)
+                        changes.append({"fingerprint": fp, "sequence": pool[fp]["sequence"], "change": "added"})
+                if recovered:
+                    changes = [{"fingerprint": fp, "sequence": pool[fp]["sequence"], "change": "added"} for fp in sorted(active[ia])]
+                    status = "all_paths_new"
+                else:
+                    status = "change_detected" if changes else "no_change"
+                live = [pool[fp] for fp in sorted(active[ia])]
+            writer.write("comparer", f"delta_{ts}_{norm}.json", {
+                "timestamp": now.strftime("%Y-%m-%dT%H:%M:%SZ") if legacy and step % 7 == 0 else ts,
+                "source": LOCAL_IA,
+                "destination": ia,
+                "change_status": status,
+                "changes": changes
+            })
+
+            # Prober, down destinations keep probing the last known paths and lose everything
+            probed = live or [pool[fp] for fp in sorted(active[ia])]
+            probes = []
+            for path in rng.sample(probed, min(probe_paths, len(probed))):
+                entry = {"fingerprint": path["fingerprint"], "sequence": path["sequence"]}
+                roll = rng.random()
+                if roll < 0.03:
+                    probes.append({**entry, "status": "skipped", "note": "Skipped probing: path previously timed out"})
+                elif roll < 0.05 or not live:
+                    probes.append({**entry, "error": "scion ping failed: no reply"})
+                else:
+                    probes.append({**entry, "ping_result": ping_result(rng, path, ping_count)})
+            writer.write("prober", f"prober_{ts}_{norm}.json", {"timestamp": ts, "ia": ia, "ip": "127.0.0.1", "probes": probes})
+
+            # MP-Prober
+            if len(probed) < 2:
+                mp_doc = {"timestamp": ts, "ia": ia, "ip": "127.0.0.1", "note": "Insufficient paths for multipath probing", "probes": []}
+            else:
+                mp_doc = {"timestamp": ts, "ia": ia, "ip": "127.0.0.1", "probes": [
+                    {"sequence": path["sequence"], "ping_result": ping_result(rng, path, ping_count, lost=not live),
+                     "duration": round(ping_count + rng.uniform(0, 0.3), 2), "fingerprint": path["fingerprint"]}
+                    for path in rng.sample(probed, min(3, len(probed)))
+                ]}
+            writer.write("mp-prober", f"mp-prober_{ts}_{norm}.json", mp_doc)
+
+            # Traceroute
+            for index, path in enumerate(rng.sample(live, min(trace_paths, len(live)))):
+                writer.write("traceroute", f"TR_{ts}_AS_{norm}_p_{index}.json", traceroute_result(rng, path))
+
+            if not bw_due:
+                continue
+
+            # Bandwidth single path and multipath
+            if not probed:
+                for mbps in tiers:
+                    writer.write("bw", f"BW_{ts}_AS_{norm}_{mbps}Mbps.json", {
+                        "timestamp": ts, "as": ia, "target_mbps": mbps,
+                        "error": "no paths found or failed to retrieve paths",
+                        "target_server": {"ia": ia, "ip": "127.0.0.1"}
+                    })
+                continue
+            chosen = rng.sample(list(enumerate(probed)), min(2, len(probed)))
+            for mbps in tiers:
+                writer.write("bw", f"BW_{ts}_AS_{norm}_{mbps}Mbps.json", {
+                    "timestamp": ts, "as": ia, "target_mbps": mbps,
+                    "paths": [bw_path_result(rng, ia, i, p, mbps, legacy, not live) for i, p in chosen]
+                })
+                launched = now + timedelta(minutes=3, seconds=rng.randint(0, 59))
+                mp_paths = [
+                    dict(bw_path_result(rng, ia, i, p, mbps, legacy, not live),
+                         start_ts=launched.strftime("%Y-%m-%dT%H:%M:%S"),
+                         end_ts=(launched + timedelta(seconds=3)).strftime("%Y-%m-%dT%H:%M:%S"))
+                    for i, p in chosen
+                ]
+                mp_doc = {"timestamp": launched.strftime("%Y-%m-%dT%H:%M:%S"), "as": ia, "target_mbps": mbps, "paths": mp_paths}
+                if not legacy:
+                    mp_doc["concurrency"] = concurrency_block(rng, mp_paths)
+                writer.write("bw-mp", f"BW-P_{launched.strftime('%Y-%m-%dT%H-%M-%S')}_AS_{norm}_{mbps}Mbps.json", mp_doc)
+
+            if legacy and step % 288 == 0:
+                # Single-file layout of bw_collector_scion.py
+                path = probed[0]
+                writer.write("bw", f"BW_{ts}_AS_{norm}_5Mbps.json", {
+                    "timestamp": ts, **bw_target(ia, 5),
+                    "command": "scion-bwtestclient -s ... -cs 3,1000,1875,? -sc 3,1000,1875,?",
+                    "result": {"S->C results": bw_direction(rng, path, 5, True), "C->S results": bw_direction(rng, path, 5, True), "invalid_format": False},
+                    "stderr": "",
+                    "return_code": 0
+                })
+    return writer.files, writer.bytes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic measurement archive")
+    parser.add_argument("out_dir")
+    parser.add_argument("--ias", type=int, default=4, help="destinations")
+    parser.add_argument("--paths", type=int, default=20, help="paths known per destination")
+    parser.add_argument("--tiers", type=int, nargs="+", default=[10, 50, 100], help="bandwidth tiers in Mbps")
+    parser.add_argument("--days", type=float, default=28)
+    parser.add_argument("--scale", type=float, default=1, help="multiplies --days")
+    parser.add_argument("--interval-min", type=int, default=5, help="minutes between collector runs")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    files, size = generate(args.out_dir, ias=args.ias, paths=args.paths, days=args.days * args.scale,
+                           interval_min=args.interval_min, tiers=tuple(args.tiers), seed=args.seed)
+    print(f"[GEN] {sum(files.values())} files ({size / 1e6:.1f} MB) written to {args.out_dir}: " +
+          ", ".join(f"{tool} {count}" for tool, count in sorted(files.items())))
@@ -0,0 +1,123 @@
+import math
+from config import (
+    PING_BATCH,
+    PING_MAX_COUNT,
+    PING_CONFIDENCE_Z,
+    PING_RTT_CI_REL,
+    PING_LOSS_CI_WIDTH
+)
+
+# Sequential stopping for scion ping: echo requests are sent in small batches
+# until the confidence interval of the mean RTT and of the loss rate are narrow
+# enough, or PING_MAX_COUNT is reached. Stable paths stop after a few packets,
+# noisy or lossy ones get the full budget. The batches are merged into one
+# result in the format of a single scion ping.
+
+
+def rtt_samples(ping_result):
+    return [
+        float(r["round_trip_time"]) for r in ping_result.get("replies", [])
+        if r.get("state", "success") == "success" and isinstance(r.get("round_trip_time"), (int, float))
+    ]
+
+def wilson_interval(lost, sent, z=PING_CONFIDENCE_Z):
+    """Wilson score interval of the loss fraction"""
+    if sent == 0:
+        return 0.0, 1.0
+    p = lost / sent
+    denominator = 1 + z * z / sent
+    center = (p + z * z / (2 * sent)) / denominator
+    half = z * math.sqrt(p * (1 - p) / sent + z * z / (4 * sent * sent)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+def rtt_half_width(rtts, z=PING_CONFIDENCE_Z):
+    """Half-width of the confidence interval of the mean RTT, None below two samples"""
+    if len(rtts) < 2:
+        return None
+    mean = sum(rtts) / len(rtts)
+    variance = sum((x - mean) ** 2 for x in rtts) / (len(rtts) - 1)
+    return z * math.sqrt(variance / len(rtts))
+
+def merge_batches(batches):
+    """Combines the scion ping results of several batches into one result.
+
+    scmp_seq is renumbered so it continues across batches, the statistics are
+    recomputed over all replies.
+    """
+    merged = {key: value for key, value in batches[0].items() if key not in ("replies", "statistics")}
+    replies = []
+    sent = received = 0
+    for batch in batches:
+        for reply in batch.get("replies", []):
+            reply = dict(reply)
+            if "scmp_seq" in reply:
+                reply["scmp_seq"] += sent
+            replies.append(reply)
+        stats = batch.get("statistics", {})
+        sent += stats.get("sent", 0)
+        received += stats.get("received", 0)
+
+    merged["replies"] = replies
+    statistics = {
+        "sent": sent,
+        "received": received,
+        "packet_loss": round(100 * (sent - received) / sent, 3) if sent else 0
+    }
+    rtts = [rtt for batch in batches for rtt in rtt_samples(batch)]
+    if rtts:
+        mean = sum(rtts) / len(rtts)
+        statistics.update({
+            "min_rtt": min(rtts),
+            "avg_rtt": mean,
+            "max_rtt": max(rtts),
+            "mdev_rtt": math.sqrt(sum((x - mean) ** 2 for x in rtts) / len(rtts))
+        })
+    merged["statistics"] = statistics
+    return merged
+
+def adaptive_ping(ping_batch):
+    """Pings in batches until the estimates are precise enough.
+
+    ping_batch(count) runs one scion ping with count echo requests and returns
+    (result, error). Returns (merged result, error) like a single ping; the
+    result records the samples used under "sampling".
+    """
+    batches = []
+    sent = lost = 0
+    rtts = []
+    stop_reason = "max_count"
+    while sent < PING_MAX_COUNT:
+        result, error = ping_batch(min(PING_BATCH, PING_MAX_COUNT - sent))
+        if error:
+            if not batches:
+                return None, error
+            stop_reason = "error"
+            break
+        batches.append(result)
+        stats = result.get("statistics", {})
+        sent += stats.get("sent", 0)
+        lost += stats.get("sent", 0) - stats.get("received", 0)
+        rtts += rtt_samples(result)
+        if not stats.get("sent"):
+            stop_reason = "error"
+            break
+
+        low, high = wilson_interval(lost, sent)
+        half_width = rtt_half_width(rtts)
+        rtt_ok = half_width is not None and half_width <= PING_RTT_CI_REL * (sum(rtts) / len(rtts))
+        if high - low <= PING_LOSS_CI_WIDTH and (rtt_ok or not rtts):
+            stop_reason = "converged"
+            break
+
+    merged = merge_batches(batches)
+    low, high = wilson_interval(lost, sent)
+    half_width = rtt_half_width(rtts)
+    merged["sampling"] = {
+        "mode": "adaptive",
+        "samples": sent,
+        "batches": len(batches),
+        "stop_reason": stop_reason,
+        "rtt_ci_half_width_ms": round(half_width, 3) if half_width is not None else None,
+        "loss_ci": [round(low, 4), round(high, 4)]
+    }
+    return merged, None
@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+from datetime import datetime
+from config import (
+    BUNDLE_BLOCK_RECORDS,
+    BUNDLE_ZSTD_LEVEL
+)
+
+# Packs the result files of finished days in Archive/<date>/ into one bundle per tool:
+#   <date>_<tool>.jsonl.zst   JSON lines {"name": original file name, "doc": content},
+#                             compressed in independent zstd frames of BUNDLE_BLOCK_RECORDS lines
+#   <date>_<tool>.idx.json    {"size": valid bytes, "blocks": [[offset, length, lines]],
+#                             "records": {name: [block, line]}}
+# Reading one record only decompresses its frame (AnalysisScripts/archive_bundles.py).
+# Late files of an already compacted day are appended as new frames. The loose
+# JSON files are deleted once the index that lists them has been written, so an
+# interrupted run leaves them in place; bytes past the indexed size are cut off
+# before the next append. Needs the zstandard package.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
+ARCHIVE_DIR = os.path.join(BASE_DIR, "Archive")
+
+BUNDLE_SUFFIX = ".jsonl.zst"
+INDEX_SUFFIX = ".idx.json"
+BUNDLE_VERSION = 1
+
+TOOL_PREFIXES = {
+    "showpaths": "AS-",
+    "comparer": "delta_",
+    "prober": "prober_",
+    "mp-prober": "mp-prober_",
+    "traceroute": "TR_",
+    "bw": "BW_",
+    "bw-mp": "BW-P_",
+    "bw-adaptive": "BW-A_",
+}
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Archive compaction needs zstandard: pip install zstandard")
+    return zstandard
+
+def tool_for_file(fname):
+    if not fname.endswith(".json") or fname.endswith(INDEX_SUFFIX):
+        return None
+    for tool, prefix in TOOL_PREFIXES.items():
+        if fname.startswith(prefix):
+            return tool
+    return None
+
+def bundle_paths(day_dir, tool):
+    base = os.path.join(day_dir, f"{os.path.basename(os.path.normpath(day_dir))}_{tool}")
+    return base + BUNDLE_SUFFIX, base + INDEX_SUFFIX
+
+def load_index(index_path, tool):
+    try:
+        with open(index_path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": BUNDLE_VERSION, "tool": tool, "size": 0, "blocks": [], "records": {}}
+
+def _write_index(index_path, index):
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, index_path)
+
+def compact_tool(day_dir, tool, fnames, keep_json=False):
+    """Appends the given files of one tool to the day's bundle, returns the number packed"""
+    zstd = _zstd()
+    bundle_path, index_path = bundle_paths(day_dir, tool)
+    index = load_index(index_path, tool)
+    compressor = zstd.ZstdCompressor(level=BUNDLE_ZSTD_LEVEL)
+
+    # Files that are already in the bundle (left over by an interrupted run) are only removed
+    done = [fname for fname in fnames if fname in index["records"]]
+    pending = [fname for fname in fnames if fname not in index["records"]]
+    packed = []
+
+    with open(bundle_path, "ab") as f:
+        f.truncate(index["size"])
+        f.seek(index["size"])
+        for start in range(0, len(pending), BUNDLE_BLOCK_RECORDS):
+            lines = []
+            names = []
+            for fname in pending[start:start + BUNDLE_BLOCK_RECORDS]:
+                try:
+                    with open(os.path.join(day_dir, fname), "r") as src:
+                        doc = json.load(src)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"[WARN] Not compacting {fname}: {e}")
+                    continue
+                lines.append(json.dumps({"name": fname, "doc": doc}, separators=(",", ":")))
+                names.append(fname)
+            if not lines:
+                continue
+            frame = compressor.compress(("\n".join(lines) + "\n").encode())
+            block = len(index["blocks"])
+            index["blocks"].append([f.tell(), len(frame), len(lines)])
+            f.write(frame)
+            for line, fname in enumerate(names):
+                index["records"][fname] = [block, line]
+            packed += names
+        f.flush()
+        os.fsync(f.fileno())
+        index["size"] = f.tell()
+
+    if packed:
+        _write_index(index_path, index)
+    if not keep_json:
+        for fname in done + packed:
+            os.remove(os.path.join(day_dir, fname))
+    return len(packed)
+
+def compact_day(day_dir, keep_json=False):
+    """Compacts every loose result file of a day directory, returns {tool: files packed}"""
+    by_tool = {}
+    for fname in sorted(os.listdir(day_dir)):
+        tool = tool_for_file(fname)
+        if tool:
+            by_tool.setdefault(tool, []).append(fname)
+    return {tool: compact_tool(day_dir, tool, fnames, keep_json) for tool, fnames in by_tool.items()}
+
+def archive_day():
+    """Name of today's Archive/<date>/ directory; local time like `date` in pipeline.sh"""
+    return datetime.now().strftime("%Y-%m-%d")
+
+def compact_archive(archive_dir=ARCHIVE_DIR, before=None, keep_json=False):
+    """Compacts all day directories older than `before` (YYYY-MM-DD, default today's archive day)"""
+    before = before or archive_day()
+    totals = {}
+    if not os.path.isdir(archive_dir):
+        return totals
+    for day in sorted(os.listdir(archive_dir)):
+        day_dir = os.path.join(archive_dir, day)
+        try:
+            datetime.strptime(day, "%Y-%m-%d")
+        except ValueError:
+            continue
+        if day >= before or not os.path.isdir(day_dir):
+            continue
+        packed = compact_day(day_dir, keep_json)
+        if any(packed.values()):
+            print(f"[COMPACT] {day}: " + ", ".join(f"{tool} {count}" for tool, count in sorted(packed.items())))
+        for tool, count in packed.items():
+            totals[tool] = totals.get(tool, 0) + count
+    return totals
+
+
+if __name__ == "__main__":
+    # Usage: python3 archive_compactor.py [archive_dir] [first day to leave alone, YYYY-MM-DD]
+    archive_dir = sys.argv[1] if len(sys.argv) > 1 else ARCHIVE_DIR
+    before = sys.argv[2] if len(sys.argv) > 2 else None
+    try:
+        totals = compact_archive(archive_dir, before)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    print(f"[COMPACT] Packed {sum(totals.values())} files in {archive_dir}")
@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from fingerprint_store import to_epoch
+from archive_compactor import (
+    BUNDLE_SUFFIX,
+    tool_for_file,
+    load_index,
+    _zstd
+)
+
+# Metadata index of the archive, one row per result file, so that a query like
+# "prober, 17-ffaa:1:11e4, last 3 days" does not have to open every file.
+# <archive>/archive_index.db (SQLite in WAL mode, read by the analysis while the
+# pipeline updates it) holds:
+#   files         dir (relative to the archive, "" for a flat one), name, tool, ia,
+#                 ts (filename timestamp to the minute, UTC epoch seconds), tier_mbps, size,
+#                 mtime_ns of a loose file or the bundle the file is packed in
+#   fingerprints  the path fingerprints a file contains
+#   bundles       indexed size of every bundle of archive_compactor.py
+# Updates are incremental: loose files are only read again when size or mtime
+# changed, bundles only for names the index does not know yet.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
+ARCHIVE_DIR = os.path.join(BASE_DIR, "Archive")
+INDEX_DB_NAME = "archive_index.db"
+# Bump when the extracted metadata changes so the index is rebuilt
+INDEX_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    ia TEXT,
+    ts INTEGER,
+    tier_mbps INTEGER,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER,
+    bundle TEXT,
+    PRIMARY KEY (dir, name)
+);
+CREATE INDEX IF NOT EXISTS files_tool_ia_ts ON files (tool, ia, ts);
+CREATE INDEX IF NOT EXISTS files_tool_ts ON files (tool, ts);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fingerprints_file ON fingerprints (dir, name);
+CREATE INDEX IF NOT EXISTS fingerprints_fp ON fingerprints (fingerprint);
+CREATE TABLE IF NOT EXISTS bundles (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (dir, name)
+);
+"""
+
+
+def parse_filename_ts(fname):
+    """Naive UTC datetime of <prefix>_<timestamp>_..., to the minute.
+    Same rules as parse_filename_timestamp in AnalysisScripts/archive_records.py (the
+    file_ts the analysis filters on): BW-P files use '-' in the time part and their
+    seconds are dropped."""
+    try:
+        ts_str = fname.split("_")[1]
+        if "-" in ts_str and ":" not in ts_str:
+            date, time = ts_str.split("T")
+            time_parts = time.split("-")
+            ts_str = f"{date}T{time_parts[0]}:{time_parts[1]}"
+        return datetime.strptime(ts_str, "%Y-%m-%dT%H:%M")
+    except (IndexError, ValueError):
+        return None
+
+def parse_filename_ia(fname):
+    """IA of <prefix>_<timestamp>_[AS_]<isd>-<as with '_' for ':'>..."""
+    parts = fname[:-len(".json")].split("_")[2:]
+    if parts[:1] == ["AS"]:
+        parts = parts[1:]
+    if len(parts) < 3 or "-" not in parts[0]:
+        return None
+    return ":".join(parts[:3])
+
+def parse_filename_tier(fname):
+    last = fname[:-len(".json")].rsplit("_", 1)[-1]
+    if last.endswith("Mbps") and last[:-len("Mbps")].isdigit():
+        return int(last[:-len("Mbps")])
+    return None
+
+def collect_fingerprints(doc, found=None):
+    """Every "fingerprint" value anywhere in a result document"""
+    found = set() if found is None else found
+    if isinstance(doc, dict):
+        for key, value in doc.items():
+            if key == "fingerprint" and isinstance(value, str) and value:
+                found.add(value)
+            else:
+                collect_fingerprints(value, found)
+    elif isinstance(doc, list):
+        for value in doc:
+            collect_fingerprints(value, found)
+    return found
+
+def describe(fname, doc):
+    """(ia, ts, tier_mbps, fingerprints) of one result file"""
+    ia = parse_filename_ia(fname)
+    if ia is None and isinstance(doc, dict):
+        ia = doc.get("ia") or doc.get("destination") or (doc.get("target_server") or {}).get("ia") or doc.get("as")
+    tier = parse_filename_tier(fname)
+    if tier is None and isinstance(doc, dict):
+        tier = (doc.get("target") or {}).get("tier_mbps") or doc.get("target_mbps")
+    ts = parse_filename_ts(fname)
+    return ia, to_epoch(ts) if ts else None, tier, collect_fingerprints(doc)
+
+def read_bundle_docs(bundle_path, index, names):
+    """Yields (name, doc, size) for the given names, decompressing each needed frame once"""
+    decompressor = _zstd().ZstdDecompressor()
+    by_block = {}
+    for name in names:
+        block, line = index["records"][name]
+        by_block.setdefault(block, []).append((line, name))
+    with open(bundle_path, "rb") as f:
+        for block in sorted(by_block):
+            offset, length, _ = index["blocks"][block]
+            f.seek(offset)
+            lines = decompressor.decompress(f.read(length)).splitlines()
+            for line, name in by_block[block]:
+                yield name, json.loads(lines[line])["doc"], len(lines[line])
+
+
+class ArchiveIndex:
+    def __init__(self, archive_dir=ARCHIVE_DIR, db_path=None):
+        self.archive_dir = archive_dir
+        self.db_path = db_path or os.path.join(archive_dir, INDEX_DB_NAME)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            if conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                for table in ("files", "fingerprints", "bundles"):
+                    conn.execute(f"DELETE FROM {table}")
+                conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _put(self, conn, rel_dir, name, tool, meta, size, mtime_ns=None, bundle=None):
+        ia, ts, tier, fingerprints = meta
+        conn.execute(
+            "INSERT OR REPLACE INTO files (dir, name, tool, ia, ts, tier_mbps, size, mtime_ns, bundle) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (rel_dir, name, tool, ia, ts, tier, size, mtime_ns, bundle)
+        )
+        conn.execute("DELETE FROM fingerprints WHERE dir = ? AND name = ?", (rel_dir, name))
+        conn.executemany(
+            "INSERT INTO fingerprints (dir, name, fingerprint) VALUES (?, ?, ?)",
+            [(rel_dir, name, fp) for fp in sorted(fingerprints)]
+        )
+
+    def _drop(self, conn, rel_dir, names):
+        conn.executemany("DELETE FROM files WHERE dir = ? AND name = ?", [(rel_dir, name) for name in names])
+        conn.executemany("DELETE FROM fingerprints WHERE dir = ? AND name = ?", [(rel_dir, name) for name in names])
+
+    def update_dir(self, rel_dir):
+        """Brings the rows of one archive directory up to date, returns the number of files read"""
+        dir_path = os.path.join(self.archive_dir, rel_dir)
+        conn = self._connect()
+        known = {
+            name: (size, mtime_ns, bundle) for name, size, mtime_ns, bundle in
+            conn.execute("SELECT name, size, mtime_ns, bundle FROM files WHERE dir = ?", (rel_dir,))
+        }
+        bundle_sizes = dict(conn.execute("SELECT name, size FROM bundles WHERE dir = ?", (rel_dir,)))
+        seen = set()
+        read = 0
+
+        with conn:
+            fnames = sorted(os.listdir(dir_path))
+            loose = {fname: tool_for_file(fname) for fname in fnames if tool_for_file(fname)}
+            for fname, tool in loose.items():
+                seen.add(fname)
+                try:
+                    stat = os.stat(os.path.join(dir_path, fname))
+                    entry = known.get(fname)
+                    if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                        continue
+                    with open(os.path.join(dir_path, fname), "r") as f:
+                        doc = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"[WARN] Not indexing {fname}: {e}")
+                    continue
+                self._put(conn, rel_dir, fname, tool, describe(fname, doc), stat.st_size, stat.st_mtime_ns)
+                read += 1
+
+            for bundle in (fname for fname in fnames if fname.endswith(BUNDLE_SUFFIX)):
+                bundle_path = os.path.join(dir_path, bundle)
+                index_path = bundle_path[:-len(BUNDLE_SUFFIX)] + ".idx.json"
+                try:
+                    index = load_index(index_path, None)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"[WARN] Not indexing {bundle}: {e}")
+                    continue
+                tool = index.get("tool")
+                # Packed names the index knows as loose files whose copy is gone
+                moved = [name for name in index["records"] if name not in loose and name in known and known[name][2] != bundle]
+                conn.executemany(
+                    "UPDATE files SET bundle = ?, mtime_ns = NULL WHERE dir = ? AND name = ?",
+                    [(bundle, rel_dir, name) for name in moved]
+                )
+                seen.update(index["records"])
+                if bundle_sizes.get(bundle) == index["size"]:
+                    continue
+                new = [name for name in index["records"] if name not in loose and name not in known]
+                try:
+                    for name, doc, size in read_bundle_docs(bundle_path, index, new):
+                        self._put(conn, rel_dir, name, tool, describe(name, doc), size, bundle=bundle)
+                        read += 1
+                except (OSError, ValueError, RuntimeError) as e:
+                    print(f"[WARN] Not indexing {bundle}: {e}")
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO bundles (dir, name, size) VALUES (?, ?, ?)",
+                    (rel_dir, bundle, index["size"])
+                )
+
+            self._drop(conn, rel_dir, [name for name in known if name not in seen])
+        return read
+
+    def update(self):
+        """Updates the index for every directory of the archive, returns the number of files read"""
+        dirs = [""] + sorted(
+            day for day in os.listdir(self.archive_dir) if os.path.isdir(os.path.join(self.archive_dir, day))
+        )
+        read = sum(self.update_dir(rel_dir) for rel_dir in dirs)
+        conn = self._connect()
+        with conn:
+            marks = ",".join("?" for _ in dirs)
+            for table in ("files", "fingerprints", "bundles"):
+                conn.execute(f"DELETE FROM {table} WHERE dir NOT IN ({marks})", dirs)
+        return read
+
+    def query(self, tool=None, ias=None, since=None, until=None, tier=None, fingerprint=None):
+        """[(dir, name, bundle)] of the matching files ordered by name; since/until are naive UTC datetimes"""
+        query = "SELECT dir, name, bundle FROM files"
+        conditions, params = [], []
+        for condition, value in (
+            ("tool = ?", tool),
+            ("ts >= ?", to_epoch(since) if since else None),
+            ("ts < ?", to_epoch(until) if until else None),
+            ("tier_mbps = ?", tier),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        if ias:
+            conditions.append(f"ia IN ({','.join('?' for _ in ias)})")
+            params += list(ias)
+        if fingerprint is not None:
+            conditions.append("EXISTS (SELECT 1 FROM fingerprints f WHERE f.dir = files.dir AND f.name = files.name AND f.fingerprint = ?)")
+            params.append(fingerprint)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY name"
+        return self._connect().execute(query, params).fetchall()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+if __name__ == "__main__":
+    # Usage: python3 archive_index.py [archive_dir] [db_path, default <archive_dir>/archive_index.db]
+    archive_dir = sys.argv[1] if len(sys.argv) > 1 else ARCHIVE_DIR
+    db_path = sys.argv[2] if len(sys.argv) > 2 else None
+    if not os.path.isdir(archive_dir):
+        print(f"[ERROR] No archive at {archive_dir}")
+        sys.exit(1)
+    index = ArchiveIndex(archive_dir, db_path)
+    read = index.update()
+    print(f"[INDEX] Read {read} files, {index.db_path} is up to date")
@@ -0,0 +1,25 @@
+import os
+import json
+import threading
+import telemetry
+
+# Atomic JSON writes for the state files shared between tools.
+# The data is written to a tmp file next to the target and moved over it with
+# os.replace, so readers see either the old or the new file, never a partial
+# one. The tmp file is removed again if the write fails. The write span is
+# labelled with the calling tool and, unless a name is given, the file name.
+
+
+def write_json_atomic(path, data, tool, indent=None, name=None):
+    with telemetry.span("write", name or os.path.basename(path), tool=tool):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=indent)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
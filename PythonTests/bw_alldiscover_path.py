@@ -5,8 +5,18 @@ import time
 import random
 from datetime import datetime
 from math import ceil
+import path_cache
+import bw_capacity
+import disjoint_paths
+import telemetry
+from atomic_json import write_json_atomic
+from topology_graph import path_interfaces
+from bwtest_parser import parse_output
 from config import (
-    BWTEST_SERVERS
+    BWTEST_SERVERS,
+    BW_MODE,
+    MULTIPATH_K,
+    MULTIPATH_SELECTION
 )
 
 # Bandwidth tiers in Mbps
@@ -29,73 +39,55 @@ def normalize_as(as_str):
     return as_str.replace(":", "_")
 
 
-def get_paths_info(dst_ia):
+def get_path_data(dst_ia):
+    """showpaths result of dst_ia from the path cache, None on failure"""
     try:
-        cmd = ["scion", "showpaths", dst_ia, "--format", "json", "-m", "40", "-e"]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if result.returncode != 0:
-            print(f"[ERROR] showpaths failed for {dst_ia}: {result.stderr.strip()}")
-            return []
-
-        path_data = json.loads(result.stdout)
-        paths = path_data.get("paths", [])
-
-        path_list = []
-        for i, p in enumerate(paths):
-            fingerprint = p.get("fingerprint", "")
-
-            hops = p.get("hops", [])
-            sequence_hops = []
-            last_ia = None
-            for hop in hops:
-                ia = hop.get("ia") or hop.get("isd_as") or hop.get("isd_as_str") or "?"
-                if ia != last_ia:
-                    sequence_hops.append(ia)
-                    last_ia = ia
-
-            sequence = " -> ".join(sequence_hops)
-            path_list.append((i, fingerprint, sequence))
-        return path_list
+        path_data, error = path_cache.get_paths(dst_ia, tool="bw-alldiscover")
     except Exception as e:
         print(f"[EXCEPTION] while getting paths for {dst_ia}: {e}")
-        return []
+        return None
+    if error:
+        print(f"[ERROR] showpaths failed for {dst_ia}: {error}")
+        return None
+    return path_data
 
 
-def parse_output(text):
-    result = {
-        "S->C results": {},
-        "C->S results": {},
-        "invalid_format": False
-    }
-    if "S->C results" not in text or "C->S results" not in text:
-        result["invalid_format"] = True
-        result["raw_output"] = text.strip()
-        return result
-    try:
-        sections = text.split("C->S results")
-        sc_block = sections[0].split("S->C results")[-1].strip()
-        cs_block = sections[1].strip()
-    except Exception as e:
-        result["invalid_format"] = True
-        result["raw_output"] = text.strip()
-        result["error"] = f"Split failed: {e}"
-        return result
-
-    def extract_metrics(block):
-        import re
-        def _match(pattern, text):
-            match = re.search(pattern, text)
-            return match.group(1) if match else None
-        return {
-            "attempted_bps": _match(r"Attempted bandwidth:\s+(.+)", block),
-            "achieved_bps": _match(r"Achieved bandwidth:\s+(.+)", block),
-            "loss_rate": _match(r"Loss rate:\s+(.+)", block),
-            "interarrival time min/avg/max/mdev": _match(r"Interarrival time.*?=\s+(.+)", block)
-        }
+def paths_info_from(path_data):
+    """[(path index, fingerprint, AS sequence)] of a showpaths result"""
+    path_list = []
+    for i, p in enumerate((path_data or {}).get("paths", [])):
+        fingerprint = p.get("fingerprint", "")
 
-    result["S->C results"] = extract_metrics(sc_block)
-    result["C->S results"] = extract_metrics(cs_block)
-    return result
+        hops = p.get("hops", [])
+        sequence_hops = []
+        last_ia = None
+        for hop in hops:
+            ia = hop.get("ia") or hop.get("isd_as") or hop.get("isd_as_str") or "?"
+            if ia != last_ia:
+                sequence_hops.append(ia)
+                last_ia = ia
+
+        sequence = " -> ".join(sequence_hops)
+        path_list.append((i, fingerprint, sequence))
+    return path_list
+
+
+def get_paths_info(dst_ia):
+    return paths_info_from(get_path_data(dst_ia))
+
+
+def select_paths(ia, paths_info, path_data, num_paths, log_file):
+    """The paths tested this run, also used by bw_multipath.py.
+    paths_info must be built from path_data, its indexes point into path_data["paths"]."""
+    if MULTIPATH_SELECTION != "disjoint":
+        return random.sample(paths_info, num_paths)
+
+    raw_paths = path_data["paths"]
+    selected, overlap = disjoint_paths.select_disjoint(
+        paths_info, num_paths, lambda info: path_interfaces(raw_paths[info[0]])
+    )
+    log_file.write(f"[INFO] AS {ia}: selected paths {[i for i, _, _ in selected]} share {overlap} interfaces\n")
+    return selected
 
 
 def run_bwtest(ia, ip, target_mbps, fingerprint):
@@ -115,7 +107,9 @@ def run_bwtest(ia, ip, target_mbps, fingerprint):
         env = os.environ.copy()
         env["SCION_PATH_SELECTION"] = f"fingerprint:{fingerprint}"
 
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=30, env=env)
+        with telemetry.span("subprocess", "bwtest", tool="bw-alldiscover", ia=ia, fingerprint=fingerprint, target_mbps=target_mbps) as span:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=30, env=env)
+            span.set(exit_code=result.returncode)
 
         stdout = result.stdout.strip()
         stderr = result.stderr.strip()
@@ -191,11 +185,79 @@ def run_bwtest(ia, ip, target_mbps, fingerprint):
         }
 
 
-if __name__ == "__main__":
-    start = time.time()
-    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
+def run_tier_tests(ia, ip, folder, timestamp, paths_info, log_file):
+    for mbps in TARGET_MBPS:
+        all_results = {
+            "timestamp": timestamp,
+            "as": ia,
+            "target_mbps": mbps,
+            "paths": []
+        }
 
-    print("==== START BANDWIDTH TESTING ====")
+        for path_index, fingerprint, sequence in paths_info:
+            result = run_bwtest(ia, ip, mbps, fingerprint)
+
+            path_result = {
+                "path_index": path_index,
+                "fingerprint": fingerprint,
+                "sequence": sequence,
+                **result
+            }
+            all_results["paths"].append(path_result)
+
+            msg = f"[ERROR] {timestamp} - AS {ia} - {mbps}Mbps - path {path_index}: {result.get('error_type')}" \
+                if result.get("error_type") else \
+                f"[OK] {timestamp} - AS {ia} - {mbps}Mbps - path {path_index}"
+            print(msg)
+            log_file.write(msg + "\n")
+
+        output_dir = os.path.join(RESULT_DIR, folder)
+        os.makedirs(output_dir, exist_ok=True)
+        filename = f"BW_{timestamp}_AS_{normalize_as(ia)}_{mbps}Mbps.json"
+        with telemetry.span("write", "bw-alldiscover", tool="bw-alldiscover", ia=ia):
+            with open(os.path.join(output_dir, filename), "w") as f:
+                json.dump(all_results, f, indent=2)
+
+def run_capacity_search(ia, ip, folder, timestamp, paths_info, log_file):
+    """Searches the capacity of every selected path instead of testing all tiers"""
+    all_results = {
+        "timestamp": timestamp,
+        "as": ia,
+        "mode": "adaptive",
+        "paths": []
+    }
+
+    for path_index, fingerprint, sequence in paths_info:
+        capacity, steps = bw_capacity.search_capacity(
+            lambda mbps: run_bwtest(ia, ip, mbps, fingerprint),
+            bw_capacity.previous_estimate(fingerprint)
+        )
+        all_results["paths"].append({
+            "path_index": path_index,
+            "fingerprint": fingerprint,
+            "sequence": sequence,
+            "capacity_mbps": capacity,
+            "steps": steps
+        })
+
+        if capacity is None:
+            msg = f"[ERROR] {timestamp} - AS {ia} - path {path_index}: no passing rate after {len(steps)} tests"
+        else:
+            bw_capacity.save_estimate(fingerprint, ia, capacity, steps, tool="bw-alldiscover")
+            msg = f"[OK] {timestamp} - AS {ia} - path {path_index}: {capacity} Mbps after {len(steps)} tests"
+        print(msg)
+        log_file.write(msg + "\n")
+
+    output_dir = os.path.join(RESULT_DIR, folder)
+    os.makedirs(output_dir, exist_ok=True)
+    filename = f"BW-A_{timestamp}_AS_{normalize_as(ia)}.json"
+    with telemetry.span("write", "bw-alldiscover", tool="bw-alldiscover", ia=ia):
+        with open(os.path.join(output_dir, filename), "w") as f:
+            json.dump(all_results, f, indent=2)
+
+
+def run_all_bwtests():
+    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
 
     all_selected_paths = {}
 
@@ -206,7 +268,9 @@ if __name__ == "__main__":
         with open(log_path, "a") as log_file:
             log_file.write("==== START BANDWIDTH TESTING ====\n")
 
-            paths_info = get_paths_info(ia)
+            # One showpaths result for the path list and the interfaces of the disjoint selection
+            path_data = get_path_data(ia)
+            paths_info = paths_info_from(path_data)
 
             if not paths_info:
                 error_msg = f"[ERROR] {timestamp} - AS {ia}: No paths found or failed to retrieve paths"
@@ -227,51 +291,37 @@ if __name__ == "__main__":
                     output_dir = os.path.join(RESULT_DIR, folder)
                     os.makedirs(output_dir, exist_ok=True)
                     filename = f"BW_{timestamp}_AS_{normalize_as(ia)}_{mbps}Mbps.json"
-                    with open(os.path.join(output_dir, filename), "w") as f:
-                        json.dump(error_result, f, indent=2)
+                    with telemetry.span("write", "bw-alldiscover", tool="bw-alldiscover", ia=ia):
+                        with open(os.path.join(output_dir, filename), "w") as f:
+                            json.dump(error_result, f, indent=2)
 
                 continue
 
-            if len(paths_info) > 2:
-                paths_info = random.sample(paths_info, 2)
+            num_paths = max(2, MULTIPATH_K)
+            if len(paths_info) > num_paths:
+                paths_info = select_paths(ia, paths_info, path_data, num_paths, log_file)
 
             all_selected_paths[ia] = [{"path_index": i, "fingerprint": f, "sequence": s} for i, f, s in paths_info]
 
-            for mbps in TARGET_MBPS:
-                all_results = {
-                    "timestamp": timestamp,
-                    "as": ia,
-                    "target_mbps": mbps,
-                    "paths": []
-                }
+            if BW_MODE == "adaptive":
+                run_capacity_search(ia, ip, folder, timestamp, paths_info, log_file)
+            else:
+                run_tier_tests(ia, ip, folder, timestamp, paths_info, log_file)
 
-                for path_index, fingerprint, sequence in paths_info:
-                    result = run_bwtest(ia, ip, mbps, fingerprint)
+            log_file.write("==== END BANDWIDTH TESTING ====\n")
 
-                    path_result = {
-                        "path_index": path_index,
-                        "fingerprint": fingerprint,
-                        "sequence": sequence,
-                        **result
-                    }
-                    all_results["paths"].append(path_result)
+    # Read by bw_multipath.py and the daemon, so never leave a partial file
+    write_json_atomic(SELECTED_PATH_FILE, all_selected_paths, "bw-alldiscover", indent=2)
+    return all_selected_paths
 
-                    msg = f"[ERROR] {timestamp} - AS {ia} - {mbps}Mbps - path {path_index}: {result.get('error_type')}" \
-                        if result.get("error_type") else \
-                        f"[OK] {timestamp} - AS {ia} - {mbps}Mbps - path {path_index}"
-                    print(msg)
-                    log_file.write(msg + "\n")
 
-                output_dir = os.path.join(RESULT_DIR, folder)
-                os.makedirs(output_dir, exist_ok=True)
-                filename = f"BW_{timestamp}_AS_{normalize_as(ia)}_{mbps}Mbps.json"
-                with open(os.path.join(output_dir, filename), "w") as f:
-                    json.dump(all_results, f, indent=2)
+if __name__ == "__main__":
+    start = time.time()
 
-            log_file.write("==== END BANDWIDTH TESTING ====\n")
+    print("==== START BANDWIDTH TESTING ====")
 
-    with open(SELECTED_PATH_FILE, "w") as f:
-        json.dump(all_selected_paths, f, indent=2)
+    with telemetry.span("stage", "bw-alldiscover", tool="bw-alldiscover"):
+        run_all_bwtests()
 
     end = time.time()
     elapsed = end - start
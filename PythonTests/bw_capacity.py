@@ -0,0 +1,109 @@
+import os
+import json
+import threading
+from datetime import datetime
+from atomic_json import write_json_atomic
+from config import (
+    BW_SEARCH_START_MBPS,
+    BW_SEARCH_MIN_MBPS,
+    BW_SEARCH_MAX_MBPS,
+    BW_SEARCH_PRECISION_MBPS,
+    BW_SEARCH_MAX_STEPS,
+    BW_SATURATION_RATIO,
+    BW_MAX_LOSS
+)
+
+# Adaptive bandwidth testing: searches the highest rate a path sustains instead
+# of running every fixed tier. Estimates are kept per path in
+# Data/capacity_estimates.json and used as the starting rate of the next search.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
+CAPACITY_FILE = os.path.join(BASE_DIR, "capacity_estimates.json")
+
+_estimates_lock = threading.Lock()
+
+
+def evaluate(result):
+    """(passed, achieved Mbps) of one bwtest result, (None, None) if the test itself failed"""
+    if not result or result.get("error_type"):
+        return None, None
+    parsed = result.get("result") or {}
+    if parsed.get("invalid_format"):
+        return None, None
+
+    ratios, losses, achieved = [], [], []
+    for direction in ("S->C results", "C->S results"):
+        metrics = parsed.get(direction) or {}
+        if not metrics.get("attempted_bps") or metrics.get("achieved_bps") is None:
+            return None, None
+        ratios.append(metrics["achieved_bps"] / metrics["attempted_bps"])
+        losses.append(metrics.get("loss_fraction") or 0.0)
+        achieved.append(metrics["achieved_bps"] / 1e6)
+
+    passed = min(ratios) >= BW_SATURATION_RATIO and max(losses) <= BW_MAX_LOSS
+    return passed, min(achieved)
+
+def search_capacity(measure, start_mbps=None):
+    """Searches the capacity of one path.
+
+    measure(rate_mbps) runs one bwtest at an integer rate and returns its result.
+    The rate doubles while tests pass, then the interval between the highest
+    passing and the lowest failing rate is halved. After the first failure the
+    rate the path actually achieved is tried next; if that passes the path is
+    saturated and the search stops. Returns (capacity in Mbps or None, steps).
+    """
+    rate = min(max(int(start_mbps or BW_SEARCH_START_MBPS), BW_SEARCH_MIN_MBPS), BW_SEARCH_MAX_MBPS)
+    passing, failing = 0, None
+    tried_achieved = False
+    steps = []
+
+    for _ in range(BW_SEARCH_MAX_STEPS):
+        result = measure(rate)
+        passed, achieved = evaluate(result)
+        steps.append({"target_mbps": rate, "passed": passed, "achieved_mbps": achieved, **(result or {})})
+        if passed is None:
+            break
+
+        if passed:
+            passing = rate
+            if tried_achieved:
+                break  # The rate the path delivered under overload holds
+            next_rate = min(rate * 2, BW_SEARCH_MAX_MBPS) if failing is None else (passing + failing) // 2
+        else:
+            failing = rate
+            if achieved is not None and not tried_achieved and passing < int(achieved) < rate:
+                next_rate = int(achieved)
+                tried_achieved = True
+            else:
+                next_rate = (passing + failing) // 2
+
+        next_rate = max(next_rate, BW_SEARCH_MIN_MBPS)
+        if failing is not None and failing - passing <= BW_SEARCH_PRECISION_MBPS:
+            break
+        if next_rate in (passing, failing):
+            break
+        rate = next_rate
+
+    return (passing or None), steps
+
+
+def load_estimates():
+    try:
+        with open(CAPACITY_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def previous_estimate(key):
+    return load_estimates().get(key, {}).get("capacity_mbps")
+
+def save_estimate(key, ia, capacity_mbps, steps, tool):
+    with _estimates_lock:
+        estimates = load_estimates()
+        estimates[key] = {
+            "ia": ia,
+            "capacity_mbps": capacity_mbps,
+            "tests": len(steps),
+            "measured_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        write_json_atomic(CAPACITY_FILE, estimates, tool, indent=2)
@@ -1,12 +1,15 @@
 import os
 import subprocess
 import json
-import re
 import time
 from datetime import datetime
 from math import ceil
+import bw_capacity
+import telemetry
+from bwtest_parser import parse_output
 from config import (
-    BWTEST_SERVERS
+    BWTEST_SERVERS,
+    BW_MODE
 )
 # Bandwidth tiers in Mbps
 TARGET_MBPS = [5, 10, 50, 100]
@@ -27,46 +30,9 @@ os.makedirs(LOG_DIR, exist_ok=True)
 def normalize_as(as_str):
     return as_str.replace(":", "_")
 
-def parse_output(text):
-    result = {
-        "S->C results": {},
-        "C->S results": {},
-        "invalid_format": False
-    }
-
-    if "S->C results" not in text or "C->S results" not in text:
-        result["invalid_format"] = True
-        result["raw_output"] = text.strip()
-        return result
-
-    try:
-        sections = text.split("C->S results")
-        sc_block = sections[0].split("S->C results")[-1].strip()
-        cs_block = sections[1].strip()
-    except Exception as e:
-        result["invalid_format"] = True
-        result["raw_output"] = text.strip()
-        result["error"] = f"Split failed: {e}"
-        return result
-
-    def extract_metrics(block):
-        return {
-            "attempted_bps": _match(r"Attempted bandwidth:\s+(.+)", block),
-            "achieved_bps": _match(r"Achieved bandwidth:\s+(.+)", block),
-            "loss_rate": _match(r"Loss rate:\s+(.+)", block),
-            "interarrival time min/avg/max/mdev": _match(r"Interarrival time.*?=\s+(.+)", block)
-        }
-
-    def _match(pattern, text):
-        match = re.search(pattern, text)
-        return match.group(1) if match else None
 
-    result["S->C results"] = extract_metrics(sc_block)
-    result["C->S results"] = extract_metrics(cs_block)
-
-    return result
-
-def run_bwtest(ia, ip, folder, target_mbps):
+def run_bwtest(ia, ip, folder, target_mbps, save=True):
+    # save=False only returns the result, used for the steps of a capacity search
     timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
     tier_label = f"{target_mbps}Mbps"
     filename = f"BW_{timestamp}_AS_{normalize_as(ia)}_{tier_label}.json"
@@ -88,13 +54,15 @@ def run_bwtest(ia, ip, folder, target_mbps):
     ]
 
     try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-            timeout=30  
-        )
+        with telemetry.span("subprocess", "bwtest", tool="bw-collector", ia=ia, target_mbps=target_mbps) as span:
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                timeout=30
+            )
+            span.set(exit_code=result.returncode)
 
         stdout = result.stdout.strip()
         stderr = result.stderr.strip()
@@ -121,13 +89,15 @@ def run_bwtest(ia, ip, folder, target_mbps):
                 "return_code": result.returncode
             }
 
-            with open(output_path, "w") as f:
-                json.dump(entry, f, indent=2)
+            if save:
+                with telemetry.span("write", "bw-collector", tool="bw-collector", ia=ia):
+                    with open(output_path, "w") as f:
+                        json.dump(entry, f, indent=2)
 
             with open(log_path, "a") as log_file:
                 print(f"[NO PATH] {ia} at {tier_label}")
                 log_file.write(f"[NO PATH] {timestamp} {tier_label} - No path to destination.\n")
-            return
+            return entry
 
         # Parse valid results
         structured_output = parse_output(stdout)
@@ -150,8 +120,10 @@ def run_bwtest(ia, ip, folder, target_mbps):
             "return_code": result.returncode
         }
 
-        with open(output_path, "w") as f:
-            json.dump(entry, f, indent=2)
+        if save:
+            with telemetry.span("write", "bw-collector", tool="bw-collector", ia=ia):
+                with open(output_path, "w") as f:
+                    json.dump(entry, f, indent=2)
 
         with open(log_path, "a") as log_file:
             if structured_output.get("invalid_format", False):
@@ -163,6 +135,7 @@ def run_bwtest(ia, ip, folder, target_mbps):
             else:
                 print(f"[ERROR] Failed {ia} at {tier_label}")
                 log_file.write(f"[ERROR] {timestamp} {tier_label}: {stderr}\n")
+        return entry
 
     except subprocess.TimeoutExpired:
         print(f"[TIMEOUT] {ia} at {tier_label}")
@@ -173,13 +146,51 @@ def run_bwtest(ia, ip, folder, target_mbps):
         with open(log_path, "a") as log_file:
             log_file.write(f"[EXCEPTION] {timestamp} {tier_label}: {e}\n")
 
+def search_capacity(ia, ip, folder):
+    # Tests run over the default path, so the estimate is kept per AS. The steps
+    # are not written as tier files, the search is saved as one BW-A_ summary.
+    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
+    key = f"{ia} default"
+    capacity, steps = bw_capacity.search_capacity(
+        lambda mbps: run_bwtest(ia, ip, folder, mbps, save=False),
+        bw_capacity.previous_estimate(key)
+    )
+
+    if capacity is None:
+        print(f"[CAPACITY] {ia}: no passing rate after {len(steps)} tests")
+    else:
+        bw_capacity.save_estimate(key, ia, capacity, steps, tool="bw-collector")
+        print(f"[CAPACITY] {ia}: {capacity} Mbps after {len(steps)} tests")
+
+    summary = {
+        "timestamp": timestamp,
+        "as": ia,
+        "mode": "adaptive",
+        "target_server": {
+            "ia": ia,
+            "ip": ip
+        },
+        "capacity_mbps": capacity,
+        "steps": steps
+    }
+    output_dir = os.path.join(RESULT_DIR, folder)
+    os.makedirs(output_dir, exist_ok=True)
+    filename = f"BW-A_{timestamp}_AS_{normalize_as(ia)}.json"
+    with telemetry.span("write", "bw-collector", tool="bw-collector", ia=ia):
+        with open(os.path.join(output_dir, filename), "w") as f:
+            json.dump(summary, f, indent=2)
+
 # Main execution
 if __name__ == "__main__":
     global_start = time.time()
 
-    for ia, (ip, folder) in BWTEST_SERVERS.items():
-        for mbps in TARGET_MBPS:
-            run_bwtest(ia, ip, folder, mbps)
+    with telemetry.span("stage", "bw-collector", tool="bw-collector"):
+        for ia, (ip, folder) in BWTEST_SERVERS.items():
+            if BW_MODE == "adaptive":
+                search_capacity(ia, ip, folder)
+                continue
+            for mbps in TARGET_MBPS:
+                run_bwtest(ia, ip, folder, mbps)
 
     global_end = time.time()
     elapsed = global_end - global_start
@@ -3,11 +3,16 @@ import subprocess
 import json
 import time
 import random
+import threading
 from datetime import datetime
 from math import ceil
+import path_cache
+import telemetry
+from bwtest_parser import parse_output
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from config import (
-    BWTEST_SERVERS
+    BWTEST_SERVERS,
+    MULTIPATH_K
 )
 
 # Bandwidth tiers in Mbps
@@ -32,13 +37,11 @@ def normalize_as(as_str):
 
 def get_paths_info(dst_ia):
     try:
-        cmd = ["scion", "showpaths", dst_ia, "--format", "json", "-m", "40", "-e"]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if result.returncode != 0:
-            print(f"[ERROR] showpaths failed for {dst_ia}: {result.stderr.strip()}")
+        path_data, error = path_cache.get_paths(dst_ia, tool="bw-multipath")
+        if error:
+            print(f"[ERROR] showpaths failed for {dst_ia}: {error}")
             return []
 
-        path_data = json.loads(result.stdout)
         paths = path_data.get("paths", [])
 
         path_list = []
@@ -62,44 +65,13 @@ def get_paths_info(dst_ia):
         return []
 
 
-def parse_output(text):
-    result = {
-        "S->C results": {},
-        "C->S results": {},
-        "invalid_format": False
-    }
-    if "S->C results" not in text or "C->S results" not in text:
-        result["invalid_format"] = True
-        result["raw_output"] = text.strip()
-        return result
-    try:
-        sections = text.split("C->S results")
-        sc_block = sections[0].split("S->C results")[-1].strip()
-        cs_block = sections[1].strip()
-    except Exception as e:
-        result["invalid_format"] = True
-        result["raw_output"] = text.strip()
-        result["error"] = f"Split failed: {e}"
-        return result
-
-    def extract_metrics(block):
-        import re
-        def _match(pattern, text):
-            match = re.search(pattern, text)
-            return match.group(1) if match else None
-        return {
-            "attempted_bps": _match(r"Attempted bandwidth:\s+(.+)", block),
-            "achieved_bps": _match(r"Achieved bandwidth:\s+(.+)", block),
-            "loss_rate": _match(r"Loss rate:\s+(.+)", block),
-            "interarrival time min/avg/max/mdev": _match(r"Interarrival time.*?=\s+(.+)", block)
-        }
-
-    result["S->C results"] = extract_metrics(sc_block)
-    result["C->S results"] = extract_metrics(cs_block)
-    return result
+def run_bwtest(ia, ip, target_mbps, fingerprint, barrier=None, timing=None):
+    """Runs one bwtest over the given path.
 
-
-def run_bwtest(ia, ip, target_mbps, fingerprint):
+    With a barrier the client is only launched once all concurrent tests are
+    ready; timing then receives the monotonic launch and finish times.
+    """
+    timing = {} if timing is None else timing
     bps_target = int(target_mbps * 1_000_000)
     packet_count = ceil(bps_target * DURATION / (PACKET_SIZE * 8))
 
@@ -116,7 +88,17 @@ def run_bwtest(ia, ip, target_mbps, fingerprint):
         env = os.environ.copy()
         env["SCION_PATH_SELECTION"] = f"fingerprint:{fingerprint}"
 
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=30, env=env)
+        ready_at = time.monotonic()
+        if barrier is not None:
+            barrier.wait(timeout=30)
+        timing["launch"] = time.monotonic()
+        timing["launch_ts"] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+        with telemetry.span("subprocess", "bwtest", ready_at, tool="bw-multipath", ia=ia, fingerprint=fingerprint, target_mbps=target_mbps) as span:
+            try:
+                result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=30, env=env)
+            finally:
+                timing["finish"] = time.monotonic()
+            span.set(exit_code=result.returncode)
 
         stdout = result.stdout.strip()
         stderr = result.stderr.strip()
@@ -192,17 +174,82 @@ def run_bwtest(ia, ip, target_mbps, fingerprint):
         }
 
 
-if __name__ == "__main__":
-    start = time.time()
+def fill_paths(ia, paths_info, k):
+    """k paths for the test: the selected ones, topped up from showpaths if there are fewer"""
+    # Paths are identified by fingerprint: the indexes in selected_paths.json may come
+    # from an older showpaths result than the ones used to top up
+    unique = {}
+    for p in paths_info:
+        unique.setdefault(p["fingerprint"], p)
+    paths_info = list(unique.values())[:k]
+    if len(paths_info) < k:
+        selected = {p["fingerprint"] for p in paths_info}
+        extra = [p for p in get_paths_info(ia) if p[1] not in selected]
+        for i, f, s in random.sample(extra, min(k - len(paths_info), len(extra))):
+            paths_info.append({"path_index": i, "fingerprint": f, "sequence": s})
+    return paths_info
+
+
+def summarize_concurrency(all_results, timings):
+    """Adds launch offsets, the common transfer window, aggregate goodput and per-path shares.
+
+    overlap_weighted_bps sums every path's average goodput scaled by the
+    fraction of its test that ran while all other paths were running too. It is
+    a time-weighted scaling of the whole-test averages, not the goodput measured
+    during the common window: bwtestclient only reports per-test averages.
+    timings is keyed by path fingerprint.
+    """
+    windows = {fp: (t["launch"], t["finish"]) for fp, t in timings.items() if "launch" in t and "finish" in t}
+    if not windows:
+        return
+    first_launch = min(start for start, _ in windows.values())
+    overlap = max(0.0, min(end for _, end in windows.values()) - max(start for start, _ in windows.values()))
+
+    aggregate = {}
+    for direction in ("S->C results", "C->S results"):
+        aggregate[direction] = {"achieved_bps": 0.0, "overlap_weighted_bps": 0.0}
+
+    for path in all_results["paths"]:
+        window = windows.get(path["fingerprint"])
+        if window is None:
+            continue
+        start, end = window
+        path["start_offset_ms"] = round((start - first_launch) * 1000, 3)
+        path["end_offset_ms"] = round((end - first_launch) * 1000, 3)
+        overlap_fraction = overlap / (end - start) if end > start else 0.0
+        path["overlap_fraction"] = round(overlap_fraction, 4)
+
+        parsed = path.get("result") or {}
+        for direction in aggregate:
+            achieved = (parsed.get(direction) or {}).get("achieved_bps")
+            if achieved is None:
+                continue
+            aggregate[direction]["achieved_bps"] += achieved
+            aggregate[direction]["overlap_weighted_bps"] += achieved * overlap_fraction
+
+    for path in all_results["paths"]:
+        parsed = path.get("result") or {}
+        path["share"] = {}
+        for direction, totals in aggregate.items():
+            achieved = (parsed.get(direction) or {}).get("achieved_bps")
+            path["share"][direction] = round(achieved / totals["achieved_bps"], 4) if achieved and totals["achieved_bps"] else None
+
+    all_results["concurrency"] = {
+        "k": len(all_results["paths"]),
+        "max_start_offset_ms": round((max(start for start, _ in windows.values()) - first_launch) * 1000, 3),
+        "overlap_sec": round(overlap, 3),
+        "aggregate": aggregate
+    }
 
-    print("==== START BANDWIDTH MULTIPATH TESTING ====")
 
-    try:
-        with open(SELECTED_PATH_FILE, "r") as f:
-            selected_paths_data = json.load(f)
-    except Exception as e:
-        print(f"[ERROR] Failed to load selected paths: {e}")
-        selected_paths_data = {}
+def run_multipath_bwtests(selected_paths_data=None):
+    if selected_paths_data is None:
+        try:
+            with open(SELECTED_PATH_FILE, "r") as f:
+                selected_paths_data = json.load(f)
+        except Exception as e:
+            print(f"[ERROR] Failed to load selected paths: {e}")
+            selected_paths_data = {}
 
     for ia, (ip, folder) in BWTEST_SERVERS.items():
         log_filename = f"BW_AS_{normalize_as(ia)}.log"
@@ -211,7 +258,7 @@ if __name__ == "__main__":
         with open(log_path, "a") as log_file:
             log_file.write("==== START BANDWIDTH MULTIPATH TESTING ====\n")
 
-            paths_info = selected_paths_data.get(ia)
+            paths_info = fill_paths(ia, selected_paths_data.get(ia) or [], MULTIPATH_K)
             if not paths_info:
                 msg = f"[ERROR] {ia}: No selected paths found, skipping"
                 print(msg)
@@ -226,15 +273,19 @@ if __name__ == "__main__":
                     "paths": []
                 }
 
+                # All clients are launched together once every thread is ready
+                barrier = threading.Barrier(len(paths_info))
+                timings = {}
+
                 def test_path(path_data):
                     path_index = path_data["path_index"]
                     fingerprint = path_data["fingerprint"]
                     sequence = path_data["sequence"]
+                    timing = timings.setdefault(fingerprint, {})
 
-                    start_ts = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
-                    print(f"[START] {start_ts} - AS {ia} - {mbps}Mbps - path {path_index}")
-
-                    result = run_bwtest(ia, ip, mbps, fingerprint)
+                    print(f"[READY] {datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')} - AS {ia} - {mbps}Mbps - path {path_index}")
+                    result = run_bwtest(ia, ip, mbps, fingerprint, barrier, timing)
+                    start_ts = timing.get("launch_ts", "")
 
                     end_ts = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
                     print(f"[END] {end_ts} - AS {ia} - {mbps}Mbps - path {path_index}")
@@ -248,7 +299,7 @@ if __name__ == "__main__":
                         "end_ts": end_ts
                     }
 
-                with ThreadPoolExecutor(max_workers=2) as executor:
+                with ThreadPoolExecutor(max_workers=len(paths_info)) as executor:
                     futures = [executor.submit(test_path, p) for p in paths_info]
                     for future in as_completed(futures):
                         path_result = future.result()
@@ -262,14 +313,26 @@ if __name__ == "__main__":
                         print(msg)
                         log_file.write(msg + "\n")
 
+                summarize_concurrency(all_results, timings)
+
                 output_dir = os.path.join(RESULT_DIR, folder)
                 os.makedirs(output_dir, exist_ok=True)
                 filename = f"BW-P_{datetime.utcnow().strftime('%Y-%m-%dT%H-%M-%S')}_AS_{normalize_as(ia)}_{mbps}Mbps.json"
-                with open(os.path.join(output_dir, filename), "w") as f:
-                    json.dump(all_results, f, indent=2)
+                with telemetry.span("write", "bw-multipath", tool="bw-multipath", ia=ia):
+                    with open(os.path.join(output_dir, filename), "w") as f:
+                        json.dump(all_results, f, indent=2)
 
             log_file.write("==== END BANDWIDTH MULTIPATH TESTING ====\n")
 
+
+if __name__ == "__main__":
+    start = time.time()
+
+    print("==== START BANDWIDTH MULTIPATH TESTING ====")
+
+    with telemetry.span("stage", "bw-multipath", tool="bw-multipath"):
+        run_multipath_bwtests()
+
     print("==== END BANDWIDTH MULTIPATH TESTING ====")
 
     end = time.time()
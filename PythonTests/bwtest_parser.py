@@ -0,0 +1,76 @@
+import re
+
+# Parser for the text output of scion-bwtestclient, shared by the bandwidth tools.
+# Values are stored as numbers with fixed units so the analysis does not have
+# to parse strings:
+#   attempted_bps / achieved_bps   float, bits per second
+#   loss_fraction                  float, 0.0 - 1.0
+#   interarrival_ms                {"min", "avg", "max", "mdev"} in ms, or None
+# The raw output is only kept when it could not be parsed.
+
+_BANDWIDTH_RE = re.compile(r"(Attempted|Achieved) bandwidth:\s*([\d.]+)\s*([kMG]?)bps")
+_LOSS_RE = re.compile(r"Loss rate:\s*([\d.]+)\s*%")
+_INTERARRIVAL_RE = re.compile(
+    r"Interarrival time min/avg/max/mdev\s*=\s*([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+)\s*(ns|us|µs|ms|s)\b"
+)
+
+_BPS_FACTORS = {"": 1.0, "k": 1e3, "M": 1e6, "G": 1e9}
+_MS_FACTORS = {"ns": 1e-6, "us": 1e-3, "µs": 1e-3, "ms": 1.0, "s": 1e3}
+
+
+def parse_direction(block):
+    """Typed metrics of one "S->C results" / "C->S results" block, None if incomplete"""
+    bandwidth = {
+        kind: float(value) * _BPS_FACTORS[prefix]
+        for kind, value, prefix in _BANDWIDTH_RE.findall(block)
+    }
+    loss = _LOSS_RE.search(block)
+    if "Achieved" not in bandwidth or not loss:
+        return None
+
+    interarrival = None
+    match = _INTERARRIVAL_RE.search(block)
+    if match:
+        factor = _MS_FACTORS[match.group(5)]
+        interarrival = {
+            key: float(value) * factor
+            for key, value in zip(("min", "avg", "max", "mdev"), match.groups()[:4])
+        }
+
+    return {
+        "attempted_bps": bandwidth.get("Attempted"),
+        "achieved_bps": bandwidth["Achieved"],
+        "loss_fraction": float(loss.group(1)) / 100,
+        "interarrival_ms": interarrival
+    }
+
+def parse_output(text):
+    result = {
+        "S->C results": {},
+        "C->S results": {},
+        "invalid_format": False
+    }
+
+    sc_start = text.find("S->C results")
+    cs_start = text.find("C->S results")
+    if sc_start == -1 or cs_start == -1:
+        result["invalid_format"] = True
+        result["raw_output"] = text.strip()
+        return result
+
+    if sc_start < cs_start:
+        sc_block, cs_block = text[sc_start:cs_start], text[cs_start:]
+    else:
+        cs_block, sc_block = text[cs_start:sc_start], text[sc_start:]
+
+    sc = parse_direction(sc_block)
+    cs = parse_direction(cs_block)
+    if sc is None or cs is None:
+        result["invalid_format"] = True
+        result["raw_output"] = text.strip()
+        result["error"] = "Missing bandwidth or loss rate"
+        return result
+
+    result["S->C results"] = sc
+    result["C->S results"] = cs
+    return result
@@ -1,12 +1,16 @@
 import os
 import json
 from datetime import datetime
+import path_cache
+import path_selector
+import fingerprint_store
+import snapshot_manifest
+import telemetry
 from config import (
     AS_FOLDER_MAP
 )
 
 
-print("-----Starting Comparer-----")
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Define the base directory (../Data from the script)
@@ -43,54 +47,61 @@ def extract_fingerprint_map(paths):
         for p in paths
     }
 
-def compare_paths(ia):
+def seed_store_from_history(store, ia, as_folder):
+    """Starts the fingerprint store of an IA from its last showpaths history file"""
+    history_dir = os.path.join(HISTORY_SHOWPATHS_DIR, as_folder)
+    if not os.path.isdir(history_dir):
+        return
+    history_files = sorted(f for f in os.listdir(history_dir) if f.endswith(f"_{normalize_as(ia)}.json"))
+    if not history_files:
+        return
+    history_file = os.path.join(history_dir, history_files[-1])
+    history_fps_map = extract_fingerprint_map(extract_valid_paths(load_json(history_file)))
+    store.seed(ia, history_fps_map, int(os.path.getmtime(history_file)))
+
+def compare_paths(ia, latest_data=None):
     timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
     filename_base = normalize_as(ia)
     delta_filename = f"delta_{timestamp}_{filename_base}.json"
 
-    #Load latest file from Currently/
-    current_files = [f for f in os.listdir(CURRENTLY_DIR) if f.endswith(f"_{filename_base}.json")]
-    if not current_files:
-        print(f"[ERROR] No current file found for {ia}")
-        return
-    latest_file = os.path.join(CURRENTLY_DIR, current_files[0])
-    latest_data = load_json(latest_file)
-
-    #Load history file from Showpaths/AS-X/
+    #Summarize the latest snapshot, from the manifest unless the caller already holds the data
+    if latest_data is not None:
+        latest_summary = snapshot_manifest.summarize_snapshot(latest_data)
+    else:
+        latest_file, latest_summary = snapshot_manifest.current_snapshot(ia)
+        if not latest_file:
+            print(f"[ERROR] No current file found for {ia}")
+            return
+        if latest_summary is None:
+            latest_summary = snapshot_manifest.summarize_snapshot(load_json(latest_file))
+
+    #Diff against the paths the fingerprint store saw last
     as_folder = AS_FOLDER_MAP.get(ia, "UNKNOWN_AS")
-    history_dir = os.path.join(HISTORY_SHOWPATHS_DIR, as_folder)
-    os.makedirs(history_dir, exist_ok=True)
-
-    history_files = [f for f in os.listdir(history_dir) if f.endswith(f"_{filename_base}.json")]
-    history_file = os.path.join(history_dir, history_files[0]) if history_files else None
-    history_data = load_json(history_file) if history_file else {}
-
-    #Extract paths and fingerprint maps (ignoring timeouts)
-    valid_latest_paths = extract_valid_paths(latest_data)
-    valid_history_paths = extract_valid_paths(history_data)
+    store = fingerprint_store.default_store()
+    if not store.known(ia):
+        seed_store_from_history(store, ia, as_folder)
 
-    latest_fps_map = extract_fingerprint_map(valid_latest_paths)
-    history_fps_map = extract_fingerprint_map(valid_history_paths)
+    latest_fps_map = latest_summary["valid_fingerprints"]
+    ts = fingerprint_store.to_epoch(datetime.strptime(timestamp, "%Y-%m-%dT%H:%M"))
+    added_paths, removed_paths, history_fps_map = store.apply_snapshot(ia, latest_fps_map, ts)
 
     latest_fps = set(latest_fps_map.keys())
     history_fps = set(history_fps_map.keys())
-
-    #Compare sets
-    added = sorted(latest_fps - history_fps)
-    removed = sorted(history_fps - latest_fps)
+    added = [fp for fp, _ in added_paths]
+    removed = [fp for fp, _ in removed_paths]
 
     changes = []
-    for fp in added:
+    for fp, sequence in added_paths:
         changes.append({
             "fingerprint": fp,
-            "sequence": latest_fps_map.get(fp, "unknown"),
+            "sequence": sequence,
             "change": "added"
         })
 
-    for fp in removed:
+    for fp, sequence in removed_paths:
         changes.append({
             "fingerprint": fp,
-            "sequence": history_fps_map.get(fp, "unknown"),
+            "sequence": sequence,
             "change": "removed"
         })
 
@@ -108,18 +119,26 @@ def compare_paths(ia):
 
     output = {
         "timestamp": timestamp,
-        "source": latest_data.get("local_isd_as", "unknown"),
-        "destination": latest_data.get("destination", ia),
+        "source": latest_summary["local_isd_as"],
+        "destination": latest_summary["destination"] or ia,
         "change_status": change_status,
         "changes": changes
     }
 
+    store.record_comparison(ia, ts, change_status, added, removed)
+
+    #Churning IAs get their cached paths refreshed sooner
+    path_cache.default_cache().set_churn(ia, change_status == "change_detected", tool="comparer")
+    #and the fingerprints that changed are probed again soon
+    path_selector.default_selector().mark_churn(ia, added + removed, tool="comparer", present=latest_fps)
+
     #Save delta file
     comparer_sub_dir = os.path.join(COMPARER_DIR, as_folder)
     os.makedirs(comparer_sub_dir, exist_ok=True)
     delta_path = os.path.join(comparer_sub_dir, delta_filename)
-    with open(delta_path, "w") as f:
-        json.dump(output, f, indent=2)
+    with telemetry.span("write", "comparer", tool="comparer", ia=ia):
+        with open(delta_path, "w") as f:
+            json.dump(output, f, indent=2)
 
     #Logging
     log_file = os.path.join(LOG_DIR, f"log_compare_{filename_base}.txt")
@@ -140,7 +159,9 @@ def compare_paths(ia):
     return delta_path
 
 if __name__ == "__main__":
-    for ia in AS_FOLDER_MAP:
-        compare_paths(ia)
+    print("-----Starting Comparer-----")
+    with telemetry.span("stage", "comparer", tool="comparer"):
+        for ia in AS_FOLDER_MAP:
+            compare_paths(ia)
 
-print("-----Comparer Done-----")
+    print("-----Comparer Done-----")
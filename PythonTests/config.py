@@ -23,4 +23,103 @@ BWTEST_SERVERS = {
     "19-ffaa:0:1303": ("141.44.25.144", "Server-3"),
     #"20-ffaa:0:1401": ("134.75.250.114", "Server-4"),
     "18-ffaa:0:1201": ("128.2.24.126", "Server-5"),
-}
\ No newline at end of file
+}
+
+# Concurrent paths per multipath bandwidth test (bw_multipath.py). bw_alldiscover_path.py
+# selects at least this many paths, missing ones are filled up from showpaths.
+MULTIPATH_K = 2
+# How mp-prober.py and bw_alldiscover_path.py pick their multipath set (disjoint_paths.py):
+# "disjoint" takes the paths sharing the fewest interfaces, "random" samples them
+MULTIPATH_SELECTION = "disjoint"
+DISJOINT_MAX_EXTRA_HOPS = 2  # candidates may be this many AS hops longer than the shortest path
+DISJOINT_EXACT_LIMIT = 20000  # combinations up to which every set is scored, greedy above
+
+# Path discovery settings
+# "async" launches all showpaths calls concurrently, "sequential" runs them one by one
+DISCOVERY_MODE = "async"
+DISCOVERY_CONCURRENCY = 8  # max parallel scion showpaths processes
+DISCOVERY_TIMEOUT = 60  # seconds per showpaths call
+
+# Prober settings
+# "parallel" spreads pings over a worker pool, "sequential" probes one path at a time
+PROBER_MODE = "parallel"
+PROBER_WORKERS = 8  # concurrent scion ping processes across all destinations
+PROBER_MAX_PATHS = 15  # paths probed per destination and cycle
+PING_COUNT = 15  # echo requests per scion ping
+# Global SCMP budget shared by all concurrent pings. One scion ping sends
+# PING_RATE echo requests per second (its default 1s interval).
+SCMP_PACKETS_PER_SECOND = 6
+PING_RATE = 1
+# "fixed" sends PING_COUNT echo requests per path, "adaptive" (adaptive_ping.py) sends
+# batches of PING_BATCH until the confidence intervals on RTT and loss are narrow enough
+PING_MODE = "fixed"
+PING_BATCH = 5
+PING_MAX_COUNT = 30  # echo requests per path at most in adaptive mode
+PING_CONFIDENCE_Z = 1.645  # 90% two-sided
+PING_RTT_CI_REL = 0.1  # max half-width of the mean RTT interval, relative to the mean
+PING_LOSS_CI_WIDTH = 0.3  # max width of the Wilson interval on the loss fraction
+
+# Path selection of prober_scion.py and mp-prober.py (path_selector.py):
+# "random" samples uniformly, "bandit" ranks fingerprints by an upper confidence
+# bound over RTT/loss variability, plus bonuses for staleness and recent churn
+PATH_SELECTION = "bandit"
+SELECTOR_EXPLORATION = 1.0  # weight of the UCB exploration term
+SELECTOR_STALE_AFTER = 3600  # seconds since the last probe until the staleness bonus is full
+SELECTOR_CHURN_BONUS = 1.0  # for fingerprints the comparer saw appear or disappear
+SELECTOR_CHURN_WINDOW = 3600  # seconds the churn bonus lasts
+SELECTOR_PRUNE_AFTER = 288  # comparer snapshots a fingerprint may be missing before its statistics are dropped (a day at 5 min)
+# With MULTIPATH_SELECTION = "disjoint" mp-prober.py picks its set by interface overlap
+# instead; its results still update the statistics the single-path prober ranks by.
+
+# Traceroute collector (tr_collector_scion.py)
+# "parallel" traces in a pool of TRACEROUTE_WORKERS, "sequential" one path at a time
+TRACEROUTE_MODE = "parallel"
+TRACEROUTE_WORKERS = 4
+TRACEROUTE_MAX_PATHS = 10  # paths traced per destination and cycle
+# A path (fingerprint and sequence) traced less than TRACEROUTE_CACHE_TTL seconds ago is
+# skipped, except for a random TRACEROUTE_REFRESH_RATE fraction that is traced again anyway
+TRACEROUTE_CACHE_TTL = 3600
+TRACEROUTE_REFRESH_RATE = 0.1
+
+# Telemetry (telemetry.py): timing spans of subprocesses, file writes and pipeline
+# stages in Data/Telemetry/spans_<date>.jsonl, histograms in Data/Telemetry/metrics.prom
+TELEMETRY_ENABLED = True
+TELEMETRY_BUCKETS_MS = [10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000]
+
+# Archive compaction (archive_compactor.py): the files of finished days in Archive/<date>/
+# are packed into one zstd-compressed JSONL bundle per tool with an offset index
+BUNDLE_BLOCK_RECORDS = 64  # records per independently compressed frame, the unit a seek decompresses
+BUNDLE_ZSTD_LEVEL = 10
+
+# Measurement daemon (measurement_daemon.py): interval per job in seconds.
+# Jobs due at the same time run in this order, None disables a job.
+DAEMON_JOB_INTERVALS = {
+    "pathdiscovery": 300,  # also archives History/, rotates Currently/ and runs the comparer
+    "prober": 300,
+    "mp-prober": 300,
+    "traceroute": 300,
+    "bw_alldiscover": 3600,
+    "bw_multipath": 3600,
+    "compaction": 3600,  # packs finished days of Archive/ (archive_compactor.py)
+    "archive_index": 900,  # updates Archive/archive_index.db (archive_index.py)
+}
+
+# Shared showpaths cache (path_cache.py), seconds until an entry is refreshed.
+# IAs for which the comparer reported churn use the shorter PATH_CACHE_CHURN_TTL.
+PATH_CACHE_TTL = 600
+PATH_CACHE_CHURN_TTL = 120
+
+# Topology graph (topology_graph.py): links and paths not seen for this many seconds are dropped
+TOPOLOGY_MAX_AGE = 7 * 24 * 3600
+
+# Bandwidth test mode of bw_alldiscover_path.py and bw_collector_scion.py:
+# "tiers" runs every rate in TARGET_MBPS, "adaptive" searches the capacity of each path (bw_capacity.py)
+BW_MODE = "tiers"
+BW_SEARCH_START_MBPS = 10  # first rate when there is no earlier estimate for the path
+BW_SEARCH_MIN_MBPS = 1
+BW_SEARCH_MAX_MBPS = 100
+BW_SEARCH_PRECISION_MBPS = 2  # stop once the passing and the failing rate are this close
+BW_SEARCH_MAX_STEPS = 6  # bwtests per path and run
+# A rate passes if in both directions achieved/attempted >= BW_SATURATION_RATIO and loss <= BW_MAX_LOSS
+BW_SATURATION_RATIO = 0.9
+BW_MAX_LOSS = 0.05
@@ -0,0 +1,78 @@
+import random
+from itertools import combinations
+from math import comb
+from topology_graph import path_interfaces
+from config import (
+    DISJOINT_MAX_EXTRA_HOPS,
+    DISJOINT_EXACT_LIMIT
+)
+
+# Picks k paths that share as few interfaces as possible.
+# Every interface seen in the candidates gets one bit, so a path is an int
+# bitset and the overlap of two paths is the popcount of their AND. Candidates
+# longer than the shortest path by more than DISJOINT_MAX_EXTRA_HOPS AS hops are
+# dropped. If there are at most DISJOINT_EXACT_LIMIT k-sets all of them are
+# scored (sum of pairwise overlaps, then total hops), otherwise the set is built
+# greedily from the least overlapping pair.
+
+
+def popcount(x):
+    return bin(x).count("1")
+
+def path_bitsets(interface_lists):
+    """One int bitset per interface list, bits assigned in order of first appearance"""
+    bit_of = {}
+    bitsets = []
+    for interfaces in interface_lists:
+        mask = 0
+        for interface in interfaces:
+            mask |= 1 << bit_of.setdefault(interface, len(bit_of))
+        bitsets.append(mask)
+    return bitsets
+
+def set_overlap(indexes, bitsets):
+    return sum(popcount(bitsets[a] & bitsets[b]) for a, b in combinations(indexes, 2))
+
+def _exact(candidates, k, bitsets, hops):
+    return min(
+        combinations(candidates, k),
+        key=lambda chosen: (set_overlap(chosen, bitsets), sum(hops[i] for i in chosen))
+    )
+
+def _greedy(candidates, k, bitsets, hops):
+    first = min(
+        combinations(candidates, 2),
+        key=lambda pair: (popcount(bitsets[pair[0]] & bitsets[pair[1]]), hops[pair[0]] + hops[pair[1]])
+    )
+    chosen = list(first)
+    while len(chosen) < k:
+        rest = [i for i in candidates if i not in chosen]
+        chosen.append(min(rest, key=lambda i: (sum(popcount(bitsets[i] & bitsets[j]) for j in chosen), hops[i])))
+    return chosen
+
+def select_disjoint(paths, k, interfaces_of=path_interfaces):
+    """The k least overlapping of the given paths, and their summed pairwise interface overlap.
+
+    interfaces_of(path) returns the interfaces of a candidate, by default from a
+    showpaths entry. Ties are broken randomly.
+    """
+    paths = random.sample(paths, len(paths))
+    if len(paths) <= k:
+        return paths, None
+
+    interface_lists = [interfaces_of(p) for p in paths]
+    bitsets = path_bitsets(interface_lists)
+    hops = [len({ia for ia, _ in interfaces}) for interfaces in interface_lists]
+
+    shortest = min(hops)
+    candidates = [i for i in range(len(paths)) if hops[i] <= shortest + DISJOINT_MAX_EXTRA_HOPS]
+    if len(candidates) < k:
+        candidates = sorted(range(len(paths)), key=lambda i: hops[i])[:k]
+
+    if k < 2 or len(candidates) == k:
+        chosen = candidates[:k]
+    elif comb(len(candidates), k) <= DISJOINT_EXACT_LIMIT:
+        chosen = _exact(candidates, k, bitsets, hops)
+    else:
+        chosen = _greedy(candidates, k, bitsets, hops)
+    return [paths[i] for i in chosen], set_overlap(chosen, bitsets)
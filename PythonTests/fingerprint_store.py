@@ -0,0 +1,254 @@
+import os
+import sqlite3
+import threading
+from calendar import timegm
+
+# Persistent state of the paths seen per destination, used by the comparer.
+# Data/fingerprints.db (SQLite in WAL mode, so the analysis can read while the
+# comparer writes) holds:
+#   paths        first_seen, last_seen and status ("present"/"gone") per (ia, fingerprint)
+#   intervals    one row per period a fingerprint was present, end_ts is NULL while it still is
+#   events       every "added"/"removed" change
+#   comparisons  one row per compare run with its change_status
+# Applying a snapshot only writes the fingerprints that changed, apart from one
+# UPDATE of last_seen. Times are UTC epoch seconds.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
+FINGERPRINT_DB = os.path.join(BASE_DIR, "fingerprints.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS paths (
+    ia TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    sequence TEXT,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (ia, fingerprint)
+);
+CREATE TABLE IF NOT EXISTS intervals (
+    ia TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    sequence TEXT,
+    start_ts INTEGER NOT NULL,
+    end_ts INTEGER
+);
+CREATE INDEX IF NOT EXISTS intervals_open ON intervals (ia, fingerprint, end_ts);
+CREATE TABLE IF NOT EXISTS events (
+    ia TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    sequence TEXT,
+    change TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_ia_ts ON events (ia, ts);
+CREATE TABLE IF NOT EXISTS comparisons (
+    ia TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    change_status TEXT NOT NULL,
+    added INTEGER NOT NULL,
+    removed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS comparisons_ia_ts ON comparisons (ia, ts);
+"""
+
+
+def to_epoch(dt):
+    """Epoch seconds of a naive UTC datetime"""
+    return timegm(dt.timetuple())
+
+
+def _time_conditions(column, since, until):
+    conditions, params = [], []
+    for condition, value in ((f"{column} >= ?", since), (f"{column} < ?", until)):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    return conditions, params
+
+
+class FingerprintStore:
+    def __init__(self, db_path=FINGERPRINT_DB, readonly=False):
+        """readonly opens an existing store without creating or migrating it (analysis)"""
+        self.db_path = db_path
+        self.readonly = readonly
+        self._local = threading.local()
+        if not readonly:
+            with self._connect() as conn:
+                conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.readonly:
+                conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=30)
+            else:
+                conn = sqlite3.connect(self.db_path, timeout=30)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def ias(self):
+        """Sorted destination IAs with any state"""
+        rows = self._connect().execute("SELECT ia FROM paths UNION SELECT ia FROM comparisons")
+        return sorted(ia for ia, in rows)
+
+    def known(self, ia):
+        """Whether any snapshot of ia was applied yet"""
+        conn = self._connect()
+        return any(
+            conn.execute(f"SELECT 1 FROM {table} WHERE ia = ? LIMIT 1", (ia,)).fetchone()
+            for table in ("paths", "comparisons")
+        )
+
+    def current_paths(self, ia):
+        """{fingerprint: sequence} of the paths present in the last snapshot"""
+        rows = self._connect().execute(
+            "SELECT fingerprint, sequence FROM paths WHERE ia = ? AND status = 'present'", (ia,)
+        )
+        return dict(rows)
+
+    def apply_snapshot(self, ia, fingerprints, ts):
+        """Records a snapshot ({fingerprint: sequence} at epoch ts).
+
+        Returns (added, removed, previous) with added/removed as sorted
+        [(fingerprint, sequence)] and previous the fingerprint map before.
+        """
+        conn = self._connect()
+        with conn:
+            previous = dict(conn.execute(
+                "SELECT fingerprint, sequence FROM paths WHERE ia = ? AND status = 'present'", (ia,)
+            ))
+            added = sorted((fp, fingerprints[fp]) for fp in fingerprints.keys() - previous.keys())
+            removed = sorted((fp, previous[fp]) for fp in previous.keys() - fingerprints.keys())
+
+            conn.execute("UPDATE paths SET last_seen = ? WHERE ia = ? AND status = 'present'", (ts, ia))
+            conn.executemany(
+                "INSERT INTO paths (ia, fingerprint, sequence, first_seen, last_seen, status) "
+                "VALUES (?, ?, ?, ?, ?, 'present') "
+                "ON CONFLICT (ia, fingerprint) DO UPDATE SET sequence = excluded.sequence, "
+                "last_seen = excluded.last_seen, status = 'present'",
+                [(ia, fp, seq, ts, ts) for fp, seq in added]
+            )
+            conn.executemany(
+                "UPDATE paths SET status = 'gone' WHERE ia = ? AND fingerprint = ?",
+                [(ia, fp) for fp, _ in removed]
+            )
+            conn.executemany(
+                "INSERT INTO intervals (ia, fingerprint, sequence, start_ts, end_ts) VALUES (?, ?, ?, ?, NULL)",
+                [(ia, fp, seq, ts) for fp, seq in added]
+            )
+            conn.executemany(
+                "UPDATE intervals SET end_ts = ? WHERE ia = ? AND fingerprint = ? AND end_ts IS NULL",
+                [(ts, ia, fp) for fp, _ in removed]
+            )
+            conn.executemany(
+                "INSERT INTO events (ia, ts, fingerprint, sequence, change) VALUES (?, ?, ?, ?, ?)",
+                [(ia, ts, fp, seq, "added") for fp, seq in added] +
+                [(ia, ts, fp, seq, "removed") for fp, seq in removed]
+            )
+        return added, removed, previous
+
+    def seed(self, ia, fingerprints, ts):
+        """Starts the state of ia from an earlier snapshot ({fingerprint: sequence} at epoch ts).
+
+        Only the paths rows are written: their real first appearance is unknown, so
+        seeding records no "added" events and opens no intervals that churn() and
+        lifetimes() would report.
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO paths (ia, fingerprint, sequence, first_seen, last_seen, status) "
+                "VALUES (?, ?, ?, ?, ?, 'present')",
+                [(ia, fp, seq, ts, ts) for fp, seq in fingerprints.items()]
+            )
+
+    def record_comparison(self, ia, ts, change_status, added, removed):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO comparisons (ia, ts, change_status, added, removed) VALUES (?, ?, ?, ?, ?)",
+                (ia, ts, change_status, len(added), len(removed))
+            )
+
+    def comparisons(self, ia=None, since=None, until=None, resolution=3600):
+        """{(bucket start, change_status): count} of the compare runs"""
+        query = "SELECT (ts / ?) * ?, change_status, COUNT(*) FROM comparisons"
+        conditions, params = _time_conditions("ts", since, until)
+        if ia is not None:
+            conditions.append("ia = ?")
+            params.append(ia)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY 1, 2"
+        return {
+            (bucket, status): count
+            for bucket, status, count in self._connect().execute(query, [int(resolution), int(resolution)] + params)
+        }
+
+    def changed_sequences(self, ia=None, since=None, until=None):
+        """{(sequence, change): count} of the added/removed events"""
+        query = "SELECT COALESCE(sequence, ''), change, COUNT(*) FROM events"
+        conditions, params = _time_conditions("ts", since, until)
+        if ia is not None:
+            conditions.append("ia = ?")
+            params.append(ia)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY 1, 2"
+        return {(sequence, change): count for sequence, change, count in self._connect().execute(query, params)}
+
+    def lifetimes(self, ia=None, include_open=False, now=None, since=None, until=None):
+        """[(ia, fingerprint, sequence, seconds)] of the presence intervals.
+
+        Open intervals (paths still present) are only included with include_open,
+        measured up to now (default: their last_seen). since/until select the
+        intervals by their end (last_seen for open ones).
+        """
+        query = (
+            "SELECT i.ia, i.fingerprint, i.sequence, i.start_ts, i.end_ts, p.last_seen FROM intervals i "
+            "JOIN paths p ON p.ia = i.ia AND p.fingerprint = i.fingerprint"
+        )
+        conditions, params = _time_conditions("COALESCE(i.end_ts, p.last_seen)", since, until)
+        if ia is not None:
+            conditions.append("i.ia = ?")
+            params.append(ia)
+        if not include_open:
+            conditions.append("i.end_ts IS NOT NULL")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        rows = self._connect().execute(query, params)
+        return [
+            (row_ia, fp, seq, (end if end is not None else (now or last_seen)) - start)
+            for row_ia, fp, seq, start, end, last_seen in rows
+        ]
+
+    def churn(self, ia=None, since=None, until=None, resolution=3600):
+        """{(bucket start, change): count} of the added/removed events"""
+        query = "SELECT (ts / ?) * ?, change, COUNT(*) FROM events"
+        conditions, params = _time_conditions("ts", since, until)
+        if ia is not None:
+            conditions.append("ia = ?")
+            params.append(ia)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY 1, 2"
+        return {
+            (bucket, change): count
+            for bucket, change, count in self._connect().execute(query, [int(resolution), int(resolution)] + params)
+        }
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_default_store = None
+
+def default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = FingerprintStore()
+    return _default_store
@@ -0,0 +1,183 @@
+import os
+import time
+import shutil
+import asyncio
+import signal
+import threading
+import importlib
+from datetime import datetime
+import telemetry
+from config import (
+    AS_FOLDER_MAP,
+    AS_TARGETS,
+    DISCOVERY_MODE,
+    PROBER_MODE,
+    DAEMON_JOB_INTERVALS
+)
+
+# Resident replacement for Scripts/pipeline.sh: all tools are imported once and
+# scheduled with their own interval from DAEMON_JOB_INTERVALS.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
+CURRENTLY_DIR = os.path.join(BASE_DIR, "Currently")
+HISTORY_DIR = os.path.join(BASE_DIR, "History")
+ARCHIVE_DIR = os.path.join(BASE_DIR, "Archive")
+
+pathdiscovery = importlib.import_module("pathdiscovery_scion")
+comparer = importlib.import_module("comparer")
+prober = importlib.import_module("prober_scion")
+mp_prober = importlib.import_module("mp-prober")
+tr_collector = importlib.import_module("tr_collector_scion")
+bw_alldiscover = importlib.import_module("bw_alldiscover_path")
+bw_multipath = importlib.import_module("bw_multipath")
+archive_compactor = importlib.import_module("archive_compactor")
+archive_index = importlib.import_module("archive_index")
+
+
+def log(msg):
+    print(f"[{datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
+
+# Step 2 of pipeline.sh: move finished result files from History/<Tool>/ into Archive/<date>/.
+# The day is the host's local date, as in pipeline.sh, so cron and daemon runs fill the same directory
+def archive_history():
+    archive_day_dir = os.path.join(ARCHIVE_DIR, archive_compactor.archive_day())
+    os.makedirs(archive_day_dir, exist_ok=True)
+    moved = 0
+    for root, _, files in os.walk(HISTORY_DIR):
+        for fname in files:
+            if fname.endswith(".json"):
+                shutil.move(os.path.join(root, fname), os.path.join(archive_day_dir, fname))
+                moved += 1
+    return moved
+
+# Step 3 of pipeline.sh: move the previous snapshots to History/Showpaths/<AS-X>/ for the comparer
+def rotate_currently():
+    for fname in os.listdir(CURRENTLY_DIR):
+        if not fname.endswith(".json"):
+            continue
+        dest_dir = os.path.join(HISTORY_DIR, "Showpaths", fname.split("_")[0])
+        os.makedirs(dest_dir, exist_ok=True)
+        shutil.move(os.path.join(CURRENTLY_DIR, fname), os.path.join(dest_dir, fname))
+
+
+class MeasurementDaemon:
+    """Runs the measurement tools on per-job intervals inside one process.
+
+    State that every pipeline run used to rebuild from disk is kept in memory:
+    the latest showpaths result per IA and the paths picked by bw_alldiscover.
+    """
+
+    def __init__(self, intervals=DAEMON_JOB_INTERVALS):
+        jobs = {
+            "pathdiscovery": self.run_pathdiscovery,
+            "prober": self.run_prober,
+            "mp-prober": self.run_mp_prober,
+            "traceroute": self.run_traceroute,
+            "bw_alldiscover": self.run_bw_alldiscover,
+            "bw_multipath": self.run_bw_multipath,
+            "compaction": self.run_compaction,
+            "archive_index": self.run_archive_index,
+        }
+        unknown = set(intervals) - set(jobs)
+        if unknown:
+            raise ValueError(f"Unknown daemon jobs: {', '.join(sorted(unknown))}")
+
+        self.jobs = [(name, interval, jobs[name]) for name, interval in intervals.items() if interval]
+        self.next_run = {name: 0.0 for name, _, _ in self.jobs}
+        self.current_paths = {}
+        self.selected_bw_paths = None
+        self.archive_index = None
+        self.stop_event = threading.Event()
+
+    def run_pathdiscovery(self):
+        moved = archive_history()
+        log(f"Archived {moved} files")
+        rotate_currently()
+
+        if DISCOVERY_MODE == "async":
+            results = asyncio.run(pathdiscovery.discover_all_paths_async(AS_FOLDER_MAP))
+        else:
+            results = {ia: pathdiscovery.discover_paths(ia) for ia in AS_FOLDER_MAP}
+        # Keep only successful discoveries; tools fall back to Currently/ for the rest
+        self.current_paths = {ia: data for ia, data in results.items() if data is not None}
+
+        for ia in AS_FOLDER_MAP:
+            comparer.compare_paths(ia, self.current_paths.get(ia))
+
+    def run_prober(self):
+        if PROBER_MODE == "parallel":
+            prober.probe_all_targets_parallel(AS_TARGETS, current_paths=self.current_paths)
+        else:
+            for ia, (ip, folder) in AS_TARGETS.items():
+                prober.probe_all_paths(ia, ip, folder, self.current_paths.get(ia))
+
+    def run_mp_prober(self):
+        for ia, (ip, folder) in AS_TARGETS.items():
+            mp_prober.probe_mp_paths(ia, ip, folder, self.current_paths.get(ia))
+
+    def run_traceroute(self):
+        for ia, (ip, folder) in AS_TARGETS.items():
+            tr_collector.run_all_traceroutes(ia, ip, folder)
+
+    def run_bw_alldiscover(self):
+        self.selected_bw_paths = bw_alldiscover.run_all_bwtests()
+
+    def run_bw_multipath(self):
+        bw_multipath.run_multipath_bwtests(self.selected_bw_paths)
+
+    def run_compaction(self):
+        totals = archive_compactor.compact_archive(ARCHIVE_DIR)
+        log(f"Compacted {sum(totals.values())} archived files")
+
+    def run_archive_index(self):
+        if self.archive_index is None:
+            self.archive_index = archive_index.ArchiveIndex(ARCHIVE_DIR)
+        log(f"Indexed {self.archive_index.update()} new or changed archive files")
+
+    def stop(self, signum=None, frame=None):
+        if not self.stop_event.is_set():
+            log("Shutdown requested, finishing current job")
+        self.stop_event.set()
+
+    def run_due_jobs(self):
+        for name, interval, job in self.jobs:
+            if self.stop_event.is_set():
+                return
+            now = time.monotonic()
+            if self.next_run[name] > now:
+                continue
+
+            log(f"Starting {name}")
+            start = time.monotonic()
+            try:
+                with telemetry.span("stage", name, tool="daemon"):
+                    job()
+            except Exception as e:
+                log(f"[ERROR] {name} failed: {e}")
+            log(f"Finished {name} in {time.monotonic() - start:.2f} seconds")
+            self.next_run[name] = start + interval
+
+            # A failing export (full disk, unwritable textfile dir) must not stop the loop
+            try:
+                telemetry.export_metrics()
+            except Exception as e:
+                log(f"[ERROR] Metrics export failed: {e}")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        log("Measurement daemon started: " + ", ".join(f"{name} every {interval}s" for name, interval, _ in self.jobs))
+        while not self.stop_event.is_set():
+            self.run_due_jobs()
+            if not self.jobs:
+                break
+            delay = min(self.next_run.values()) - time.monotonic()
+            if delay > 0:
+                self.stop_event.wait(delay)
+        log("Measurement daemon stopped")
+
+
+if __name__ == "__main__":
+    MeasurementDaemon().run()
@@ -5,9 +5,13 @@ import random
 import time
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from config import AS_TARGETS
+import snapshot_manifest
+import path_selector
+import disjoint_paths
+import telemetry
+from adaptive_ping import adaptive_ping
+from config import AS_TARGETS, PING_COUNT, PING_MODE, MULTIPATH_SELECTION
 
-print("-----Starting MP-Prober-----")
 
 # Setup directories
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -23,42 +27,42 @@ def normalize_as(as_str):
     return as_str.replace(":", "_")
 
 def load_current_paths(as_str):
-    filename_base = normalize_as(as_str)
-    for f in os.listdir(CURRENTLY_DIR):
-        if f.endswith(f"_{filename_base}.json"):
-            with open(os.path.join(CURRENTLY_DIR, f), "r") as file:
-                try:
-                    return json.load(file)
-                except json.JSONDecodeError:
-                    return {}
-    return {}
+    return snapshot_manifest.load_current_paths(as_str)
 
-def run_scion_ping(ia, ip_target, sequence):
-    """Run one scion ping and timestamp its duration."""
-    start = time.time()
+def run_ping_count(ia, ip_target, sequence, count, fingerprint=None):
+    """Run one scion ping with count echo requests, returns (result, error)."""
     try:
-        result = subprocess.run(
-            ["scion", "ping", f"{ia},{ip_target}", "--format", "json", "-c", "15", "--sequence", sequence],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
-        end = time.time()
+        with telemetry.span("subprocess", "ping", tool="mp-prober", ia=ia, fingerprint=fingerprint) as span:
+            result = subprocess.run(
+                ["scion", "ping", f"{ia},{ip_target}", "--format", "json", "-c", str(count), "--sequence", sequence],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True
+            )
+            span.set(exit_code=result.returncode)
         if result.returncode != 0:
-            return {
-                "sequence": sequence,
-                "error": f"ping failed: {result.stderr.strip()}",
-                "duration": round(end - start, 2)
-            }
-        return {
-            "sequence": sequence,
-            "ping_result": json.loads(result.stdout),
-            "duration": round(end - start, 2)
-        }
+            return None, f"ping failed: {result.stderr.strip()}"
+        return json.loads(result.stdout), None
     except Exception as e:
-        return {"sequence": sequence, "error": str(e), "duration": round(time.time() - start, 2)}
+        return None, str(e)
+
+def run_scion_ping(ia, ip_target, sequence, fingerprint=None):
+    """Run one scion ping and timestamp its duration."""
+    start = time.time()
+    if PING_MODE == "adaptive":
+        ping_result, error = adaptive_ping(lambda count: run_ping_count(ia, ip_target, sequence, count, fingerprint))
+    else:
+        ping_result, error = run_ping_count(ia, ip_target, sequence, PING_COUNT, fingerprint)
+    duration = round(time.time() - start, 2)
+    if error:
+        return {"sequence": sequence, "error": error, "duration": duration}
+    return {
+        "sequence": sequence,
+        "ping_result": ping_result,
+        "duration": duration
+    }
 
-def probe_mp_paths(ia, ip_target, as_folder):
+def probe_mp_paths(ia, ip_target, as_folder, path_data=None):
     timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
     filename_base = normalize_as(ia)
 
@@ -74,26 +78,33 @@ def probe_mp_paths(ia, ip_target, as_folder):
     with open(log_path, "a") as log_file:
         log_file.write(f"\n[{timestamp}] Starting multipath probe for {ia} ({as_folder})\n")
 
-        path_data = load_current_paths(ia)
+        if path_data is None:
+            path_data = load_current_paths(ia)
         all_paths = [p for p in path_data.get("paths", []) if p.get("status", "").lower() != "timeout"]
 
         if len(all_paths) < 2:
             print("Not enough paths found for mp probe")
             log_file.write("Not enough usable paths found. Skipping.\n")
-            with open(output_path, "w") as f:
-                json.dump({
-                    "timestamp": timestamp,
-                    "ia": ia,
-                    "ip": ip_target,
-                    "note": "Insufficient paths for multipath probing",
-                    "probes": []
-                }, f, indent=2)
+            with telemetry.span("write", "mp-prober", tool="mp-prober", ia=ia):
+                with open(output_path, "w") as f:
+                    json.dump({
+                        "timestamp": timestamp,
+                        "ia": ia,
+                        "ip": ip_target,
+                        "note": "Insufficient paths for multipath probing",
+                        "probes": []
+                    }, f, indent=2)
             return
 
         num_paths = min(3, len(all_paths))
-        selected_paths = random.sample(all_paths, num_paths)
+        if MULTIPATH_SELECTION == "disjoint":
+            selected_paths, overlap = disjoint_paths.select_disjoint(all_paths, num_paths)
+        else:
+            selected_paths, overlap = path_selector.default_selector().select(ia, all_paths, num_paths), None
 
         log_file.write(f"Selected {num_paths} paths for parallel probing.\n")
+        if overlap is not None:
+            log_file.write(f"  Shared interfaces between the selected paths: {overlap}\n")
         for p in selected_paths:
             log_file.write(f"  -> {p.get('fingerprint')} | {p.get('sequence')}\n")
 
@@ -101,7 +112,7 @@ def probe_mp_paths(ia, ip_target, as_folder):
         results = []
         with ThreadPoolExecutor(max_workers=num_paths) as executor:
             futures = {
-                executor.submit(run_scion_ping, ia, ip_target, p["sequence"]): p
+                executor.submit(run_scion_ping, ia, ip_target, p["sequence"], p.get("fingerprint")): p
                 for p in selected_paths
             }
 
@@ -131,13 +142,17 @@ def probe_mp_paths(ia, ip_target, as_folder):
         "ip": ip_target,
         "probes": results
     }
-    with open(output_path, "w") as f:
-        json.dump(output_json, f, indent=2)
+    with telemetry.span("write", "mp-prober", tool="mp-prober", ia=ia):
+        with open(output_path, "w") as f:
+            json.dump(output_json, f, indent=2)
+    path_selector.default_selector().record(ia, results, tool="mp-prober")
 
     print(f"[DONE] MP probe for {ia} complete. Results at {output_path}")
 
 if __name__ == "__main__":
-    for ia, (ip, folder) in AS_TARGETS.items():
-        probe_mp_paths(ia, ip, folder)
+    print("-----Starting MP-Prober-----")
+    with telemetry.span("stage", "mp-prober", tool="mp-prober"):
+        for ia, (ip, folder) in AS_TARGETS.items():
+            probe_mp_paths(ia, ip, folder)
 
-print("-----MP-Probe Done-----")
+    print("-----MP-Probe Done-----")
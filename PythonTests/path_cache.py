@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import threading
+import subprocess
+import telemetry
+from atomic_json import write_json_atomic
+from config import (
+    PATH_CACHE_TTL,
+    PATH_CACHE_CHURN_TTL,
+    DISCOVERY_TIMEOUT
+)
+
+# Shared showpaths cache so collectors reuse the paths fetched by pathdiscovery_scion
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
+PATH_CACHE_DIR = os.path.join(BASE_DIR, "PathCache")
+
+
+def normalize_as(as_str):
+    return as_str.replace(":", "_")
+
+
+class PathCache:
+    """showpaths results keyed by IA, with TTL and one JSON file per IA.
+
+    Entries live in memory and in <cache_dir>/<ia>.json. A file written by
+    another process (e.g. the cron run of pathdiscovery) is picked up on the
+    next lookup because each lookup compares the file mtime with the loaded one.
+    IAs the comparer reported churn for expire after `churn_ttl` instead of `ttl`.
+    """
+
+    def __init__(self, cache_dir=PATH_CACHE_DIR, ttl=PATH_CACHE_TTL, churn_ttl=PATH_CACHE_CHURN_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.churn_ttl = churn_ttl
+        self._entries = {}  # ia -> (file mtime_ns, entry)
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _file(self, ia):
+        return os.path.join(self.cache_dir, f"{normalize_as(ia)}.json")
+
+    def _load(self, ia):
+        path = self._file(ia)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self._entries.pop(ia, None)
+            return None
+
+        cached = self._entries.get(ia)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        self._entries[ia] = (mtime, entry)
+        return entry
+
+    def _store(self, ia, entry, tool):
+        path = self._file(ia)
+        # One file per IA, the span gets a fixed name to keep the metric labels bounded
+        write_json_atomic(path, entry, tool, name="path_cache")
+        self._entries[ia] = (os.stat(path).st_mtime_ns, entry)
+
+    def is_fresh(self, ia, entry=None):
+        entry = entry or self._load(ia)
+        if not entry:
+            return False
+        ttl = self.churn_ttl if entry.get("churn") else self.ttl
+        return time.time() - entry.get("fetched_at", 0) < ttl
+
+    def put(self, ia, path_data, tool, fetched_at=None):
+        with self._lock:
+            previous = self._load(ia) or {}
+            self._store(ia, {
+                "ia": ia,
+                "fetched_at": fetched_at or time.time(),
+                "churn": previous.get("churn", False),
+                "data": path_data
+            }, tool)
+
+    def invalidate(self, ia):
+        with self._lock:
+            self._entries.pop(ia, None)
+            try:
+                os.remove(self._file(ia))
+            except FileNotFoundError:
+                pass
+
+    def set_churn(self, ia, churn, tool):
+        """Called by the comparer; churning IAs use the shorter churn_ttl"""
+        with self._lock:
+            entry = self._load(ia)
+            if entry and entry.get("churn") != churn:
+                self._store(ia, {**entry, "churn": churn}, tool)
+
+    def get_paths(self, ia, tool):
+        """Returns (showpaths data, error), running scion showpaths only if the entry is stale.
+
+        tool labels the showpaths and write spans with the collector that asked.
+        """
+        with self._lock:
+            entry = self._load(ia)
+            if self.is_fresh(ia, entry):
+                return entry["data"], None
+
+        try:
+            with telemetry.span("subprocess", "showpaths", tool=tool, ia=ia) as span:
+                result = subprocess.run(
+                    ["scion", "showpaths", ia, "--format", "json", "-m", "40", "-e"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    universal_newlines=True,
+                    timeout=DISCOVERY_TIMEOUT
+                )
+                span.set(exit_code=result.returncode)
+        except subprocess.TimeoutExpired:
+            return None, f"showpaths timed out after {DISCOVERY_TIMEOUT}s"
+        except Exception as e:
+            return None, str(e)
+
+        if result.returncode != 0:
+            return None, result.stderr.strip()
+        try:
+            path_data = json.loads(result.stdout)
+        except json.JSONDecodeError:
+            return None, "invalid JSON in showpaths output"
+
+        self.put(ia, path_data, tool)
+        return path_data, None
+
+
+_default_cache = None
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PathCache()
+    return _default_cache
+
+def get_paths(ia, tool):
+    return default_cache().get_paths(ia, tool)
@@ -0,0 +1,141 @@
+import os
+import json
+import math
+import time
+import random
+import threading
+from atomic_json import write_json_atomic
+from config import (
+    PATH_SELECTION,
+    SELECTOR_EXPLORATION,
+    SELECTOR_STALE_AFTER,
+    SELECTOR_CHURN_BONUS,
+    SELECTOR_CHURN_WINDOW,
+    SELECTOR_PRUNE_AFTER
+)
+
+# Chooses the paths the probers measure in a cycle.
+# Each fingerprint keeps running statistics of its probe results (count, mean and
+# variance of the average RTT, mean loss, last probe, last churn). Paths are ranked
+# by an upper confidence bound:
+#   variability + SELECTOR_EXPLORATION * sqrt(ln(total probes) / probes of the path)
+#   + staleness bonus + churn bonus
+# Unseen paths come first, timed-out paths last. The state is kept in
+# Data/path_selector.json so it carries over between cron runs; fingerprints
+# missing from SELECTOR_PRUNE_AFTER consecutive comparer snapshots are dropped.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
+SELECTOR_FILE = os.path.join(BASE_DIR, "path_selector.json")
+
+
+def _new_stats():
+    return {"n": 0, "mean_rtt": None, "m2_rtt": 0.0, "rtt_n": 0, "mean_loss": 0.0, "last_probed": 0, "churn_at": 0, "missed": 0}
+
+
+class PathSelector:
+    def __init__(self, state_file=SELECTOR_FILE):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.state_file, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, state, tool):
+        write_json_atomic(self.state_file, state, tool)
+
+    def score(self, stats, total, now):
+        """Upper confidence bound of what probing the path would tell us"""
+        if stats["n"] == 0:
+            return math.inf
+        if stats["rtt_n"] >= 2 and stats["mean_rtt"]:
+            rtt_cv = math.sqrt(stats["m2_rtt"] / (stats["rtt_n"] - 1)) / stats["mean_rtt"]
+        else:
+            rtt_cv = 1.0
+        loss = stats["mean_loss"]
+        variability = min(rtt_cv, 1.0) + 4 * loss * (1 - loss)
+        exploration = SELECTOR_EXPLORATION * math.sqrt(math.log(max(total, 1) + 1) / stats["n"])
+        staleness = min((now - stats["last_probed"]) / SELECTOR_STALE_AFTER, 1.0)
+        churn = SELECTOR_CHURN_BONUS if now - stats["churn_at"] < SELECTOR_CHURN_WINDOW else 0.0
+        return variability + exploration + staleness + churn
+
+    def select(self, ia, paths, count):
+        """The `count` most informative of the given showpaths entries"""
+        if PATH_SELECTION != "bandit":
+            return random.sample(paths, min(count, len(paths)))
+
+        with self._lock:
+            known = self._load().get(ia, {})
+        total = sum(stats["n"] for stats in known.values())
+        now = time.time()
+
+        def rank(path):
+            if (path.get("status") or "").lower() == "timeout":
+                return -math.inf, random.random()
+            stats = known.get(path.get("fingerprint")) or _new_stats()
+            return self.score(stats, total, now), random.random()
+
+        return sorted(paths, key=rank, reverse=True)[:count]
+
+    def record(self, ia, probes, tool):
+        """Updates the statistics from the probe entries of one run"""
+        now = time.time()
+        with self._lock:
+            state = self._load()
+            known = state.setdefault(ia, {})
+            for probe in probes:
+                fingerprint = probe.get("fingerprint")
+                if not fingerprint or probe.get("status") == "skipped":
+                    continue
+                stats = known.setdefault(fingerprint, _new_stats())
+                stats_json = (probe.get("ping_result") or {}).get("statistics") or {}
+                loss = 1.0 if "error" in probe else (stats_json.get("packet_loss") or 0) / 100
+                stats["n"] += 1
+                stats["mean_loss"] += (loss - stats["mean_loss"]) / stats["n"]
+                stats["last_probed"] = now
+
+                rtt = stats_json.get("avg_rtt")
+                if isinstance(rtt, (int, float)):
+                    # Welford's update of mean and variance
+                    stats["rtt_n"] += 1
+                    if stats["mean_rtt"] is None:
+                        stats["mean_rtt"] = 0.0
+                    delta = rtt - stats["mean_rtt"]
+                    stats["mean_rtt"] += delta / stats["rtt_n"]
+                    stats["m2_rtt"] += delta * (rtt - stats["mean_rtt"])
+            self._save(state, tool)
+
+    def mark_churn(self, ia, fingerprints, tool, present=None):
+        """Called by the comparer once per snapshot for the fingerprints that appeared or disappeared.
+
+        present are the fingerprints of the snapshot; the statistics of fingerprints
+        missing from SELECTOR_PRUNE_AFTER snapshots in a row are dropped.
+        """
+        if not fingerprints and present is None:
+            return
+        now = time.time()
+        with self._lock:
+            state = self._load()
+            known = state.setdefault(ia, {})
+            for fingerprint in fingerprints:
+                known.setdefault(fingerprint, _new_stats())["churn_at"] = now
+            if present is not None:
+                present = set(present)
+                for fingerprint in list(known):
+                    stats = known[fingerprint]
+                    stats["missed"] = 0 if fingerprint in present else stats.get("missed", 0) + 1
+                    if stats["missed"] >= SELECTOR_PRUNE_AFTER:
+                        del known[fingerprint]
+            self._save(state, tool)
+
+
+_default_selector = None
+
+def default_selector():
+    global _default_selector
+    if _default_selector is None:
+        _default_selector = PathSelector()
+    return _default_selector
@@ -1,13 +1,22 @@
 import os
 import json
+import asyncio
 import subprocess
+import time
 from datetime import datetime
+import path_cache
+import topology_graph
+import telemetry
+import snapshot_manifest
+from atomic_json import write_json_atomic
 from config import (
-    AS_FOLDER_MAP
+    AS_FOLDER_MAP,
+    DISCOVERY_MODE,
+    DISCOVERY_CONCURRENCY,
+    DISCOVERY_TIMEOUT
 )
 
 
-print("-----Starting Pathdiscovery-----")
 # Directory structure
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -26,9 +35,12 @@ os.makedirs(LOG_DIR, exist_ok=True)
 def normalize_as(as_str):
     return as_str.replace(":", "_")
 
-# Execute scion showpaths and save outputs
-def discover_paths(ia):
-    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
+def showpaths_command(ia):
+    return ["scion", "showpaths", ia, "--format", "json", "-m", "40", "-e"]
+
+# Validate showpaths output and save it to Currently/ plus the per-AS log
+# The async run leaves the topology graph to one batched update after all calls (update_graph=False)
+def save_discovery_result(ia, timestamp, returncode, stdout, stderr, update_graph=True):
     filename_base = normalize_as(ia)
     as_folder = AS_FOLDER_MAP.get(ia, "UNKNOWN_AS")
 
@@ -40,40 +52,97 @@ def discover_paths(ia):
     latest_file = os.path.join(CURRENTLY_DIR, f"{as_folder}_{timestamp}_{filename_base}.json")
     log_file = os.path.join(LOG_DIR, f"SP_AS_{filename_base}.log")
 
-    # Run scion command
-    result = subprocess.run(
-        ["scion", "showpaths", ia, "--format", "json", "-m", "40", "-e"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True
-    )
-
-    if result.returncode != 0:
-        print(f"[ERROR] Failed for {ia}: {result.stderr}")
+    if returncode != 0:
+        print(f"[ERROR] Failed for {ia}: {stderr}")
         with open(log_file, "a") as f:
-            f.write(f"[ERROR] {timestamp} - AS {ia} : {result.stderr}\n")
-        return
+            f.write(f"[ERROR] {timestamp} - AS {ia} : {stderr}\n")
+        return None
 
     try:
-        json_data = json.loads(result.stdout)
+        json_data = json.loads(stdout)
     except json.JSONDecodeError:
         print(f"[ERROR] Invalid JSON output for {ia}")
         with open(log_file, "a") as f:
             f.write(f"[ERROR] Invalid JSON output for {ia} at {timestamp}\n")
-        return
+        return None
 
 
-    # Save to "currently"
-    with open(latest_file, "w") as f:
-        json.dump(json_data, f, indent=2)
+    # Save to "currently", then publish it in the snapshot manifest and the path cache
+    # Snapshot names carry a timestamp, the span gets a fixed name to keep the metric labels bounded
+    write_json_atomic(latest_file, json_data, "pathdiscovery", indent=2, name="currently")
+    snapshot_manifest.publish_snapshot(ia, os.path.basename(latest_file), json_data, tool="pathdiscovery")
+    path_cache.default_cache().put(ia, json_data, tool="pathdiscovery")
+    if update_graph:
+        topology_graph.default_graph().add_showpaths(ia, json_data, tool="pathdiscovery")
 
     print(f"[OK] Saved paths to {latest_file}")
     with open(log_file, "a") as f:
         f.write(f"[SUCCESS] {timestamp} - AS {ia}\n")
+    return json_data
 
-if __name__ == "__main__":
-    for ia in AS_FOLDER_MAP:
-        discover_paths(ia)
+# Execute scion showpaths and save outputs
+def discover_paths(ia):
+    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
 
+    # Run scion command
+    with telemetry.span("subprocess", "showpaths", tool="pathdiscovery", ia=ia) as span:
+        result = subprocess.run(
+            showpaths_command(ia),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        span.set(exit_code=result.returncode)
+    return save_discovery_result(ia, timestamp, result.returncode, result.stdout, result.stderr)
+
+# Same as discover_paths, but as a coroutine limited by a shared semaphore
+async def discover_paths_async(ia, semaphore, timeout=DISCOVERY_TIMEOUT):
+    queued_at = time.monotonic()
+    async with semaphore:
+        timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
+        with telemetry.span("subprocess", "showpaths", queued_at, tool="pathdiscovery", ia=ia) as span:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *showpaths_command(ia),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+            except OSError as e:
+                span.set(error=type(e).__name__)
+                return save_discovery_result(ia, timestamp, -1, "", str(e))
+
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                span.set(error="timeout")
+                return save_discovery_result(ia, timestamp, -1, "", f"showpaths timed out after {timeout}s")
+            span.set(exit_code=proc.returncode)
+
+    # Results are written as soon as each call finishes, not after the whole batch
+    return save_discovery_result(ia, timestamp, proc.returncode, stdout.decode(), stderr.decode(), update_graph=False)
+
+async def discover_all_paths_async(ias, concurrency=DISCOVERY_CONCURRENCY, timeout=DISCOVERY_TIMEOUT):
+    semaphore = asyncio.Semaphore(concurrency)
+    ias = list(ias)
+    results = dict(zip(ias, await asyncio.gather(*(discover_paths_async(ia, semaphore, timeout) for ia in ias))))
+
+    # One graph update for the whole run, off the event loop (it holds the graph's file lock)
+    snapshots = {ia: data for ia, data in results.items() if data is not None}
+    if snapshots:
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: topology_graph.default_graph().add_showpaths_batch(snapshots, tool="pathdiscovery")
+        )
+    return results
 
-print("-----Pathdiscovery Done-----")
+if __name__ == "__main__":
+    print("-----Starting Pathdiscovery-----")
+    with telemetry.span("stage", "pathdiscovery", tool="pathdiscovery"):
+        if DISCOVERY_MODE == "async":
+            asyncio.run(discover_all_paths_async(AS_FOLDER_MAP))
+        else:
+            for ia in AS_FOLDER_MAP:
+                discover_paths(ia)
+
+    print("-----Pathdiscovery Done-----")
@@ -1,13 +1,26 @@
 import os
 import json
 import subprocess
-import random
+import time
+from contextlib import nullcontext
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from scmp_pacer import SCMPPacer
+from adaptive_ping import adaptive_ping
+import snapshot_manifest
+import path_selector
+import telemetry
 from config import (
-    AS_TARGETS
+    AS_TARGETS,
+    PROBER_MODE,
+    PROBER_WORKERS,
+    PROBER_MAX_PATHS,
+    PING_COUNT,
+    PING_MODE,
+    PING_RATE,
+    SCMP_PACKETS_PER_SECOND
 )
 
-print("-----Starting Prober-----")
 # Base directories
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
@@ -23,26 +36,22 @@ def normalize_as(as_str):
     return as_str.replace(":", "_")
 
 def load_current_paths(as_str):
-    filename_base = normalize_as(as_str)
-    for f in os.listdir(CURRENTLY_DIR):
-        if f.endswith(f"_{filename_base}.json"):
-            filepath = os.path.join(CURRENTLY_DIR, f)
-            with open(filepath, "r") as file:
-                try:
-                    return json.load(file)
-                except json.JSONDecodeError:
-                    return {}
-    return {}
-
-def run_scion_ping(ia, ip_target, sequence):
-    """Runs scion ping using a given path sequence"""
+    return snapshot_manifest.load_current_paths(as_str)
+
+def run_ping_count(ia, ip_target, sequence, count, pacer=None, fingerprint=None):
+    """Runs one scion ping with count echo requests using a given path sequence"""
     try:
-        result = subprocess.run(
-            ["scion", "ping", f"{ia},{ip_target}", "--format", "json", "-c", "15", "--sequence", sequence],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
+        # The span starts once the SCMP budget granted the ping, the pacer wait is its queue wait
+        queued_at = time.monotonic()
+        with pacer.reserve(PING_RATE) if pacer else nullcontext(0.0), \
+                telemetry.span("subprocess", "ping", queued_at, tool="prober", ia=ia, fingerprint=fingerprint) as span:
+            result = subprocess.run(
+                ["scion", "ping", f"{ia},{ip_target}", "--format", "json", "-c", str(count), "--sequence", sequence],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True
+            )
+            span.set(exit_code=result.returncode)
         if result.returncode != 0:
             return None, f"ping failed: {result.stderr.strip()}"
         return json.loads(result.stdout), None
@@ -51,78 +60,161 @@ def run_scion_ping(ia, ip_target, sequence):
     except Exception as e:
         return None, str(e)
 
-def probe_all_paths(ia, ip_target, as_folder):
+def run_scion_ping(ia, ip_target, sequence, pacer=None, fingerprint=None):
+    """Runs scion ping using a given path sequence"""
+    if PING_MODE == "adaptive":
+        return adaptive_ping(lambda count: run_ping_count(ia, ip_target, sequence, count, pacer, fingerprint))
+    return run_ping_count(ia, ip_target, sequence, PING_COUNT, pacer, fingerprint)
+
+def select_probe_paths(ia, all_paths):
+    # Select max PROBER_MAX_PATHS paths, ranked by the path selector
+    return path_selector.default_selector().select(ia, all_paths, PROBER_MAX_PATHS)
+
+def probe_path(ia, ip_target, path, pacer=None):
+    """Probes a single path, returns its probe entry (or None) and the log lines"""
+    sequence = path.get("sequence")
+    fingerprint = path.get("fingerprint")
+    status = path.get("status") or ""
+    if not sequence or not fingerprint:
+        return None, ["Skipping path with missing sequence or fingerprint."]
+
+    if status.lower() == "timeout":
+        return {
+            "fingerprint": fingerprint,
+            "sequence": sequence,
+            "status": "skipped",
+            "note": "Skipped probing: path previously timed out"
+        }, [f"Skipping timed-out path: {fingerprint} | {sequence}"]
+
+    log_lines = [f"Probing path: {fingerprint} | {sequence}"]
+    result, error = run_scion_ping(ia, ip_target, sequence, pacer, fingerprint)
+    if error:
+        log_lines.append(f"  [ERROR] {error}")
+        return {
+            "fingerprint": fingerprint,
+            "sequence": sequence,
+            "error": error
+        }, log_lines
+
+    sampling = result.get("sampling")
+    if sampling:
+        log_lines.append(f"  [OK] Probe successful ({sampling['samples']} samples, {sampling['stop_reason']}).")
+    else:
+        log_lines.append(f"  [OK] Probe successful.")
+    return {
+        "fingerprint": fingerprint,
+        "sequence": sequence,
+        "ping_result": result
+    }, log_lines
+
+def prepare_probe_run(ia, ip_target, as_folder, path_data=None):
+    """Loads the current paths of an IA (unless given) and writes the run header to its log"""
     timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
     filename_base = normalize_as(ia)
     output_dir = os.path.join(BASE_PROBER_DIR, as_folder)
     os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, f"prober_{timestamp}_{filename_base}.json")
-    log_path = os.path.join(LOG_DIR, f"log_prober_{filename_base}.txt")
-
-    path_data = load_current_paths(ia)
-    all_paths = path_data.get("paths", [])
-
-    with open(log_path, "a") as log_file:
+    run = {
+        "ia": ia,
+        "ip": ip_target,
+        "timestamp": timestamp,
+        "output_path": os.path.join(output_dir, f"prober_{timestamp}_{filename_base}.json"),
+        "log_path": os.path.join(LOG_DIR, f"log_prober_{filename_base}.txt"),
+        "paths": []
+    }
+
+    if path_data is None:
+        path_data = load_current_paths(ia)
+    all_paths = list(path_data.get("paths", []))
+    with open(run["log_path"], "a") as log_file:
         log_file.write(f"\n[{timestamp}] Starting probes for {ia} ({as_folder})\n")
-
         if not all_paths:
             log_file.write("No paths found in Currently/ directory.\n")
             print(f"[WARNING] No paths found for {ia}. Log created but no json written")
-            return
-
-        # Shuffle and select max 15 paths
-        random.shuffle(all_paths)
-        selected_paths = all_paths[:min(15, len(all_paths))]
-
-        combined_results = {
-            "timestamp": timestamp,
-            "ia": ia,
-            "ip": ip_target,
-            "probes": []
+            return None
+
+    run["paths"] = select_probe_paths(ia, all_paths)
+    return run
+
+def write_probe_results(run, outcomes):
+    """Writes the prober_<ts>_<ia>.json file from (entry, log_lines) outcomes in path order"""
+    combined_results = {
+        "timestamp": run["timestamp"],
+        "ia": run["ia"],
+        "ip": run["ip"],
+        "probes": []
+    }
+    with open(run["log_path"], "a") as log_file:
+        for entry, log_lines in outcomes:
+            for line in log_lines:
+                log_file.write(line + "\n")
+            if entry is not None:
+                combined_results["probes"].append(entry)
+
+    with telemetry.span("write", "prober", tool="prober", ia=run["ia"]):
+        with open(run["output_path"], "w") as f:
+            json.dump(combined_results, f, indent=2)
+    path_selector.default_selector().record(run["ia"], combined_results["probes"], tool="prober")
+
+    print(f"[DONE] Probing complete for {run['ia']}. Results saved to {run['output_path']}")
+
+def probe_all_paths(ia, ip_target, as_folder, path_data=None):
+    run = prepare_probe_run(ia, ip_target, as_folder, path_data)
+    if run is None:
+        return
+    outcomes = [probe_path(ia, ip_target, path) for path in run["paths"]]
+    write_probe_results(run, outcomes)
+
+def probe_all_targets_parallel(targets, workers=PROBER_WORKERS, packets_per_second=SCMP_PACKETS_PER_SECOND, current_paths=None):
+    """Probes all destinations at once in a bounded worker pool.
+
+    Pings of different destinations are interleaved so no single IA holds all
+    workers, and a shared SCMPPacer keeps the total echo request rate within
+    the global budget. Each IA still gets its own prober_<ts>_<ia>.json.
+    current_paths optionally maps IA to already loaded showpaths data.
+    """
+    current_paths = current_paths or {}
+    runs = []
+    for ia, (ip, folder) in targets.items():
+        run = prepare_probe_run(ia, ip, folder, current_paths.get(ia))
+        if run is not None:
+            runs.append(run)
+
+    # Round-robin over destinations: path 0 of every IA, then path 1, ...
+    tasks = []
+    for position in range(max((len(run["paths"]) for run in runs), default=0)):
+        for run in runs:
+            if position < len(run["paths"]):
+                tasks.append((run, position))
+
+    pacer = SCMPPacer(packets_per_second)
+    outcomes = {id(run): [None] * len(run["paths"]) for run in runs}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(probe_path, run["ia"], run["ip"], run["paths"][position], pacer): (run, position)
+            for run, position in tasks
         }
-
-        for path in selected_paths:
-            sequence = path.get("sequence")
-            fingerprint = path.get("fingerprint")
-            status = path.get("status")
-            if not sequence or not fingerprint:
-                log_file.write("Skipping path with missing sequence or fingerprint.\n")
-                continue
-
-            if status.lower() == "timeout":
-                log_file.write(f"Skipping timed-out path: {fingerprint} | {sequence}\n")
-                combined_results["probes"].append({
-                    "fingerprint": fingerprint,
-                    "sequence": sequence,
-                    "status": "skipped",
-                    "note": "Skipped probing: path previously timed out"
-                })
-                continue
-
-            log_file.write(f"Probing path: {fingerprint} | {sequence}\n")
-            result, error = run_scion_ping(ia, ip_target, sequence)
-            if error:
-                log_file.write(f"  [ERROR] {error}\n")
-                combined_results["probes"].append({
-                    "fingerprint": fingerprint,
-                    "sequence": sequence,
-                    "error": error
-                })
-            else:
-                log_file.write(f"  [OK] Probe successful.\n")
-                combined_results["probes"].append({
-                    "fingerprint": fingerprint,
-                    "sequence": sequence,
-                    "ping_result": result
-                })
-
-    with open(output_path, "w") as f:
-        json.dump(combined_results, f, indent=2)
-
-    print(f"[DONE] Probing complete for {ia}. Results saved to {output_path}")
+        for future in as_completed(futures):
+            run, position = futures[future]
+            path = run["paths"][position]
+            try:
+                outcomes[id(run)][position] = future.result()
+            except Exception as e:
+                outcomes[id(run)][position] = ({
+                    "fingerprint": path.get("fingerprint"),
+                    "sequence": path.get("sequence"),
+                    "error": str(e)
+                }, [f"  [ERROR] Probe worker failed for {path.get('sequence')}: {e}"])
+
+    for run in runs:
+        write_probe_results(run, outcomes[id(run)])
 
 if __name__ == "__main__":
-    for ia, (ip, folder) in AS_TARGETS.items():
-        probe_all_paths(ia, ip, folder)
-
-print("-----Prober Done-----")
+    print("-----Starting Prober-----")
+    with telemetry.span("stage", "prober", tool="prober"):
+        if PROBER_MODE == "parallel":
+            probe_all_targets_parallel(AS_TARGETS)
+        else:
+            for ia, (ip, folder) in AS_TARGETS.items():
+                probe_all_paths(ia, ip, folder)
+
+    print("-----Prober Done-----")
@@ -0,0 +1,53 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SCMPPacer:
+    """Global packets-per-second budget shared by concurrent scion ping calls.
+
+    Each running ping reserves the rate it sends echo requests at. A new ping
+    only starts once the total reserved rate fits into the budget, and starts
+    are spaced by at least 1/budget seconds so parallel pings do not fire
+    their requests in lockstep.
+    """
+
+    def __init__(self, packets_per_second):
+        if packets_per_second <= 0:
+            raise ValueError("packets_per_second must be positive")
+        self.packets_per_second = packets_per_second
+        self.min_start_gap = 1.0 / packets_per_second
+        self._reserved = 0.0
+        self._next_start = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, rate=1.0):
+        """Block until `rate` packets per second are free; returns the seconds waited"""
+        rate = min(rate, self.packets_per_second)
+        start = time.monotonic()
+        with self._cond:
+            while self._reserved + rate > self.packets_per_second:
+                self._cond.wait()
+            self._reserved += rate
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + self.min_start_gap
+
+        delay = start_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return time.monotonic() - start
+
+    def release(self, rate=1.0):
+        rate = min(rate, self.packets_per_second)
+        with self._cond:
+            self._reserved = max(0.0, self._reserved - rate)
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, rate=1.0):
+        waited = self.acquire(rate)
+        try:
+            yield waited
+        finally:
+            self.release(rate)
@@ -0,0 +1,104 @@
+import os
+import json
+import fcntl
+import threading
+from atomic_json import write_json_atomic
+from datetime import datetime
+
+# Index of the current showpaths snapshot per IA.
+# Data/currently_manifest.json maps each IA to its file in Currently/ plus a
+# parsed summary, so readers do not have to scan the directory. It is always
+# replaced via os.replace, readers therefore see either the old or the new
+# manifest, never a partial one.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
+CURRENTLY_DIR = os.path.join(BASE_DIR, "Currently")
+MANIFEST_FILE = os.path.join(BASE_DIR, "currently_manifest.json")
+LOCK_FILE = MANIFEST_FILE + ".lock"
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def normalize_as(as_str):
+    return as_str.replace(":", "_")
+
+def summarize_snapshot(path_data):
+    paths = path_data.get("paths", []) if path_data else []
+    valid = [p for p in paths if p.get("status") != "timeout"]
+    return {
+        "local_isd_as": path_data.get("local_isd_as", "unknown") if path_data else "unknown",
+        "destination": path_data.get("destination") if path_data else None,
+        "path_count": len(paths),
+        "timeout_count": len(paths) - len(valid),
+        "valid_fingerprints": {
+            p["fingerprint"]: p.get("sequence", "unknown_sequence")
+            for p in valid if "fingerprint" in p
+        }
+    }
+
+def _read_manifest_file():
+    try:
+        with open(MANIFEST_FILE, "r") as f:
+            return json.load(f).get("snapshots", {})
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def load_manifest(reload=False):
+    """Returns the IA -> entry mapping, read from disk once per process"""
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None or reload:
+            _manifest = _read_manifest_file()
+        return _manifest
+
+def publish_snapshot(ia, filename, path_data, tool):
+    """Registers Currently/<filename> as the snapshot of `ia` and republishes the manifest"""
+    global _manifest
+    entry = {
+        "file": filename,
+        "published_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"),
+        "summary": summarize_snapshot(path_data)
+    }
+    # The file lock serializes writers from different processes, the thread lock writers in this one
+    with _manifest_lock, open(LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        snapshots = _read_manifest_file()
+        snapshots[ia] = entry
+        write_json_atomic(MANIFEST_FILE, {"snapshots": snapshots}, tool, indent=2)
+        _manifest = snapshots
+
+def _scan_currently(ia):
+    # Fallback when the manifest has no usable entry: newest matching file by name
+    suffix = f"_{normalize_as(ia)}.json"
+    try:
+        matches = sorted(f for f in os.listdir(CURRENTLY_DIR) if f.endswith(suffix))
+    except FileNotFoundError:
+        return None
+    return matches[-1] if matches else None
+
+def current_snapshot(ia):
+    """Returns (file path, summary or None) of the current snapshot of `ia`, or (None, None)"""
+    for reload in (False, True):
+        entry = load_manifest(reload).get(ia)
+        if entry:
+            path = os.path.join(CURRENTLY_DIR, entry["file"])
+            if os.path.isfile(path):
+                return path, entry.get("summary")
+
+    # Snapshot rotated away or written without the manifest (older tools)
+    filename = _scan_currently(ia)
+    if filename:
+        return os.path.join(CURRENTLY_DIR, filename), None
+    return None, None
+
+def load_current_paths(ia):
+    """Parsed showpaths data of the current snapshot of `ia`, {} if there is none"""
+    path, _ = current_snapshot(ia)
+    if not path:
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from config import (
+    TELEMETRY_ENABLED,
+    TELEMETRY_BUCKETS_MS
+)
+
+# Timing spans for the measurement tools.
+# Every subprocess call, result write and pipeline stage is wrapped in a span
+# that records kind, name, tool, IA, fingerprint, queue wait, wall time and exit
+# code. Spans are appended to Data/Telemetry/spans_<date>.jsonl, one JSON object
+# per line. export_metrics() folds new spans into cumulative histograms (kept in
+# .metrics_state.json with the read offset of every span file) and writes them
+# as an OpenMetrics textfile; `python telemetry.py serve <port>` serves the same
+# text over HTTP.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
+TELEMETRY_DIR = os.path.join(BASE_DIR, "Telemetry")
+METRICS_FILE = os.path.join(TELEMETRY_DIR, "metrics.prom")
+METRICS_STATE_FILE = os.path.join(TELEMETRY_DIR, ".metrics_state.json")
+EXPORT_LOCK_FILE = os.path.join(TELEMETRY_DIR, ".metrics_state.lock")
+METRIC_PREFIX = "scion_measurement"
+
+_write_lock = threading.Lock()
+_export_lock = threading.Lock()
+_write_failed = False
+
+
+class Span:
+    """Context manager timing one operation; attributes can be added with set()"""
+
+    def __init__(self, kind, name, queued_at=None, **attrs):
+        self.kind = kind
+        self.name = name
+        self.queued_at = queued_at  # time.monotonic() when the work was queued
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        self.start_ts = datetime.utcnow()
+        if self.queued_at is not None:
+            self.attrs.setdefault("queue_wait_ms", round((self.started - self.queued_at) * 1000, 3))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_ms = (time.monotonic() - self.started) * 1000
+        if exc_type is not None:
+            self.attrs.setdefault("error", exc_type.__name__)
+        record({
+            "ts": self.start_ts.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+            "kind": self.kind,
+            "name": self.name,
+            **self.attrs,
+            "wall_ms": round(wall_ms, 3),
+            "pid": os.getpid()
+        })
+        return False
+
+def span(kind, name, queued_at=None, **attrs):
+    return Span(kind, name, queued_at, **attrs)
+
+def spans_file(day=None):
+    return os.path.join(TELEMETRY_DIR, f"spans_{(day or datetime.utcnow()).strftime('%Y-%m-%d')}.jsonl")
+
+def record(entry):
+    """Appends one span; a failing write is reported once and never reaches the measurement"""
+    global _write_failed
+    if not TELEMETRY_ENABLED:
+        return
+    line = json.dumps(entry) + "\n"
+    with _write_lock:
+        try:
+            os.makedirs(TELEMETRY_DIR, exist_ok=True)
+            with open(spans_file(), "a") as f:
+                f.write(line)
+        except OSError as e:
+            if not _write_failed:
+                _write_failed = True
+                print(f"[TELEMETRY] Could not write spans to {TELEMETRY_DIR}: {e}")
+
+
+def _load_state():
+    try:
+        with open(METRICS_STATE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"offsets": {}, "series": {}}
+
+def _observe(series, key, labels, value_ms):
+    entry = series.setdefault(key, {"labels": labels, "buckets": [0] * len(TELEMETRY_BUCKETS_MS), "sum_ms": 0.0, "count": 0})
+    for i, bound in enumerate(TELEMETRY_BUCKETS_MS):
+        if value_ms <= bound:
+            entry["buckets"][i] += 1
+    entry["sum_ms"] += value_ms
+    entry["count"] += 1
+
+def _fold(state, entry):
+    labels = {"kind": entry.get("kind", ""), "name": entry.get("name", ""), "tool": entry.get("tool", "")}
+    key = "|".join(labels.values())
+    series = state["series"]
+    _observe(series.setdefault("duration", {}), key, labels, entry.get("wall_ms", 0.0))
+    if entry.get("queue_wait_ms") is not None:
+        _observe(series.setdefault("queue_wait", {}), key, labels, entry["queue_wait_ms"])
+    failures = series.setdefault("failures", {})
+    failures.setdefault(key, {"labels": labels, "value": 0})
+    if entry.get("error") or entry.get("exit_code") not in (None, 0):
+        failures[key]["value"] += 1
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels, **extra):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in {**labels, **extra}.items()) + "}"
+
+def render_metrics(state):
+    lines = []
+    for metric, help_text in (("duration", "Wall time of measurement spans"), ("queue_wait", "Time spans waited for a worker or the SCMP budget")):
+        name = f"{METRIC_PREFIX}_span_{metric}_seconds"
+        lines += [f"# TYPE {name} histogram", f"# UNIT {name} seconds", f"# HELP {name} {help_text}."]
+        for entry in state["series"].get(metric, {}).values():
+            for bound, count in zip(TELEMETRY_BUCKETS_MS, entry["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(entry['labels'], le=f'{bound / 1000:g}')} {count}")
+            lines.append(f"{name}_bucket{_format_labels(entry['labels'], le='+Inf')} {entry['count']}")
+            lines.append(f"{name}_sum{_format_labels(entry['labels'])} {entry['sum_ms'] / 1000:.6f}")
+            lines.append(f"{name}_count{_format_labels(entry['labels'])} {entry['count']}")
+    name = f"{METRIC_PREFIX}_span_failures"
+    lines += [f"# TYPE {name} counter", f"# HELP {name} Spans that raised or exited with a non-zero code."]
+    for entry in state["series"].get("failures", {}).values():
+        lines.append(f"{name}_total{_format_labels(entry['labels'])} {entry['value']}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+def export_metrics():
+    """Folds the spans written since the last export into the histograms and rewrites the textfile"""
+    os.makedirs(TELEMETRY_DIR, exist_ok=True)
+    # The file lock serializes exports of different processes (pipeline, daemon, serve), the thread lock
+    # exports in this one, so a smaller state is never written over a newer one
+    with _export_lock, open(EXPORT_LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = _load_state()
+        present = set()
+        for fname in sorted(os.listdir(TELEMETRY_DIR)):
+            if not (fname.startswith("spans_") and fname.endswith(".jsonl")):
+                continue
+            present.add(fname)
+            offset = state["offsets"].get(fname, 0)
+            with open(os.path.join(TELEMETRY_DIR, fname), "rb") as f:
+                f.seek(offset)
+                while True:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break  # Unfinished line of a concurrent writer, read it next time
+                    offset = f.tell()
+                    try:
+                        _fold(state, json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+            state["offsets"][fname] = offset
+        state["offsets"] = {fname: offset for fname, offset in state["offsets"].items() if fname in present}
+
+        text = render_metrics(state)
+        for path, content in ((METRICS_STATE_FILE, json.dumps(state)), (METRICS_FILE, text)):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return text
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = export_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port):
+    print(f"[TELEMETRY] Serving metrics on :{port}")
+    HTTPServer(("", port), MetricsHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "serve":
+        serve(int(sys.argv[2]))
+    else:
+        export_metrics()
+        print(f"[TELEMETRY] Metrics written to {METRICS_FILE}")
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+from atomic_json import write_json_atomic
+from config import TOPOLOGY_MAX_AGE
+
+# Interface-level topology assembled from showpaths and traceroute results.
+# Nodes are (ISD-AS, interface id), a link connects the egress interface of one
+# AS with the ingress interface of the next. Every link keeps its last-seen time
+# and an EWMA of the RTT increment traceroute observed across it; every path
+# (fingerprint) keeps its destination, sequence and links. Reverse indexes from
+# link and interface to paths answer the sharing/impact queries without a scan.
+# The graph lives in memory and in Data/topology_graph.json. Updates hold a
+# thread lock and an flock on Data/topology_graph.json.lock while they reload
+# the file if another process replaced it, apply their change and replace it,
+# so concurrent collectors (cron runs, the daemon) do not lose each other's
+# links. Paths and links not seen for TOPOLOGY_MAX_AGE seconds are dropped on
+# every update.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
+TOPOLOGY_FILE = os.path.join(BASE_DIR, "topology_graph.json")
+RTT_EWMA_ALPHA = 0.3
+
+
+def interface_key(ia, ifid):
+    return f"{ia}#{ifid}"
+
+def link_key(a, b):
+    """Order-independent key of the link between two interface keys"""
+    return " ".join(sorted((a, b)))
+
+def path_interfaces(path):
+    """[(isd_as, interface id)] along a showpaths path, from its hops or its sequence"""
+    hops = path.get("hops") or []
+    interfaces = []
+    for hop in hops:
+        ia = hop.get("isd_as") or hop.get("ia")
+        ifid = hop.get("ifid", hop.get("interface_id"))
+        if ia is not None and ifid is not None:
+            interfaces.append((ia, int(ifid)))
+    if interfaces:
+        return interfaces
+
+    for token in (path.get("sequence") or "").split():
+        if "#" not in token:
+            continue
+        ia, ifids = token.split("#", 1)
+        interfaces.extend((ia, int(ifid)) for ifid in ifids.split(",") if ifid.isdigit())
+    return interfaces
+
+def path_links(interfaces):
+    """Link keys between consecutive interfaces of different ASes"""
+    return [
+        link_key(interface_key(*a), interface_key(*b))
+        for a, b in zip(interfaces, interfaces[1:])
+        if a[0] != b[0]
+    ]
+
+
+class TopologyGraph:
+    def __init__(self, graph_file=TOPOLOGY_FILE, max_age=TOPOLOGY_MAX_AGE):
+        self.graph_file = graph_file
+        self.lock_file = graph_file + ".lock"
+        self.max_age = max_age
+        self.links = {}  # link key -> {"ends": [a, b], "last_seen", "rtt_ms", "rtt_samples"}
+        self.paths = {}  # fingerprint -> {"destination", "sequence", "links", "last_seen"}
+        self._link_paths = defaultdict(set)
+        self._interface_links = defaultdict(set)
+        self._file_id = None  # (inode, size, mtime) of the file the graph was loaded from or saved to
+        self._lock = threading.Lock()
+        self._reload()
+
+    def _index(self):
+        self._link_paths = defaultdict(set)
+        self._interface_links = defaultdict(set)
+        for key, link in self.links.items():
+            for end in link["ends"]:
+                self._interface_links[end].add(key)
+        for fingerprint, path in self.paths.items():
+            for key in path["links"]:
+                self._link_paths[key].add(fingerprint)
+
+    @staticmethod
+    def _stat_id(stat):
+        # Every save replaces the file, so another writer always changes the inode
+        # even when the mtime stays within the timestamp granularity
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _reload(self, force=False):
+        try:
+            file_id = self._stat_id(os.stat(self.graph_file))
+        except FileNotFoundError:
+            return
+        if file_id == self._file_id and not force:
+            return
+        try:
+            with open(self.graph_file, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self.links = data.get("links", {})
+        self.paths = data.get("paths", {})
+        self._file_id = file_id
+        self._index()
+
+    def _save(self, tool):
+        write_json_atomic(self.graph_file, {"links": self.links, "paths": self.paths}, tool)
+        self._file_id = self._stat_id(os.stat(self.graph_file))
+
+    @contextmanager
+    def _update(self, now, tool):
+        """Reload, change and write the graph while no other thread or process does"""
+        with self._lock, open(self.lock_file, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._reload()
+            yield
+            self._prune(now)
+            self._save(tool)
+
+    def _prune(self, now):
+        cutoff = now - self.max_age
+        for fingerprint in [fp for fp, p in self.paths.items() if p["last_seen"] < cutoff]:
+            self._drop_path(fingerprint)
+        for key in [k for k, link in self.links.items() if link["last_seen"] < cutoff and not self._link_paths.get(k)]:
+            for end in self.links.pop(key)["ends"]:
+                self._interface_links[end].discard(key)
+            self._link_paths.pop(key, None)
+
+    def _touch_link(self, key, now):
+        link = self.links.get(key)
+        if link is None:
+            link = self.links[key] = {"ends": key.split(" "), "last_seen": now, "rtt_ms": None, "rtt_samples": 0}
+            for end in link["ends"]:
+                self._interface_links[end].add(key)
+        link["last_seen"] = now
+        return link
+
+    def _set_path(self, fingerprint, destination, sequence, links, now):
+        old = self.paths.get(fingerprint)
+        if old:
+            for key in old["links"]:
+                self._link_paths[key].discard(fingerprint)
+        self.paths[fingerprint] = {"destination": destination, "sequence": sequence, "links": links, "last_seen": now}
+        for key in links:
+            self._link_paths[key].add(fingerprint)
+
+    def _drop_path(self, fingerprint):
+        for key in self.paths.pop(fingerprint)["links"]:
+            self._link_paths[key].discard(fingerprint)
+
+    def add_showpaths(self, destination, path_data, tool, now=None):
+        """Applies a showpaths snapshot; paths of destination missing from it are dropped"""
+        self.add_showpaths_batch({destination: path_data}, tool, now)
+
+    def add_showpaths_batch(self, snapshots, tool, now=None):
+        """Applies {destination: showpaths data} of one discovery run in a single update"""
+        now = now or time.time()
+        with self._update(now, tool):
+            for destination, path_data in snapshots.items():
+                current = set()
+                for path in path_data.get("paths", []):
+                    fingerprint = path.get("fingerprint")
+                    if not fingerprint:
+                        continue
+                    links = path_links(path_interfaces(path))
+                    for key in links:
+                        self._touch_link(key, now)
+                    self._set_path(fingerprint, destination, path.get("sequence"), links, now)
+                    current.add(fingerprint)
+                for fingerprint in [fp for fp, p in self.paths.items() if p["destination"] == destination and fp not in current]:
+                    self._drop_path(fingerprint)
+
+    def add_traceroutes(self, traces, tool, now=None):
+        """Updates link RTTs from [(traceroute data, fingerprint or None)].
+
+        The RTT of a link is the increment between the RTTs of its two ends.
+        """
+        now = now or time.time()
+        with self._update(now, tool):
+            for traceroute_data, fingerprint in traces:
+                hops = []
+                for hop in traceroute_data.get("hops", []):
+                    times = [t for t in hop.get("round_trip_times") or [] if isinstance(t, (int, float))]
+                    ia, ifid = hop.get("isd_as"), hop.get("interface_id")
+                    if ia is not None and ifid is not None:
+                        hops.append((ia, int(ifid), sum(times) / len(times) if times else None))
+
+                for (ia_a, if_a, rtt_a), (ia_b, if_b, rtt_b) in zip(hops, hops[1:]):
+                    if ia_a == ia_b:
+                        continue
+                    link = self._touch_link(link_key(interface_key(ia_a, if_a), interface_key(ia_b, if_b)), now)
+                    if rtt_a is None or rtt_b is None:
+                        continue
+                    increment = max(rtt_b - rtt_a, 0.0)
+                    if link["rtt_ms"] is None:
+                        link["rtt_ms"] = increment
+                    else:
+                        link["rtt_ms"] += RTT_EWMA_ALPHA * (increment - link["rtt_ms"])
+                    link["rtt_samples"] += 1
+                if fingerprint in self.paths:
+                    self.paths[fingerprint]["last_seen"] = now
+
+    def paths_sharing_link(self, key):
+        """Fingerprints of the known paths that cross the link"""
+        with self._lock:
+            self._reload()
+            return sorted(self._link_paths.get(key, ()))
+
+    def paths_affected_by_interface(self, ia, ifid):
+        """Fingerprints of the paths that would break if the interface disappeared"""
+        with self._lock:
+            self._reload()
+            affected = set()
+            for key in self._interface_links.get(interface_key(ia, ifid), ()):
+                affected |= self._link_paths.get(key, set())
+            return sorted(affected)
+
+    def link_betweenness(self, destination=None):
+        """{link: share of the known paths (to destination) crossing it}, highest first"""
+        with self._lock:
+            self._reload()
+            fingerprints = [fp for fp, p in self.paths.items() if destination is None or p["destination"] == destination]
+            counts = defaultdict(int)
+            for fingerprint in fingerprints:
+                for key in set(self.paths[fingerprint]["links"]):
+                    counts[key] += 1
+        if not fingerprints:
+            return {}
+        return dict(sorted(((key, count / len(fingerprints)) for key, count in counts.items()), key=lambda x: -x[1]))
+
+    def neighbors(self, ia):
+        """ASes directly linked to ia"""
+        with self._lock:
+            self._reload()
+            return sorted({
+                end.split("#")[0]
+                for key, link in self.links.items()
+                for end in link["ends"]
+                if any(e.split("#")[0] == ia for e in link["ends"]) and end.split("#")[0] != ia
+            })
+
+
+_default_graph = None
+
+def default_graph():
+    global _default_graph
+    if _default_graph is None:
+        _default_graph = TopologyGraph()
+    return _default_graph
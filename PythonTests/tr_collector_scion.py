@@ -3,9 +3,20 @@ import json
 import subprocess
 import time
 import random
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import path_cache
+import topology_graph
+import telemetry
+from atomic_json import write_json_atomic
 from config import (
-    AS_TARGETS
+    AS_TARGETS,
+    TRACEROUTE_MODE,
+    TRACEROUTE_WORKERS,
+    TRACEROUTE_MAX_PATHS,
+    TRACEROUTE_CACHE_TTL,
+    TRACEROUTE_REFRESH_RATE
 )
 
 # Base directories
@@ -13,11 +24,88 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "Data"))
 BASE_TRACEROUTE_DIR = os.path.join(BASE_DIR, "History", "Traceroute")
 LOG_DIR = os.path.join(BASE_DIR, "Logs", "Traceroute")
+# Last trace per fingerprint and sequence, used to skip paths traced recently
+TRACE_CACHE_FILE = os.path.join(BASE_DIR, "traceroute_cache.json")
 os.makedirs(LOG_DIR, exist_ok=True)
 
+_trace_cache_lock = threading.Lock()
+
 def normalize_as(as_str):
     return as_str.replace(":", "_")
 
+def load_trace_cache():
+    try:
+        with open(TRACE_CACHE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def save_trace_cache(cache):
+    # Entries older than the TTL are of no use any more
+    now = time.time()
+    cache = {key: entry for key, entry in cache.items() if now - entry.get("traced_at", 0) < TRACEROUTE_CACHE_TTL}
+    write_json_atomic(TRACE_CACHE_FILE, cache, "traceroute")
+
+def cache_key(path):
+    return f"{path.get('fingerprint')}|{path.get('sequence')}"
+
+def select_trace_paths(paths, cache):
+    """Indexes to trace: paths without a fresh trace first, fresh ones only at TRACEROUTE_REFRESH_RATE.
+
+    Returns (selected indexes, indexes skipped because of a fresh cached trace).
+    """
+    now = time.time()
+    stale, fresh = [], []
+    for i, path in enumerate(paths):
+        entry = cache.get(cache_key(path))
+        if entry and now - entry.get("traced_at", 0) < TRACEROUTE_CACHE_TTL:
+            fresh.append(i)
+        else:
+            stale.append(i)
+
+    refresh = [i for i in fresh if random.random() < TRACEROUTE_REFRESH_RATE]
+    candidates = random.sample(stale, len(stale)) + refresh
+    selected = sorted(candidates[:TRACEROUTE_MAX_PATHS])
+    skipped = sorted(set(fresh) - set(selected))
+    return selected, skipped
+
+def trace_path(ia, ip_target, real_index, path, timestamp, output_dir, queued_at=None):
+    """Traces one path and writes its TR file, returns (traceroute data or None, log lines)"""
+    sequence = path.get("sequence")
+    if not sequence:
+        return None, []
+
+    hop_count = len(sequence.split())
+
+    with telemetry.span("subprocess", "traceroute", queued_at, tool="traceroute", ia=ia, fingerprint=path.get("fingerprint")) as span:
+        traceroute_result = subprocess.run(
+            ["scion", "traceroute", f"{ia},{ip_target}", "--format", "json", "--sequence", sequence],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        span.set(exit_code=traceroute_result.returncode)
+
+    if traceroute_result.returncode != 0:
+        print(f"[ERROR] Traceroute failed on path {real_index} for {ia}: {traceroute_result.stderr}")
+        return None, [f"[ERROR] {timestamp} Traceroute failed on path {real_index} for {ia}: {traceroute_result.stderr}"]
+
+    try:
+        traceroute_data = json.loads(traceroute_result.stdout)
+    except json.JSONDecodeError:
+        print(f"[ERROR] Failed to parse traceroute JSON for path {real_index} of {ia}")
+        return None, [f"[ERROR] {timestamp} Invalid traceroute JSON for path {real_index} of {ia}"]
+
+    traceroute_data["hop_count"] = hop_count
+    filename = f"TR_{timestamp}_AS_{normalize_as(ia)}_p_{real_index}.json"
+    output_path = os.path.join(output_dir, filename)
+    with telemetry.span("write", "traceroute", tool="traceroute", ia=ia):
+        with open(output_path, "w") as f:
+            json.dump(traceroute_data, f, indent=2)
+
+    print(f"[OK] {timestamp} - AS {ia} TR path {real_index} (hops: {hop_count})")
+    return traceroute_data, [f"[OK] {timestamp} - AS {ia} TR path {real_index} (hops: {hop_count})"]
+
 def run_all_traceroutes(ia, ip_target, as_folder):
     timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M")
     log_filename = f"TR_AS_{normalize_as(ia)}.log"
@@ -26,28 +114,14 @@ def run_all_traceroutes(ia, ip_target, as_folder):
     output_dir = os.path.join(BASE_TRACEROUTE_DIR, as_folder)
     os.makedirs(output_dir, exist_ok=True)
 
-    # Get all available paths via scion showpaths
-    showpaths_result = subprocess.run(
-        ["scion", "showpaths", ia, "--format", "json", "-m", "40"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True
-    )
-
-    if showpaths_result.returncode != 0:
-        print(f"[ERROR] Failed to get paths for {ia}: {showpaths_result.stderr}")
-        with open(log_path, "a") as log_file:
-            log_file.write(f"[ERROR] {timestamp} Failed to get paths for {ia}: {showpaths_result.stderr}\n")
-        return
-
-    try:
-        path_data = json.loads(showpaths_result.stdout)
-        paths = path_data.get("paths", [])
-    except json.JSONDecodeError:
-        print(f"[ERROR] Failed to parse showpaths JSON for {ia}")
+    # Get all available paths from the shared path cache (runs scion showpaths only when stale)
+    path_data, error = path_cache.get_paths(ia, tool="traceroute")
+    if error:
+        print(f"[ERROR] Failed to get paths for {ia}: {error}")
         with open(log_path, "a") as log_file:
-            log_file.write(f"[ERROR] {timestamp} Invalid JSON from showpaths for {ia}\n")
+            log_file.write(f"[ERROR] {timestamp} Failed to get paths for {ia}: {error}\n")
         return
+    paths = path_data.get("paths", [])
 
     if not paths:
         print(f"[WARNING] No paths found for {ia}")
@@ -55,61 +129,49 @@ def run_all_traceroutes(ia, ip_target, as_folder):
             log_file.write(f"[WARNING] No paths found for {ia} at {timestamp}\n")
         return
 
-    original_path_count = len(paths)
-
-    # Select up to 10 random path indexes
-    if original_path_count > 10:
-        selected_indexes = sorted(random.sample(range(original_path_count), 10))
-    else:
-        selected_indexes = list(range(original_path_count))
-
-    selected_paths = [paths[i] for i in selected_indexes]
+    # Select up to TRACEROUTE_MAX_PATHS path indexes, skipping paths traced recently
+    with _trace_cache_lock:
+        cache = load_trace_cache()
+    selected_indexes, skipped_indexes = select_trace_paths(paths, cache)
 
     # Log which full-list indexes were selected
     selected_indexes_str = ", ".join(str(i) for i in selected_indexes)
     print(f"[INFO] {timestamp} - AS {ia}: Selected path indexes from full list: [{selected_indexes_str}]")
     with open(log_path, "a") as log_file:
         log_file.write(f"[INFO] {timestamp} - AS {ia}: Selected path indexes from full list: [{selected_indexes_str}]\n")
+        if skipped_indexes:
+            log_file.write(f"[CACHED] {timestamp} - AS {ia}: Skipped recently traced paths: [{', '.join(str(i) for i in skipped_indexes)}]\n")
 
     # Run traceroute on each selected path
-    for idx_in_list, real_index in enumerate(selected_indexes):
-        path = paths[real_index]
-        sequence = path.get("sequence")
-        if not sequence:
-            continue
-
-        hop_count = len(sequence.split())
-
-        traceroute_result = subprocess.run(
-            ["scion", "traceroute", f"{ia},{ip_target}", "--format", "json", "--sequence", sequence],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
-
-        if traceroute_result.returncode != 0:
-            print(f"[ERROR] Traceroute failed on path {real_index} for {ia}: {traceroute_result.stderr}")
-            with open(log_path, "a") as log_file:
-                log_file.write(f"[ERROR] {timestamp} Traceroute failed on path {real_index} for {ia}: {traceroute_result.stderr}\n")
-            continue
-
-        try:
-            traceroute_data = json.loads(traceroute_result.stdout)
-        except json.JSONDecodeError:
-            print(f"[ERROR] Failed to parse traceroute JSON for path {real_index} of {ia}")
-            with open(log_path, "a") as log_file:
-                log_file.write(f"[ERROR] {timestamp} Invalid traceroute JSON for path {real_index} of {ia}\n")
-            continue
-
-        traceroute_data["hop_count"] = hop_count
-        filename = f"TR_{timestamp}_AS_{normalize_as(ia)}_p_{real_index}.json"
-        output_path = os.path.join(output_dir, filename)
-        with open(output_path, "w") as f:
-            json.dump(traceroute_data, f, indent=2)
+    tasks = [(real_index, paths[real_index]) for real_index in selected_indexes]
+    if TRACEROUTE_MODE == "parallel":
+        queued_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=TRACEROUTE_WORKERS) as executor:
+            outcomes = list(executor.map(
+                lambda task: trace_path(ia, ip_target, task[0], task[1], timestamp, output_dir, queued_at), tasks
+            ))
+    else:
+        outcomes = [trace_path(ia, ip_target, real_index, path, timestamp, output_dir) for real_index, path in tasks]
+
+    traced_at = time.time()
+    with _trace_cache_lock:
+        cache = load_trace_cache()
+        for (real_index, path), (traceroute_data, _) in zip(tasks, outcomes):
+            if traceroute_data is not None:
+                cache[cache_key(path)] = {"ia": ia, "traced_at": traced_at, "timestamp": timestamp}
+        save_trace_cache(cache)
+
+    # Per-link RTTs for the topology graph
+    topology_graph.default_graph().add_traceroutes([
+        (traceroute_data, path.get("fingerprint"))
+        for (_, path), (traceroute_data, _) in zip(tasks, outcomes)
+        if traceroute_data is not None
+    ], tool="traceroute")
 
-        print(f"[OK] {timestamp} - AS {ia} TR path {real_index} (hops: {hop_count})")
-        with open(log_path, "a") as log_file:
-            log_file.write(f"[OK] {timestamp} - AS {ia} TR path {real_index} (hops: {hop_count})\n")
+    with open(log_path, "a") as log_file:
+        for _, log_lines in outcomes:
+            for line in log_lines:
+                log_file.write(line + "\n")
 
 
 if __name__ == "__main__":
@@ -117,8 +179,9 @@ if __name__ == "__main__":
     global_timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
     print("==== START TRACEROUTE TESTING ====")
 
-    for ia, (ip, folder) in AS_TARGETS.items():
-        run_all_traceroutes(ia, ip, folder)
+    with telemetry.span("stage", "traceroute", tool="traceroute"):
+        for ia, (ip, folder) in AS_TARGETS.items():
+            run_all_traceroutes(ia, ip, folder)
 
     global_end = time.time()
     duration = global_end - global_start
@@ -0,0 +1,9 @@
+#!/bin/bash
+set -euo pipefail
+
+# Runs the resident measurement daemon instead of the cron driven pipeline.sh
+REPO_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")"/.. && pwd)"
+PY_DIR="$REPO_ROOT/PythonTests"
+LOG="$REPO_ROOT/Data/Logs/daemon.log"
+
+exec /usr/bin/python3 -u "$PY_DIR/measurement_daemon.py" >> "$LOG" 2>&1
@@ -51,6 +51,15 @@ else
   echo "No current path files found in $CURRENTLY" >> "$LOG"
 fi
 
+# Step 4: Pack the files of finished days in Archive/ into compressed per-tool bundles
+/usr/bin/python3 "$PY_DIR/archive_compactor.py" "$ARCHIVE" "$archive_day" >> "$LOG" || echo "Archive compaction failed" >> "$LOG"
+
+# Step 5: Add new and changed archive files to the metadata index (Archive/archive_index.db)
+/usr/bin/python3 "$PY_DIR/archive_index.py" "$ARCHIVE" >> "$LOG" || echo "Archive index update failed" >> "$LOG"
+
+# Step 6: Fold this run's timing spans into the metrics textfile
+/usr/bin/python3 "$PY_DIR/telemetry.py" >> "$LOG" || echo "Telemetry export failed" >> "$LOG"
+
 end_ts=$(date +"%Y-%m-%d %H:%M:%S")
 echo "[$end_ts] Pipeline complete." >> "$LOG"
 echo "" >> "$LOG"